@@ -0,0 +1,237 @@
+"""Benchmarks the courses store backends on a synthetic history.
+
+Each backend is saved and loaded from the data files, like in a run, in a
+temporary directory. The memory is what Python allocates while loading the
+store, so the pages of a mapped index and the SQLite cache are not included.
+
+Run it from the root of the repository:
+
+    python -m benchmarks.courses_store --courses 100000
+
+"""
+
+from __future__ import annotations
+
+import os
+import tracemalloc
+from argparse import ArgumentParser
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from pathlib import Path
+from random import Random
+from tempfile import TemporaryDirectory
+from time import perf_counter
+from typing import NamedTuple, TypeVar
+
+from udemy_autocoupons.courses_store import BaseCoursesStore, CoursesStore
+from udemy_autocoupons.persistent_data import (
+    load_courses_store,
+    save_courses_store,
+)
+from udemy_autocoupons.udemy_course import (
+    CourseWithAnyCoupon,
+    CourseWithCoupon,
+    UdemyCourseT,
+)
+
+_KINDS = ("pickle", "compact", "journal", "sqlite", "mmap")
+# The share of the history that was stored with any coupon
+_ANY_COUPON_RATIO = 0.3
+
+_T = TypeVar("_T")
+
+
+class _Result(NamedTuple):
+    """The measures of a backend."""
+
+    kind: str
+    first_load: float
+    load: float
+    save: float
+    memory: int
+    hits_per_second: float
+    misses_per_second: float
+
+
+def _create_courses(count: int, random: Random) -> list[UdemyCourseT]:
+    """Creates a synthetic history of stored courses.
+
+    Args:
+        count: The number of courses.
+        random: The random generator, seeded so that runs are comparable.
+
+    Returns:
+        The courses, with slugs and coupons like the real ones.
+
+    """
+    courses: list[UdemyCourseT] = []
+
+    for index in range(count):
+        url_id = f"course-{index}-{random.getrandbits(32):08x}"
+
+        if random.random() < _ANY_COUPON_RATIO:
+            courses.append(CourseWithAnyCoupon(url_id))
+        else:
+            coupon = f"{random.getrandbits(40):010X}"
+            courses.append(CourseWithCoupon(url_id, coupon))
+
+    return courses
+
+
+def _timed(function: Callable[[], _T]) -> tuple[_T, float]:
+    """Runs the function, measuring how long it takes.
+
+    Args:
+        function: The function to run.
+
+    Returns:
+        Its result and the seconds that it took.
+
+    """
+    start = perf_counter()
+    result = function()
+
+    return result, perf_counter() - start
+
+
+def _lookups_per_second(
+    store: BaseCoursesStore,
+    courses: list[CourseWithCoupon],
+) -> float:
+    """Measures the membership checks of the courses.
+
+    Args:
+        store: The store to check.
+        courses: The courses to look up.
+
+    Returns:
+        The lookups per second.
+
+    """
+    _, seconds = _timed(lambda: [course in store for course in courses])
+
+    return len(courses) / seconds
+
+
+def _close(store: BaseCoursesStore) -> None:
+    if close := getattr(store, "close", None):
+        close()
+
+
+@contextmanager
+def _in_temporary_directory() -> Iterator[None]:
+    """Runs the block in a new temporary directory, as the data files go there.
+
+    Yields:
+        Nothing, the block runs in the directory.
+
+    """
+    previous = Path.cwd()
+
+    with TemporaryDirectory() as directory:
+        os.chdir(directory)
+        try:
+            yield
+        finally:
+            os.chdir(previous)
+
+
+def _benchmark(
+    kind: str,
+    courses: list[UdemyCourseT],
+    lookups: int,
+    random: Random,
+) -> _Result:
+    """Saves, loads and queries a backend with the courses.
+
+    Args:
+        kind: The kind of store, as in --store.
+        courses: The history of stored courses.
+        lookups: The number of hits and of misses to check.
+        random: The random generator of the lookups.
+
+    Returns:
+        The measures.
+
+    """
+    history = CoursesStore()
+    for course in courses:
+        history.add(course)
+    save_courses_store(history)
+
+    # SQLite and mapped stores migrate the saved store on the first load,
+    # which is kept by saving it like at the end of a run
+    store, first_load = _timed(lambda: load_courses_store(kind))
+    save_courses_store(store)
+    _close(store)
+
+    store, load = _timed(lambda: load_courses_store(kind))
+    _, save = _timed(lambda: save_courses_store(store))
+    _close(store)
+
+    tracemalloc.start()
+    store = load_courses_store(kind)
+    memory, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    hits = [
+        CourseWithCoupon(course.url_id, course.coupon or "ANY")
+        for course in random.choices(courses, k=lookups)
+    ]
+    misses = [
+        CourseWithCoupon(f"missing-{index}", "COUPON")
+        for index in range(lookups)
+    ]
+    if not all(course in store for course in hits) or any(
+        course in store for course in misses
+    ):
+        raise ValueError(f"The {kind} store didn't keep the courses")
+
+    result = _Result(
+        kind,
+        first_load,
+        load,
+        save,
+        memory,
+        _lookups_per_second(store, hits),
+        _lookups_per_second(store, misses),
+    )
+    _close(store)
+
+    return result
+
+
+def main() -> None:
+    """Runs the benchmark of every chosen backend, and prints a table."""
+    parser = ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--courses", type=int, default=100_000)
+    parser.add_argument("--lookups", type=int, default=100_000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--stores", nargs="+", choices=_KINDS, default=_KINDS)
+    args = parser.parse_args()
+
+    random = Random(args.seed)
+    courses = _create_courses(args.courses, random)
+
+    print(
+        f"{args.courses} courses, {args.lookups} lookups, seed {args.seed}",
+    )
+    print(
+        f"{'store':<8} {'1st load':>9} {'load':>9} {'save':>9} "
+        f"{'memory':>10} {'hits/s':>11} {'misses/s':>11}",
+    )
+
+    for kind in args.stores:
+        with _in_temporary_directory():
+            result = _benchmark(kind, courses, args.lookups, random)
+
+        print(
+            f"{result.kind:<8} {result.first_load:>8.3f}s {result.load:>8.3f}s "
+            f"{result.save:>8.3f}s {result.memory / 2**20:>7.1f}MiB "
+            f"{result.hits_per_second:>11,.0f} "
+            f"{result.misses_per_second:>11,.0f}",
+        )
+
+
+if __name__ == "__main__":
+    main()
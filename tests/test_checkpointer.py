@@ -0,0 +1,102 @@
+"""Tests for the checkpoints of Checkpointer, with a slow fake save."""
+
+from __future__ import annotations
+
+from asyncio import run, sleep as async_sleep, to_thread, wait_for
+from collections.abc import Callable
+from signal import SIGINT, raise_signal
+from threading import Event, Lock, get_ident
+from time import sleep
+
+from udemy_autocoupons.checkpointer import Checkpointer
+
+_WRITE_TIME = 0.05
+
+
+class _SlowSave:
+    """Records the threads and the overlaps of the checkpoints."""
+
+    def __init__(self) -> None:
+        """Starts with no checkpoints."""
+        self.snapshot_threads: list[int] = []
+        self.write_threads: list[int] = []
+        self.writing = 0
+        self.max_writing = 0
+        self._lock = Lock()
+
+    def __call__(self) -> Callable[[], None]:
+        self.snapshot_threads.append(get_ident())
+
+        return self._write
+
+    def _write(self) -> None:
+        """Takes a while to write the checkpoint, like a big store would."""
+        with self._lock:
+            self.writing += 1
+            self.max_writing = max(self.max_writing, self.writing)
+
+        self.write_threads.append(get_ident())
+        sleep(_WRITE_TIME)
+
+        with self._lock:
+            self.writing -= 1
+
+
+async def _store_courses(save: _SlowSave, stored: int) -> int:
+    """Stores courses with a checkpoint requested for each of them.
+
+    Args:
+        save: The fake save.
+        stored: The number of courses to store.
+
+    Returns:
+        The thread of the event loop.
+
+    """
+    checkpointer = Checkpointer(save, Event(), every_stored=1)
+
+    async with checkpointer:
+        for _ in range(stored):
+            checkpointer.record_stored()
+            # The event loop keeps running while a checkpoint is written
+            await async_sleep(_WRITE_TIME / 2)
+
+    return get_ident()
+
+
+async def _interrupt(save: _SlowSave, stop_event: Event) -> int:
+    """Sends SIGINT, and waits until the run is stopped.
+
+    Args:
+        save: The fake save.
+        stop_event: The stop event of the run.
+
+    Returns:
+        The number of checkpoints being written when the run was stopped.
+
+    """
+    async with Checkpointer(save, stop_event):
+        raise_signal(SIGINT)
+        await wait_for(to_thread(stop_event.wait), 5)
+
+        return save.writing
+
+
+def test_checkpoints_are_written_one_at_a_time_in_another_thread() -> None:
+    save = _SlowSave()
+    loop_thread = run(_store_courses(save, 10))
+
+    assert save.snapshot_threads
+    assert set(save.snapshot_threads) == {loop_thread}
+    assert len(save.write_threads) == len(save.snapshot_threads)
+    assert loop_thread not in save.write_threads
+    assert save.max_writing == 1
+    assert not save.writing
+
+
+def test_signal_stops_the_run_after_a_checkpoint() -> None:
+    save = _SlowSave()
+    stop_event = Event()
+
+    assert not run(_interrupt(save, stop_event))
+    assert len(save.write_threads) == 1
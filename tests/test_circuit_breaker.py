@@ -0,0 +1,179 @@
+"""Tests for the states, backoff and error budget of CircuitBreaker."""
+
+from concurrent.futures import Future
+from threading import Event, Thread
+
+import pytest
+
+from udemy_autocoupons.enroller import circuit_breaker as circuit_breaker_module
+from udemy_autocoupons.enroller.circuit_breaker import (
+    BreakerState,
+    CircuitBreaker,
+    ErrorBudgetExhausted,
+)
+
+# Errors that open a closed breaker
+_OPENING_ERRORS = 4
+
+
+class _FakeClock:
+    """Stands for time.monotonic, only advancing when told to."""
+
+    def __init__(self) -> None:
+        """Starts at 0."""
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class _FastCircuitBreaker(CircuitBreaker):
+    """A circuit breaker that notices a stop quickly, so that tests don't wait."""
+
+    _STOP_CHECK_INTERVAL = 0.01
+
+
+@pytest.fixture(name="clock")
+def _clock(monkeypatch: pytest.MonkeyPatch) -> _FakeClock:
+    clock = _FakeClock()
+    monkeypatch.setattr(circuit_breaker_module, "monotonic", clock)
+
+    return clock
+
+
+def _open(circuit_breaker: CircuitBreaker) -> None:
+    for _ in range(_OPENING_ERRORS):
+        circuit_breaker.record_error()
+
+
+def _acquire_in_thread(circuit_breaker: CircuitBreaker) -> Future[bool]:
+    """Acquires the breaker from a daemon thread, so that a failure can't hang.
+
+    Args:
+        circuit_breaker: The breaker to acquire.
+
+    Returns:
+        The future with the result of the acquire.
+
+    """
+    future: Future[bool] = Future()
+    Thread(
+        target=lambda: future.set_result(circuit_breaker.acquire()),
+        daemon=True,
+    ).start()
+
+    return future
+
+
+def _pauses(caplog: pytest.LogCaptureFixture) -> list[int]:
+    return [
+        record.args[0]  # type: ignore
+        for record in caplog.records
+        if record.msg == "Enroller: Too many errors, pausing for %ss"
+    ]
+
+
+def test_no_error_budget_allows_any_errors() -> None:
+    circuit_breaker = CircuitBreaker(0, Event())
+
+    for _ in range(100):
+        circuit_breaker.record_error()
+
+
+def test_error_budget_is_exhausted_after_its_errors() -> None:
+    circuit_breaker = CircuitBreaker(2, Event())
+
+    circuit_breaker.record_error()
+    circuit_breaker.record_error()
+
+    with pytest.raises(ErrorBudgetExhausted):
+        circuit_breaker.record_error()
+
+
+def test_consecutive_errors_open_the_breaker(clock: _FakeClock) -> None:
+    circuit_breaker = _FastCircuitBreaker(0, Event())
+
+    for _ in range(_OPENING_ERRORS - 1):
+        circuit_breaker.record_error()
+    circuit_breaker.record_success()
+    _open(circuit_breaker)
+
+    assert circuit_breaker.state is BreakerState.OPEN
+
+    clock.now += 30
+    assert circuit_breaker.acquire()
+    assert circuit_breaker.state is BreakerState.HALF_OPEN
+
+    circuit_breaker.record_success()
+    circuit_breaker.release()
+    assert circuit_breaker.state is BreakerState.CLOSED
+
+
+def test_failed_probe_doubles_the_backoff_up_to_its_limit(
+    clock: _FakeClock,
+    caplog: pytest.LogCaptureFixture,
+) -> None:
+    circuit_breaker = _FastCircuitBreaker(0, Event())
+    _open(circuit_breaker)
+
+    for backoff in (30, 60, 120, 240, 480, 600):
+        clock.now += backoff
+        assert circuit_breaker.acquire()
+        circuit_breaker.record_error()
+        circuit_breaker.release()
+
+        assert circuit_breaker.state is BreakerState.OPEN
+
+    assert _pauses(caplog) == [30, 60, 120, 240, 480, 600, 600]
+
+
+def test_successful_probe_resets_the_backoff(
+    clock: _FakeClock,
+    caplog: pytest.LogCaptureFixture,
+) -> None:
+    circuit_breaker = _FastCircuitBreaker(0, Event())
+    _open(circuit_breaker)
+
+    clock.now += 30
+    assert circuit_breaker.acquire()
+    circuit_breaker.record_error()
+    circuit_breaker.release()
+
+    clock.now += 60
+    assert circuit_breaker.acquire()
+    circuit_breaker.record_success()
+    circuit_breaker.release()
+    _open(circuit_breaker)
+
+    assert _pauses(caplog) == [30, 60, 30]
+
+
+def test_stop_ends_the_wait_of_an_open_breaker(clock: _FakeClock) -> None:
+    stop_event = Event()
+    circuit_breaker = _FastCircuitBreaker(0, stop_event)
+    _open(circuit_breaker)
+    clock.now += 29
+
+    acquired = _acquire_in_thread(circuit_breaker)
+    with pytest.raises(TimeoutError):
+        acquired.result(timeout=0.1)
+    stop_event.set()
+
+    assert not acquired.result(timeout=5)
+    assert circuit_breaker.state is BreakerState.OPEN
+
+
+def test_probe_is_the_only_enrollment_while_half_open(
+    clock: _FakeClock,
+) -> None:
+    circuit_breaker = _FastCircuitBreaker(0, Event())
+    _open(circuit_breaker)
+    clock.now += 30
+
+    assert circuit_breaker.acquire()
+    waiting = _acquire_in_thread(circuit_breaker)
+    with pytest.raises(TimeoutError):
+        waiting.result(timeout=0.1)
+    circuit_breaker.record_success()
+
+    assert waiting.result(timeout=5)
@@ -0,0 +1,149 @@
+"""Tests for CourseQueue and its CourseJournal."""
+
+from __future__ import annotations
+
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from queue import Full
+
+import pytest
+
+from udemy_autocoupons.course_journal import CourseJournal, JournaledCourse
+from udemy_autocoupons.course_queue import CourseQueue
+from udemy_autocoupons.udemy_course import CourseWithCoupon
+
+_NOW = datetime(2024, 1, 10, tzinfo=timezone.utc)
+
+
+def _course(name: str) -> CourseWithCoupon:
+    return CourseWithCoupon(name, "COUPON")
+
+
+def _drain(mt_queue: CourseQueue) -> list[CourseWithCoupon | None]:
+    return [mt_queue.get() for _ in range(mt_queue.qsize())]
+
+
+def test_freshest_courses_go_first() -> None:
+    mt_queue = CourseQueue()
+    mt_queue.put(None)
+    mt_queue.put_course(_course("old"), posted=_NOW - timedelta(days=2))
+    mt_queue.put_course(_course("stale"), posted=_NOW, stale=True)
+    mt_queue.put_course(_course("retried"), retries=1, posted=_NOW)
+    mt_queue.put_course(_course("new"), posted=_NOW)
+    mt_queue.put_course(_course("tie"), posted=_NOW)
+
+    assert _drain(mt_queue) == [
+        _course("new"),
+        _course("tie"),
+        _course("old"),
+        _course("retried"),
+        _course("stale"),
+        None,
+    ]
+
+
+def test_course_in_flight_is_not_put_again() -> None:
+    mt_queue = CourseQueue()
+
+    assert mt_queue.put_course(_course("a"))
+    assert not mt_queue.put_course(_course("a"))
+    assert mt_queue.is_in_flight(_course("a"))
+
+    mt_queue.complete(_course("a"))
+
+    assert not mt_queue.is_in_flight(_course("a"))
+    assert mt_queue.put_course(_course("a"))
+    assert mt_queue.qsize() == 2
+
+
+def test_unfinished_has_in_flight_and_failed_courses() -> None:
+    mt_queue = CourseQueue()
+    for name in ("done", "failed", "pending"):
+        mt_queue.put_course(_course(name))
+
+    mt_queue.complete(_course("done"))
+    mt_queue.complete(_course("failed"), failed=True)
+
+    assert sorted(mt_queue.unfinished(), key=str) == [
+        _course("failed"),
+        _course("pending"),
+    ]
+
+    # A failed course that is enrolled later is finished
+    mt_queue.put_course(_course("failed"))
+    mt_queue.complete(_course("failed"))
+
+    assert mt_queue.unfinished() == [_course("pending")]
+
+
+def test_full_queue_does_not_keep_the_course() -> None:
+    mt_queue = CourseQueue(maxsize=1)
+    mt_queue.put_course(_course("a"))
+
+    with pytest.raises(Full):
+        mt_queue.put_course(_course("b"), block=False)
+
+    assert not mt_queue.is_in_flight(_course("b"))
+
+
+def test_journal_keeps_unfinished_courses(tmp_path: Path) -> None:
+    journal = CourseJournal(tmp_path / "journal.sqlite3")
+    mt_queue = CourseQueue(journal=journal)
+
+    mt_queue.put_course(_course("done"))
+    mt_queue.put_course(_course("failed"))
+    mt_queue.put_course(
+        _course("pending"),
+        retries=1,
+        posted=_NOW,
+        stale=True,
+    )
+    mt_queue.complete(_course("done"))
+    mt_queue.complete(_course("failed"), failed=True)
+
+    assert journal.unacknowledged() == [
+        JournaledCourse(_course("failed"), 0, None, False),
+        JournaledCourse(_course("pending"), 1, _NOW, True),
+    ]
+
+
+def test_journal_is_replayed_after_a_crash(tmp_path: Path) -> None:
+    path = tmp_path / "journal.sqlite3"
+    journal = CourseJournal(path)
+    mt_queue = CourseQueue(journal=journal)
+    mt_queue.put_course(_course("a"), posted=_NOW)
+    mt_queue.put_course(CourseWithCoupon("b", None))
+    # The process dies without completing them
+    journal.close()
+
+    journal = CourseJournal(path)
+    redelivered = journal.unacknowledged()
+
+    assert [course.course for course in redelivered] == [
+        _course("a"),
+        CourseWithCoupon("b", None),
+    ]
+    assert redelivered[0].posted == _NOW
+
+    mt_queue = CourseQueue(journal=journal)
+    for course, retries, posted, stale in redelivered:
+        mt_queue.put_course(course, retries, posted, stale)
+    mt_queue.complete(_course("a"))
+    mt_queue.complete(CourseWithCoupon("b", None))
+
+    # Putting them again doesn't duplicate them, and completing removes them
+    assert not journal.unacknowledged()
+
+
+def test_journal_is_cleared(tmp_path: Path) -> None:
+    journal = CourseJournal(tmp_path / "journal.sqlite3")
+    journal.append(_course("a"))
+    journal.append(_course("a"), retries=1)
+
+    assert journal.unacknowledged() == [
+        JournaledCourse(_course("a"), 1, None, False),
+    ]
+
+    journal.clear()
+
+    assert not journal.unacknowledged()
@@ -0,0 +1,190 @@
+"""Tests that every courses store behaves like a set of courses."""
+
+from __future__ import annotations
+
+from collections.abc import Callable, Iterator
+from pathlib import Path
+from random import Random
+
+import pytest
+
+from udemy_autocoupons.compact_courses_store import CompactCoursesStore
+from udemy_autocoupons.courses_store import BaseCoursesStore, CoursesStore
+from udemy_autocoupons.journaled_courses_store import JournaledCoursesStore
+from udemy_autocoupons.mmap_courses_store import MmapCoursesStore
+from udemy_autocoupons.sqlite_courses_store import SqliteCoursesStore
+from udemy_autocoupons.udemy_course import (
+    CourseWithAnyCoupon,
+    CourseWithCoupon,
+    UdemyCourseT,
+)
+
+# Creates an empty store that keeps its files, if any, in a directory
+_StoreFactoryT = Callable[[Path], BaseCoursesStore]
+
+_STORE_FACTORIES: dict[str, _StoreFactoryT] = {
+    "pickle": lambda _: CoursesStore(),
+    "compact": lambda _: CompactCoursesStore(),
+    "journal": lambda directory: JournaledCoursesStore(
+        directory / "courses_store.journal",
+        lambda _: None,
+    ),
+    "mmap": lambda directory: MmapCoursesStore(
+        directory / "courses_store.idx",
+    ),
+    "sqlite": lambda directory: SqliteCoursesStore(
+        directory / "courses_store.sqlite3",
+    ),
+}
+
+
+@pytest.fixture(name="store", params=_STORE_FACTORIES)
+def _store(
+    request: pytest.FixtureRequest,
+    tmp_path: Path,
+) -> Iterator[BaseCoursesStore]:
+    courses_store = _STORE_FACTORIES[request.param](tmp_path)
+
+    yield courses_store
+
+    if close := getattr(courses_store, "close", None):
+        close()
+
+
+def test_course_with_any_coupon_contains_every_coupon(
+    store: BaseCoursesStore,
+) -> None:
+    store.add(CourseWithAnyCoupon("a"))
+
+    assert CourseWithAnyCoupon("a") in store
+    assert CourseWithCoupon("a", "COUPON") in store
+    assert CourseWithCoupon("a", None) in store
+    assert CourseWithCoupon("b", "COUPON") not in store
+
+
+def test_course_with_coupon_contains_only_its_coupon(
+    store: BaseCoursesStore,
+) -> None:
+    store.add(CourseWithCoupon("a", "COUPON"))
+    store.add(CourseWithCoupon("b", None))
+
+    assert CourseWithCoupon("a", "COUPON") in store
+    assert CourseWithCoupon("a", "OTHER") not in store
+    assert CourseWithAnyCoupon("a") not in store
+    assert CourseWithCoupon("b", None) in store
+    assert CourseWithCoupon("b", "") not in store
+    assert len(store) == 2
+
+
+def test_course_with_any_coupon_replaces_its_coupons(
+    store: BaseCoursesStore,
+) -> None:
+    store.add(CourseWithCoupon("a", "COUPON"))
+    store.add(CourseWithCoupon("a", None))
+    store.add(CourseWithAnyCoupon("a"))
+
+    assert len(store) == 1
+
+    store.discard(CourseWithAnyCoupon("a"))
+
+    assert CourseWithCoupon("a", "COUPON") not in store
+    assert CourseWithCoupon("a", None) not in store
+    assert not store
+
+
+def test_store_behaves_like_the_in_memory_one(store: BaseCoursesStore) -> None:
+    random = Random(0)
+    reference = CoursesStore()
+    courses: list[UdemyCourseT] = [
+        CourseWithAnyCoupon(f"course-{index}") for index in range(8)
+    ]
+    courses += [
+        CourseWithCoupon(f"course-{index}", coupon)
+        for index in range(8)
+        for coupon in ("COUPON", "OTHER", "", None)
+    ]
+
+    for step in range(500):
+        course = random.choice(courses)
+        if random.random() < 0.6:
+            store.add(course)
+            reference.add(course)
+        else:
+            store.discard(course)
+            reference.discard(course)
+
+        # The mapped store moves the changes to its index
+        if step % 20 == 0 and (save := getattr(store, "save", None)):
+            save()
+
+        assert len(store) == len(reference)
+        assert [course in store for course in courses] == [
+            course in reference for course in courses
+        ]
+
+    assert set(store) == set(reference)
+
+
+def test_discard_removes_the_course(store: BaseCoursesStore) -> None:
+    store.add(CourseWithCoupon("a", "COUPON"))
+    store.add(CourseWithAnyCoupon("b"))
+
+    store.discard(CourseWithCoupon("a", "COUPON"))
+    store.discard(CourseWithAnyCoupon("b"))
+    store.discard(CourseWithCoupon("missing", None))
+
+    assert CourseWithCoupon("a", "COUPON") not in store
+    assert CourseWithCoupon("b", "COUPON") not in store
+    assert not store
+    assert not list(store)
+
+
+def test_compressed_store_is_loaded_back(store: BaseCoursesStore) -> None:
+    courses = {
+        CourseWithAnyCoupon("a"),
+        CourseWithCoupon("b", "COUPON"),
+        CourseWithCoupon("b", None),
+        CourseWithCoupon("ñandú", "CUPÓN"),
+    }
+    for course in courses:
+        store.add(course)
+
+    loaded = CoursesStore()
+    loaded.load_compressed(store.create_compressed())
+
+    assert set(loaded) == courses
+
+
+def test_sqlite_store_keeps_the_courses(tmp_path: Path) -> None:
+    path = tmp_path / "courses_store.sqlite3"
+    store = SqliteCoursesStore(path)
+    store.add(CourseWithAnyCoupon("a"))
+    store.add(CourseWithCoupon("b", "COUPON"))
+    store.close()
+
+    store = SqliteCoursesStore(path)
+
+    assert set(store) == {
+        CourseWithAnyCoupon("a"),
+        CourseWithCoupon("b", "COUPON"),
+    }
+    store.close()
+
+
+def test_compact_store_keeps_the_courses_after_merging() -> None:
+    # Enough courses to merge the pending ones into the sorted arrays
+    courses = [
+        CourseWithCoupon(f"course-{index}", f"COUPON-{index % 7}")
+        for index in range(10_000)
+    ]
+    store = CompactCoursesStore(*courses[:5000])
+    for course in courses[5000:]:
+        store.add(course)
+    store.add(CourseWithAnyCoupon("course-1"))
+    store.discard(CourseWithCoupon("course-2", "COUPON-2"))
+
+    assert CourseWithCoupon("course-1", "OTHER") in store
+    assert CourseWithCoupon("course-2", "COUPON-2") not in store
+    assert CourseWithCoupon("course-9999", "COUPON-3") in store
+    assert CourseWithCoupon("course-9999", "COUPON-4") not in store
+    assert len(store) == len(courses) - 1
@@ -0,0 +1,141 @@
+"""Tests for the versioned binary format of the data files."""
+
+from __future__ import annotations
+
+from pathlib import Path
+from struct import pack_into
+
+import pytest
+
+from udemy_autocoupons.data_file import (
+    HEADER_SIZE,
+    VERSION,
+    Codec,
+    DataFileError,
+    DataKind,
+    decode_courses,
+    encode_courses,
+    map_data_file,
+    read_data_file,
+    write_atomically,
+    write_data_file,
+)
+
+_COURSES = (
+    "any-coupon",
+    "ñandú",
+    ("specific-coupon", "COUPON"),
+    ("specific-coupon", "CUPÓN"),
+    ("without-coupon", None),
+    ("empty-coupon", ""),
+)
+
+
+def _corrupt(path: Path, offset: int, value: bytes) -> None:
+    data = bytearray(path.read_bytes())
+    data[offset : offset + len(value)] = value
+    path.write_bytes(data)
+
+
+def test_courses_are_decoded_back() -> None:
+    assert decode_courses(encode_courses(_COURSES)) == _COURSES
+    assert not decode_courses(encode_courses(()))
+
+
+def test_longer_tuples_are_encoded() -> None:
+    payload = encode_courses(("any-coupon", ("course", "COUPON", False)))
+
+    assert decode_courses(payload) == ("any-coupon", ("course", "COUPON"))
+
+
+@pytest.mark.parametrize("end", [4, 12, -1])
+def test_truncated_courses_are_malformed(end: int) -> None:
+    payload = encode_courses(_COURSES)
+
+    with pytest.raises(DataFileError):
+        decode_courses(payload[:end])
+
+
+@pytest.mark.parametrize("codec", Codec)
+def test_data_file_is_read_back(tmp_path: Path, codec: Codec) -> None:
+    path = tmp_path / "courses.bin"
+    write_data_file(path, DataKind.COURSES, b"payload", codec)
+
+    assert read_data_file(path, DataKind.COURSES) == b"payload"
+    assert not path.with_name("courses.bin.tmp").exists()
+
+
+@pytest.mark.parametrize(
+    ("offset", "value", "message"),
+    [
+        (0, b"ABCD", "not a data file"),
+        (4, (VERSION + 1).to_bytes(2, "little"), "newer version"),
+        (6, bytes([DataKind.PICKLE.value]), "does not contain"),
+        (7, b"\x7f", "unknown codec"),
+        (HEADER_SIZE, b"X", "corrupted"),
+    ],
+)
+def test_invalid_data_file_is_rejected(
+    tmp_path: Path,
+    offset: int,
+    value: bytes,
+    message: str,
+) -> None:
+    path = tmp_path / "courses.bin"
+    write_data_file(path, DataKind.COURSES, b"payload", Codec.RAW)
+    _corrupt(path, offset, value)
+
+    with pytest.raises(DataFileError, match=message):
+        read_data_file(path, DataKind.COURSES)
+
+
+def test_truncated_data_file_is_rejected(tmp_path: Path) -> None:
+    path = tmp_path / "courses.bin"
+    write_data_file(path, DataKind.COURSES, b"payload")
+
+    path.write_bytes(path.read_bytes()[:-1])
+    with pytest.raises(DataFileError, match="corrupted"):
+        read_data_file(path, DataKind.COURSES)
+
+    path.write_bytes(path.read_bytes()[: HEADER_SIZE - 1])
+    with pytest.raises(DataFileError, match="truncated"):
+        read_data_file(path, DataKind.COURSES)
+
+
+def test_raw_data_file_is_mapped(tmp_path: Path) -> None:
+    path = tmp_path / "index.bin"
+    write_data_file(path, DataKind.COURSES_INDEX, b"payload", Codec.RAW)
+
+    with map_data_file(path, DataKind.COURSES_INDEX) as data:
+        assert data[HEADER_SIZE:] == b"payload"
+
+
+def test_invalid_mapped_data_file_is_rejected(tmp_path: Path) -> None:
+    path = tmp_path / "index.bin"
+    write_data_file(path, DataKind.COURSES_INDEX, b"payload")
+
+    with pytest.raises(DataFileError, match="compressed"):
+        map_data_file(path, DataKind.COURSES_INDEX)
+
+    write_data_file(path, DataKind.COURSES_INDEX, b"payload", Codec.RAW)
+    # The length in the header no longer matches the file
+    data = bytearray(path.read_bytes())
+    pack_into("<Q", data, 8, 1)
+    path.write_bytes(data)
+
+    with pytest.raises(DataFileError, match="corrupted"):
+        map_data_file(path, DataKind.COURSES_INDEX)
+
+    path.write_bytes(b"")
+    with pytest.raises(DataFileError, match="truncated"):
+        map_data_file(path, DataKind.COURSES_INDEX)
+
+
+def test_file_is_replaced_atomically(tmp_path: Path) -> None:
+    path = tmp_path / "report.json"
+    path.write_bytes(b"old")
+
+    write_atomically(path, b"new ", b"contents")
+
+    assert path.read_bytes() == b"new contents"
+    assert [child.name for child in tmp_path.iterdir()] == ["report.json"]
@@ -0,0 +1,173 @@
+"""Tests for the courses that Enroller gives up on."""
+
+from __future__ import annotations
+
+from collections.abc import Callable
+from threading import Event
+from typing import Literal
+
+from udemy_autocoupons.course_queue import CourseQueue
+from udemy_autocoupons.courses_store import CoursesStore
+from udemy_autocoupons.enroller.circuit_breaker import CircuitBreaker
+from udemy_autocoupons.enroller.enroller import Enroller
+from udemy_autocoupons.enroller.state import EnrollResultT, State
+from udemy_autocoupons.enroller.supervised_driver import DriverUnavailable
+from udemy_autocoupons.udemy_course import CourseWithCoupon
+
+_COURSES = [CourseWithCoupon(f"course-{index}", "COUPON") for index in range(3)]
+
+
+class _FakeDriver:
+    """Stands for a SupervisedDriver, running a given function to enroll."""
+
+    def __init__(self, enroll: Callable[[], EnrollResultT]) -> None:
+        """Stores the function to run on every enrollment."""
+        self._enroll = enroll
+
+    def enroll(self, *_: object, **__: object) -> EnrollResultT:
+        return self._enroll()
+
+    def prefetch(self, course: CourseWithCoupon) -> None:
+        """Prefetching is not needed by the tests."""
+
+    def discard_prefetched(self, course: CourseWithCoupon) -> None:
+        """Prefetching is not needed by the tests."""
+
+
+def _url_ids(courses: list[CourseWithCoupon]) -> str:
+    """Joins the sorted url_ids of the courses, to compare them in any order."""
+    return ",".join(sorted(course.url_id for course in courses))
+
+
+class _CartDriver:
+    """Leaves the courses in the cart, and fails to check them out."""
+
+    def __init__(self, removed: bool) -> None:
+        """Stores whether the courses can be removed from the cart."""
+        self._removed = removed
+        self.calls: list[tuple[str, str]] = []
+
+    def enroll(
+        self,
+        course: CourseWithCoupon,
+        add_to_cart: bool = False,
+    ) -> EnrollResultT:
+        self.calls.append(("enroll", course.url_id))
+
+        return State.IN_CART if add_to_cart else State.ENROLLED
+
+    def checkout_cart(
+        self,
+        courses: list[CourseWithCoupon],
+    ) -> Literal[State.ERROR]:
+        self.calls.append(("checkout_cart", _url_ids(courses)))
+
+        return State.ERROR
+
+    def remove_from_cart(self, courses: list[CourseWithCoupon]) -> bool:
+        self.calls.append(("remove_from_cart", _url_ids(courses)))
+
+        return self._removed
+
+    def prefetch(self, course: CourseWithCoupon) -> None:
+        """Prefetching is not needed by the tests."""
+
+    def discard_prefetched(self, course: CourseWithCoupon) -> None:
+        """Prefetching is not needed by the tests."""
+
+
+class _NoBackoffCircuitBreaker(CircuitBreaker):
+    """A circuit breaker that doesn't pause, so that tests don't wait."""
+
+    _BASE_BACKOFF = 0
+
+
+def _enroll_all(
+    enroll: Callable[[], EnrollResultT] | _CartDriver,
+    stop_event: Event,
+    cart_batch: int = 0,
+) -> tuple[list[CourseWithCoupon], CourseQueue]:
+    """Enrolls the courses with a fake driver.
+
+    Args:
+        enroll: The function that the driver runs on every enrollment, or the
+        driver itself.
+        stop_event: The stop event of the run.
+        cart_batch: The number of courses to check out together.
+
+    Returns:
+        The errors, and the queue that the courses were taken from.
+
+    """
+    mt_queue = CourseQueue()
+    for course in _COURSES:
+        mt_queue.put_course(course)
+    mt_queue.put(None)
+
+    driver = enroll if isinstance(enroll, _CartDriver) else _FakeDriver(enroll)
+    enroller = Enroller(
+        driver,  # type: ignore
+        mt_queue,
+        CoursesStore(),
+        stop_event,
+        _NoBackoffCircuitBreaker(0, stop_event),
+        cart_batch=cart_batch,
+    )
+
+    return enroller.enroll_from_queue(), mt_queue
+
+
+def test_courses_after_a_stop_are_failed() -> None:
+    stop_event = Event()
+    stop_event.set()
+
+    errors, mt_queue = _enroll_all(lambda: State.ENROLLED, stop_event)
+
+    assert sorted(errors, key=str) == sorted(_COURSES, key=str)
+    assert sorted(mt_queue.unfinished(), key=str) == sorted(_COURSES, key=str)
+    assert not any(mt_queue.is_in_flight(course) for course in _COURSES)
+
+
+def test_courses_without_driver_are_failed() -> None:
+    def unavailable() -> EnrollResultT:
+        raise DriverUnavailable()
+
+    stop_event = Event()
+    errors, mt_queue = _enroll_all(unavailable, stop_event)
+
+    assert stop_event.is_set()
+    assert sorted(errors, key=str) == sorted(_COURSES, key=str)
+    assert not any(mt_queue.is_in_flight(course) for course in _COURSES)
+
+
+def test_courses_that_keep_failing_are_failed() -> None:
+    errors, mt_queue = _enroll_all(lambda: State.ERROR, Event())
+
+    assert sorted(errors, key=str) == sorted(_COURSES, key=str)
+    assert not any(mt_queue.is_in_flight(course) for course in _COURSES)
+    assert mt_queue.unfinished_tasks == 0
+
+
+def test_failed_checkout_is_removed_before_the_reattempts() -> None:
+    driver = _CartDriver(removed=True)
+    errors, mt_queue = _enroll_all(driver, Event(), cart_batch=len(_COURSES))
+
+    assert not errors
+    enrolls = sorted(driver.calls[:3] + driver.calls[5:])
+    assert enrolls == sorted(
+        2 * [("enroll", course.url_id) for course in _COURSES],
+    )
+    assert driver.calls[3:5] == [
+        ("checkout_cart", _url_ids(_COURSES)),
+        ("remove_from_cart", _url_ids(_COURSES)),
+    ]
+    assert mt_queue.unfinished_tasks == 0
+
+
+def test_courses_left_in_the_cart_are_failed() -> None:
+    driver = _CartDriver(removed=False)
+    errors, mt_queue = _enroll_all(driver, Event(), cart_batch=len(_COURSES))
+
+    assert sorted(errors, key=str) == sorted(_COURSES, key=str)
+    assert driver.calls[-1] == ("remove_from_cart", _url_ids(_COURSES))
+    assert not any(mt_queue.is_in_flight(course) for course in _COURSES)
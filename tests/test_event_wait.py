@@ -0,0 +1,140 @@
+"""Tests for EventWait, with a fake driver instead of Chrome."""
+
+from __future__ import annotations
+
+from typing import Any
+
+import pytest
+from selenium.common.exceptions import (
+    JavascriptException,
+    NoSuchElementException,
+    TimeoutException,
+)
+
+from udemy_autocoupons.enroller.event_wait import (
+    DomCondition,
+    EventWait,
+    all_of,
+    any_of,
+)
+
+_TIMEOUT = 0.2
+
+
+class _FakeDriver:
+    """Records the waiting scripts, resolving them with the given results.
+
+    A None result is a script interrupted by a navigation.
+
+    """
+
+    def __init__(self, *results: bool | None) -> None:
+        """Stores the results of the waiting scripts, in order."""
+        self.script_timeout = 0.0
+        self.waits: list[tuple[Any, ...]] = []
+        self._results = list(results)
+
+    def set_script_timeout(self, timeout: float) -> None:
+        self.script_timeout = timeout
+
+    def execute_async_script(self, script: str, *args: Any) -> bool:
+        self.waits.append((script, *args))
+        if (result := self._results.pop(0) if self._results else False) is None:
+            raise JavascriptException("Navigated")
+
+        return result
+
+
+def _condition(
+    values: list[Any],
+    script: str = "ready",
+) -> DomCondition[Any]:
+    """Creates a condition that returns the values in order, then the last."""
+
+    def check(_: object) -> Any:
+        return values.pop(0) if len(values) > 1 else values[0]
+
+    return DomCondition(check, script)
+
+
+def _settling(driver: _FakeDriver) -> list[bool]:
+    return [wait[-1] for wait in driver.waits]
+
+
+def test_value_is_returned_once_truthy() -> None:
+    driver = _FakeDriver()
+    wait = EventWait(driver, _TIMEOUT)  # type: ignore
+
+    assert wait.until(_condition([False, False, "element"])) == "element"
+    assert len(driver.waits) == 2
+    assert "ready" in driver.waits[0][0]
+
+
+def test_timeout_raises() -> None:
+    driver = _FakeDriver()
+    wait = EventWait(driver, _TIMEOUT)  # type: ignore
+
+    with pytest.raises(TimeoutException, match="Never"):
+        wait.until(_condition([False]), "Never")
+
+    assert driver.script_timeout > _TIMEOUT
+
+
+def test_missing_elements_and_interrupted_waits_are_retried() -> None:
+    def check(_: object) -> Any:
+        if not driver.waits:
+            raise NoSuchElementException()
+
+        return len(driver.waits) > 1 and "element"
+
+    driver = _FakeDriver(None)
+    wait = EventWait(driver, _TIMEOUT)  # type: ignore
+
+    assert wait.until(DomCondition(check, "ready")) == "element"
+
+
+def test_failing_condition_with_ready_script_settles() -> None:
+    # The script is truthy, but the condition fails until the fourth check
+    driver = _FakeDriver(True, True, True, False, False)
+    wait = EventWait(driver, _TIMEOUT)  # type: ignore
+    values: list[Any] = [False] * 4 + [False, "element"]
+
+    assert wait.until(_condition(values)) == "element"
+    assert _settling(driver) == [False, True, True, True, False]
+
+
+def test_plain_condition_waits_for_any_mutation() -> None:
+    driver = _FakeDriver()
+    wait = EventWait(driver, _TIMEOUT)  # type: ignore
+    values: list[Any] = [False, True]
+
+    assert wait.until(lambda _: values.pop(0))
+    # Any mutation, without settling
+    assert driver.waits[0][3:] == (True, False)
+
+
+def test_any_of_returns_the_first_truthy_value() -> None:
+    condition = any_of(
+        _condition([False], "first"),
+        _condition(["second"], "second"),
+    )
+    driver = _FakeDriver()
+
+    assert EventWait(driver, _TIMEOUT).until(condition) == "second"  # type: ignore
+    assert condition.script == "(first) || (second)"
+
+
+def test_all_of_waits_for_every_condition() -> None:
+    first: list[Any] = [False, "first"]
+    condition = all_of(
+        _condition(first, "first"),
+        _condition(["second"], "second"),
+    )
+    driver = _FakeDriver()
+
+    assert EventWait(driver, _TIMEOUT).until(condition) == [  # type: ignore
+        "first",
+        "second",
+    ]
+    assert condition.script == "(first) && (second)"
+    assert len(driver.waits) == 1
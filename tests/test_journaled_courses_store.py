@@ -0,0 +1,165 @@
+"""Tests for the journal replay and the compaction of JournaledCoursesStore."""
+
+from __future__ import annotations
+
+from pathlib import Path
+from time import monotonic, sleep
+
+from udemy_autocoupons.journaled_courses_store import JournaledCoursesStore
+from udemy_autocoupons.udemy_course import CourseWithAnyCoupon, CourseWithCoupon
+
+_CompressedT = tuple[str | tuple[str, str], ...]
+
+
+class _Snapshots:
+    """Saves the snapshots in memory, failing while it is told to."""
+
+    def __init__(self) -> None:
+        """Starts without a snapshot."""
+        self.snapshot: _CompressedT | None = None
+        self.failing = False
+
+    def __call__(self, compressed: _CompressedT) -> None:
+        if self.failing:
+            raise OSError("No space left on device")
+
+        self.snapshot = compressed
+
+
+class _SmallJournaledCoursesStore(JournaledCoursesStore):
+    """A store that is compacted after a few records."""
+
+    _COMPACT_AFTER = 4
+
+
+def _open(
+    path: Path,
+    snapshots: _Snapshots,
+) -> _SmallJournaledCoursesStore:
+    return _SmallJournaledCoursesStore(
+        path,
+        snapshots,
+        snapshots.snapshot,
+    )
+
+
+def _wait_compaction(store: JournaledCoursesStore) -> None:
+    # The store is closed only to wait for the compaction thread
+    store.close()
+
+
+def test_journal_is_replayed(tmp_path: Path) -> None:
+    path = tmp_path / "courses_store.journal"
+    store = JournaledCoursesStore(path, _Snapshots())
+    store.add(CourseWithAnyCoupon("a"))
+    store.add(CourseWithCoupon("b", "COUPON"))
+    store.add(CourseWithCoupon("c", None))
+    store.discard(CourseWithAnyCoupon("a"))
+    store.close()
+
+    store = JournaledCoursesStore(path, _Snapshots())
+
+    assert set(store) == {
+        CourseWithCoupon("b", "COUPON"),
+        CourseWithCoupon("c", None),
+    }
+    store.close()
+
+
+def test_only_changes_are_journaled(tmp_path: Path) -> None:
+    path = tmp_path / "courses_store.journal"
+    store = JournaledCoursesStore(path, _Snapshots())
+    store.add(CourseWithAnyCoupon("a"))
+    store.add(CourseWithAnyCoupon("a"))
+    store.discard(CourseWithAnyCoupon("missing"))
+    store.discard(CourseWithCoupon("a", "COUPON"))
+    store.close()
+
+    assert path.read_bytes().splitlines() == [b'["+","a"]']
+
+
+def test_interrupted_record_is_skipped(tmp_path: Path) -> None:
+    path = tmp_path / "courses_store.journal"
+    path.write_bytes(b'["+","a"]\n["+","b","COU')
+
+    store = JournaledCoursesStore(path, _Snapshots())
+    store.add(CourseWithAnyCoupon("c"))
+    store.close()
+
+    store = JournaledCoursesStore(path, _Snapshots())
+
+    assert set(store) == {CourseWithAnyCoupon("a"), CourseWithAnyCoupon("c")}
+    store.close()
+
+
+def test_compaction_saves_a_snapshot(tmp_path: Path) -> None:
+    path = tmp_path / "courses_store.journal"
+    snapshots = _Snapshots()
+    store = _open(path, snapshots)
+    courses = {CourseWithAnyCoupon(str(index)) for index in range(5)}
+    for course in courses:
+        store.add(course)
+    _wait_compaction(store)
+
+    assert snapshots.snapshot is not None
+    assert len(path.read_bytes().splitlines()) == 1
+    assert not path.with_name(f"{path.name}.compacting").exists()
+
+    store = _open(path, snapshots)
+
+    assert set(store) == courses
+    store.close()
+
+
+def test_failed_compaction_is_retried(tmp_path: Path) -> None:
+    path = tmp_path / "courses_store.journal"
+    compacting_path = path.with_name(f"{path.name}.compacting")
+    snapshots = _Snapshots()
+    snapshots.failing = True
+    store = _open(path, snapshots)
+    for index in range(5):
+        store.add(CourseWithAnyCoupon(str(index)))
+
+    # The records of the failed compaction are moved back to the journal
+    deadline = monotonic() + 5
+    while compacting_path.exists() and monotonic() < deadline:
+        sleep(0.01)
+
+    assert not compacting_path.exists()
+    assert snapshots.snapshot is None
+
+    snapshots.failing = False
+    for index in range(5, 8):
+        store.add(CourseWithAnyCoupon(str(index)))
+    _wait_compaction(store)
+    courses = {CourseWithAnyCoupon(str(index)) for index in range(8)}
+
+    assert snapshots.snapshot is not None
+    assert set(snapshots.snapshot) == {course.url_id for course in courses}
+
+    store = _open(path, snapshots)
+
+    assert set(store) == courses
+    store.close()
+
+
+def test_interrupted_compaction_is_finished(tmp_path: Path) -> None:
+    path = tmp_path / "courses_store.journal"
+    compacting_path = path.with_name(f"{path.name}.compacting")
+    compacting_path.write_bytes(b'["+","a"]\n["+","b"]\n')
+    path.write_bytes(b'["-","a"]\n["+","c","COUPON"]\n')
+    snapshots = _Snapshots()
+
+    store = JournaledCoursesStore(path, snapshots)
+    store.close()
+
+    assert not compacting_path.exists()
+    assert snapshots.snapshot is not None
+
+    store = JournaledCoursesStore(path, snapshots, snapshots.snapshot)
+
+    assert set(store) == {
+        CourseWithAnyCoupon("b"),
+        CourseWithCoupon("c", "COUPON"),
+    }
+    store.close()
@@ -0,0 +1,106 @@
+"""Tests for the saved index and the tombstones of MmapCoursesStore."""
+
+from __future__ import annotations
+
+from pathlib import Path
+
+import pytest
+
+from udemy_autocoupons.mmap_courses_store import MmapCoursesStore
+from udemy_autocoupons.persistent_data import load_courses_store
+from udemy_autocoupons.udemy_course import CourseWithAnyCoupon, CourseWithCoupon
+
+_COURSES = {
+    CourseWithAnyCoupon("a"),
+    CourseWithCoupon("b", "COUPON"),
+    CourseWithCoupon("b", None),
+    CourseWithCoupon("b", ""),
+    CourseWithCoupon("ñandú", "CUPÓN"),
+}
+
+
+def _reopen(store: MmapCoursesStore, path: Path) -> MmapCoursesStore:
+    store.save()
+    store.close()
+
+    return MmapCoursesStore(path)
+
+
+def test_saved_courses_are_mapped(tmp_path: Path) -> None:
+    path = tmp_path / "courses_store.idx"
+    store = MmapCoursesStore(path)
+    for course in _COURSES:
+        store.add(course)
+
+    store = _reopen(store, path)
+
+    assert set(store) == _COURSES
+    assert len(store) == len(_COURSES)
+    assert CourseWithCoupon("a", "OTHER") in store
+    assert CourseWithCoupon("b", "OTHER") not in store
+    assert CourseWithAnyCoupon("b") not in store
+    store.close()
+
+
+def test_unsaved_courses_are_lost(tmp_path: Path) -> None:
+    path = tmp_path / "courses_store.idx"
+    store = MmapCoursesStore(path)
+    store.add(CourseWithAnyCoupon("a"))
+    store = _reopen(store, path)
+
+    store.add(CourseWithAnyCoupon("b"))
+    store.discard(CourseWithAnyCoupon("a"))
+    store.close()
+    store = MmapCoursesStore(path)
+
+    assert set(store) == {CourseWithAnyCoupon("a")}
+    store.close()
+
+
+def test_discarded_courses_are_tombstones(tmp_path: Path) -> None:
+    path = tmp_path / "courses_store.idx"
+    store = MmapCoursesStore(path)
+    for course in _COURSES:
+        store.add(course)
+    store = _reopen(store, path)
+
+    store.discard(CourseWithCoupon("b", None))
+    store.discard(CourseWithAnyCoupon("a"))
+
+    assert CourseWithCoupon("b", None) not in store
+    assert CourseWithCoupon("a", "COUPON") not in store
+    assert len(store) == len(_COURSES) - 2
+
+    # Adding it back removes the tombstone
+    store.add(CourseWithAnyCoupon("a"))
+    store = _reopen(store, path)
+
+    assert set(store) == _COURSES - {CourseWithCoupon("b", None)}
+    store.close()
+
+
+def test_course_with_any_coupon_replaces_saved_coupons(tmp_path: Path) -> None:
+    path = tmp_path / "courses_store.idx"
+    store = MmapCoursesStore(path)
+    store.add(CourseWithCoupon("a", "COUPON"))
+    store = _reopen(store, path)
+
+    store.add(CourseWithAnyCoupon("a"))
+    store = _reopen(store, path)
+    store.discard(CourseWithAnyCoupon("a"))
+
+    assert CourseWithCoupon("a", "COUPON") not in store
+    assert not store
+    store.close()
+
+
+def test_mapped_store_is_not_prefiltered(
+    tmp_path: Path,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    monkeypatch.chdir(tmp_path)
+
+    store = load_courses_store("mmap", prefilter=True)
+
+    assert isinstance(store, MmapCoursesStore)
+    store.close()
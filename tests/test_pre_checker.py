@@ -0,0 +1,195 @@
+"""Tests for PreChecker, against a stub of the Udemy API."""
+
+from __future__ import annotations
+
+from asyncio import run
+from collections.abc import Awaitable, Callable
+from threading import Event
+from typing import Any
+
+from aiohttp import ClientSession, web
+from aiohttp.test_utils import TestServer
+
+from udemy_autocoupons.enroller.state import State
+from udemy_autocoupons.pre_checker import PreChecker
+from udemy_autocoupons.udemy_course import CourseWithCoupon
+
+# The course of every slug, as returned by the stub
+_COURSES = {
+    "free-course": {"id": 1, "is_paid": False},
+    "paid-course": {"id": 2, "is_paid": True},
+    "coupon-course": {"id": 3, "is_paid": True},
+    "broken-course": {"unexpected": True},
+}
+# The slugs with an error response instead
+_ERRORS = {
+    "removed-course": web.HTTPNotFound,
+    "failing-course": web.HTTPServiceUnavailable,
+}
+_HTML_SLUG = "html-course"
+# The price of every course id with its coupon
+_PRICES = {2: 19.99, 3: 0}
+
+
+class _StubApi:
+    """A stub of the endpoints of the Udemy API used by PreChecker."""
+
+    def __init__(self) -> None:
+        """Creates the application and counts the requests."""
+        self.requests = 0
+
+        self.app = web.Application()
+        self.app.router.add_get("/api-2.0/courses/{slug}/", self._course)
+        self.app.router.add_get(
+            "/api-2.0/course-landing-components/{id}/me/",
+            self._price,
+        )
+
+    async def _course(self, request: web.Request) -> web.Response:
+        self.requests += 1
+        slug = request.match_info["slug"]
+
+        if slug in _ERRORS:
+            raise _ERRORS[slug]()
+        if slug == _HTML_SLUG:
+            return web.Response(text="<html></html>", content_type="text/html")
+
+        return web.json_response(_COURSES[slug])
+
+    async def _price(self, request: web.Request) -> web.Response:
+        self.requests += 1
+        price = _PRICES[int(request.match_info["id"])]
+
+        return web.json_response(
+            {
+                "price_text": {
+                    "data": {"pricing_result": {"price": {"amount": price}}},
+                },
+            },
+        )
+
+
+class _NoWaitPreChecker(PreChecker):
+    """A pre-checker that doesn't wait to reattempt, so that tests don't."""
+
+    _REATTEMPT_WAIT = 0
+
+
+def _run_with_stub(
+    test: Callable[[PreChecker, _StubApi], Awaitable[Any]],
+) -> Any:
+    """Runs a test with a PreChecker that requests the stub API.
+
+    Args:
+        test: The test, which receives the checker and the stub.
+
+    Returns:
+        The result of the test.
+
+    """
+
+    async def run_test() -> Any:
+        stub = _StubApi()
+        async with TestServer(stub.app) as server:
+            async with ClientSession() as client:
+                pre_checker = _NoWaitPreChecker(
+                    client,
+                    Event(),
+                    base_url=str(server.make_url("")).rstrip("/"),
+                )
+                return await test(pre_checker, stub)
+
+    return run(run_test())
+
+
+def test_free_course_is_blacklisted() -> None:
+    state = _run_with_stub(
+        lambda pre_checker, _: pre_checker.check(
+            CourseWithCoupon("free-course", "COUPON"),
+        ),
+    )
+
+    assert state is State.TO_BLACKLIST
+
+
+def test_course_with_price_is_paid() -> None:
+    state = _run_with_stub(
+        lambda pre_checker, _: pre_checker.check(
+            CourseWithCoupon("paid-course", "COUPON"),
+        ),
+    )
+
+    assert state is State.PAID
+
+
+def test_course_without_price_is_enrollable() -> None:
+    state = _run_with_stub(
+        lambda pre_checker, _: pre_checker.check(
+            CourseWithCoupon("coupon-course", "COUPON"),
+        ),
+    )
+
+    assert state is State.ENROLLABLE
+
+
+def _check_in_order(*slugs: str) -> tuple[list[State], int]:
+    """Checks courses one after the other.
+
+    Args:
+        slugs: The slugs of the courses.
+
+    Returns:
+        The states of the courses, and the requests made for the last one.
+
+    """
+
+    async def check_all(
+        pre_checker: PreChecker,
+        stub: _StubApi,
+    ) -> tuple[list[State], int]:
+        states = []
+        requests = 0
+        for slug in slugs:
+            requests = stub.requests
+            states.append(
+                await pre_checker.check(CourseWithCoupon(slug, "COUPON")),
+            )
+
+        return states, stub.requests - requests
+
+    return _run_with_stub(check_all)
+
+
+def test_consecutive_failures_disable_the_checks() -> None:
+    states, requests = _check_in_order(*["failing-course"] * 10, "free-course")
+
+    assert states == [State.ENROLLABLE] * 11
+    # The API is not requested anymore, and courses are left to the driver
+    assert requests == 0
+
+
+def test_responses_reset_the_failures() -> None:
+    states, _ = _check_in_order(
+        *["failing-course"] * 9,
+        "broken-course",
+        *["failing-course"] * 9,
+        "free-course",
+    )
+
+    assert states == [State.ENROLLABLE] * 19 + [State.TO_BLACKLIST]
+
+
+def test_missing_courses_dont_disable_the_checks() -> None:
+    states, _ = _check_in_order(
+        *["removed-course"] * 10,
+        *[_HTML_SLUG] * 10,
+        "free-course",
+    )
+
+    assert states == [State.ENROLLABLE] * 20 + [State.TO_BLACKLIST]
+
+
+def test_failed_check_is_reattempted() -> None:
+    _, requests = _check_in_order("failing-course")
+
+    assert requests == 2
@@ -0,0 +1,69 @@
+"""Tests for the pre-checks of QueueManager."""
+
+from __future__ import annotations
+
+from asyncio import run, sleep, wait_for
+from threading import Event
+
+import pytest
+
+from udemy_autocoupons.course_queue import CourseQueue
+from udemy_autocoupons.courses_store import CoursesStore
+from udemy_autocoupons.enroller.state import State
+from udemy_autocoupons.queue_manager import QueueManager
+from udemy_autocoupons.scraped_url import ScrapedUrl
+from udemy_autocoupons.udemy_course import CourseWithCoupon
+
+_COURSES = [
+    CourseWithCoupon("some-course", "COUPON"),
+    CourseWithCoupon("other-course", "COUPON"),
+]
+
+
+class _FakePreChecker:
+    """Stands for a PreChecker, raising the given error on every check."""
+
+    def __init__(self, error: Exception) -> None:
+        """Stores the error to raise."""
+        self._error = error
+
+    async def check(self, _: CourseWithCoupon) -> State:
+        raise self._error
+
+
+async def _pre_check(error: Exception) -> CourseQueue:
+    """Processes the urls of the courses with a pre-checker that fails.
+
+    Args:
+        error: The error that the pre-checker raises.
+
+    Returns:
+        The multithreading queue, once the courses are in it.
+
+    """
+    manager = QueueManager(
+        CoursesStore(),
+        Event(),
+        pre_checker=_FakePreChecker(error),  # type: ignore
+    )
+    for course in _COURSES:
+        await manager.async_queue.put(ScrapedUrl(course.url, "test"))
+        # It never ends if the error stopped the manager
+        await wait_for(manager.async_queue.join(), 5)
+
+    for _ in range(100):
+        if manager.mt_queue.qsize() == len(_COURSES):
+            break
+        await sleep(0.01)
+
+    return manager.mt_queue
+
+
+@pytest.mark.parametrize(
+    "error",
+    [ValueError("Not JSON"), KeyError("id"), RuntimeError("A bug")],
+)
+def test_courses_that_fail_the_pre_check_are_queued(error: Exception) -> None:
+    mt_queue = run(_pre_check(error))
+
+    assert {mt_queue.get_nowait() for _ in _COURSES} == set(_COURSES)
@@ -0,0 +1,190 @@
+"""Tests for SupervisedDriver, with a fake driver instead of Chrome."""
+
+from __future__ import annotations
+
+from collections.abc import Callable
+from threading import Event
+
+import pytest
+from selenium.common.exceptions import (
+    InvalidSessionIdException,
+    SessionNotCreatedException,
+    WebDriverException,
+)
+
+from udemy_autocoupons.enroller.state import EnrollResultT, State
+from udemy_autocoupons.enroller.supervised_driver import (
+    DriverRestarted,
+    DriverUnavailable,
+    SupervisedDriver,
+)
+from udemy_autocoupons.udemy_course import CourseWithCoupon
+
+_COURSE = CourseWithCoupon("some-course", "COUPON")
+_DEADLINE = 0.2
+# The driver is started once, and then restarted up to 3 times in a row
+_MAX_STARTS = 4
+
+
+class _FakeDriver:
+    """Stands for a UdemyDriver, running a given function to enroll."""
+
+    def __init__(self, enroll: Callable[[], EnrollResultT]) -> None:
+        """Stores the function to run on every enrollment."""
+        self.quit_called = False
+        self.kill_called = False
+        self.hung_quit: Event | None = None
+        self._enroll = enroll
+
+    def enroll(self, *_: object) -> EnrollResultT:
+        return self._enroll()
+
+    def quit(self) -> None:
+        self.quit_called = True
+
+        if self.hung_quit:
+            self.hung_quit.wait(_DEADLINE * 10)
+
+    def kill(self) -> None:
+        self.kill_called = True
+
+
+class _FakeDrivers:
+    """Creates fake drivers, using one enroll function for each of them."""
+
+    def __init__(self, *enrolls: Callable[[], EnrollResultT]) -> None:
+        """Stores the functions of the drivers, in order."""
+        self.created: list[_FakeDriver] = []
+        self._enrolls = list(enrolls)
+
+    def __call__(self) -> _FakeDriver:
+        driver = _FakeDriver(self._enrolls.pop(0))
+        self.created.append(driver)
+
+        return driver
+
+
+class _ShortQuitSupervisedDriver(SupervisedDriver):
+    """A supervised driver that kills a driver as soon as quitting hangs."""
+
+    _QUIT_DEADLINE = _DEADLINE
+
+
+def _enrolled() -> EnrollResultT:
+    return State.ENROLLED
+
+
+def _crash() -> EnrollResultT:
+    raise InvalidSessionIdException("invalid session id")
+
+
+def _supervise(drivers: _FakeDrivers) -> SupervisedDriver:
+    return _ShortQuitSupervisedDriver(drivers, deadline=_DEADLINE)  # type: ignore
+
+
+def test_enrolls_with_the_driver() -> None:
+    drivers = _FakeDrivers(_enrolled)
+
+    assert _supervise(drivers).enroll(_COURSE) is State.ENROLLED
+    assert len(drivers.created) == 1
+
+
+def test_crashed_driver_is_restarted() -> None:
+    drivers = _FakeDrivers(_crash, _enrolled)
+    driver = _supervise(drivers)
+
+    with pytest.raises(DriverRestarted):
+        driver.enroll(_COURSE)
+
+    assert drivers.created[0].quit_called
+    assert driver.enroll(_COURSE) is State.ENROLLED
+    assert len(drivers.created) == 2
+
+
+def test_hung_driver_is_restarted() -> None:
+    release = Event()
+
+    def hang() -> EnrollResultT:
+        release.wait(_DEADLINE * 10)
+        return State.ENROLLED
+
+    drivers = _FakeDrivers(hang, _enrolled)
+    driver = _supervise(drivers)
+
+    with pytest.raises(DriverRestarted):
+        driver.enroll(_COURSE)
+    release.set()
+
+    assert drivers.created[0].quit_called
+    assert driver.enroll(_COURSE) is State.ENROLLED
+
+
+def test_driver_that_hangs_quitting_is_killed() -> None:
+    release = Event()
+    hung = _FakeDriver(_crash)
+    hung.hung_quit = release
+    drivers = _FakeDrivers(_enrolled)
+    created = iter([hung])
+    driver = _ShortQuitSupervisedDriver(
+        lambda: next(created, None) or drivers(),  # type: ignore
+        deadline=_DEADLINE,
+    )
+
+    with pytest.raises(DriverRestarted):
+        driver.enroll(_COURSE)
+    release.set()
+
+    assert hung.kill_called
+    assert driver.enroll(_COURSE) is State.ENROLLED
+
+
+def test_other_errors_are_not_restarts() -> None:
+    def fail() -> EnrollResultT:
+        raise ValueError("A bug")
+
+    def fail_in_browser() -> EnrollResultT:
+        raise WebDriverException("Some other error")
+
+    drivers = _FakeDrivers(fail)
+    driver = _supervise(drivers)
+
+    with pytest.raises(ValueError, match="A bug"):
+        driver.enroll(_COURSE)
+
+    assert not drivers.created[0].quit_called
+
+    drivers = _FakeDrivers(fail_in_browser)
+    driver = _supervise(drivers)
+
+    with pytest.raises(WebDriverException, match="Some other error"):
+        driver.enroll(_COURSE)
+
+    assert not drivers.created[0].quit_called
+
+
+def test_driver_that_cant_start_is_unavailable() -> None:
+    starts = 0
+
+    def create_driver() -> _FakeDriver:
+        nonlocal starts
+        starts += 1
+        raise SessionNotCreatedException("Chrome can't be started")
+
+    driver = SupervisedDriver(create_driver)  # type: ignore
+
+    with pytest.raises(DriverUnavailable):
+        driver.enroll(_COURSE)
+
+    assert starts == _MAX_STARTS
+
+
+def test_driver_that_keeps_crashing_is_unavailable() -> None:
+    drivers = _FakeDrivers(*[_crash] * 10)
+    driver = _supervise(drivers)
+
+    for _ in range(_MAX_STARTS):
+        with pytest.raises(DriverRestarted):
+            driver.enroll(_COURSE)
+
+    with pytest.raises(DriverUnavailable):
+        driver.enroll(_COURSE)
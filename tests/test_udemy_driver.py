@@ -0,0 +1,122 @@
+"""Tests for the tabs and the cart of UdemyDriver, with a fake Chrome."""
+
+from __future__ import annotations
+
+from typing import Any
+
+import pytest
+
+from udemy_autocoupons.enroller import udemy_driver
+from udemy_autocoupons.enroller.state import State
+from udemy_autocoupons.enroller.udemy_driver import UdemyDriver
+from udemy_autocoupons.udemy_course import CourseWithCoupon
+
+_COURSE = CourseWithCoupon("some-course", "COUPON")
+
+
+class _FakeSwitchTo:
+    """Switches the current window of the fake Chrome."""
+
+    def __init__(self, chrome: _FakeChrome) -> None:
+        """Stores the fake Chrome."""
+        self._chrome = chrome
+
+    def window(self, handle: str) -> None:
+        self._chrome.current_window_handle = handle
+
+
+class _FakeChrome:
+    """Records the CDP commands with the window that they were sent to."""
+
+    def __init__(self, **_: object) -> None:
+        """Starts with the main window only."""
+        self.current_window_handle = "main"
+        self.switch_to = _FakeSwitchTo(self)
+        self.commands: list[tuple[str, str, dict[str, Any]]] = []
+
+    def get(self, url: str) -> None:
+        self.commands.append((self.current_window_handle, "get", {"url": url}))
+
+    def execute_cdp_cmd(self, cmd: str, params: dict[str, Any]) -> Any:
+        self.commands.append((self.current_window_handle, cmd, params))
+
+        return {"targetId": "prefetched"}
+
+
+@pytest.fixture(name="chrome")
+def _chrome(monkeypatch: pytest.MonkeyPatch) -> list[_FakeChrome]:
+    started: list[_FakeChrome] = []
+
+    def start(**kwargs: object) -> _FakeChrome:
+        started.append(_FakeChrome(**kwargs))
+        return started[-1]
+
+    monkeypatch.setattr(udemy_driver, "Chrome", start)
+
+    return started
+
+
+def _blocking_windows(chrome: _FakeChrome) -> list[str]:
+    return [
+        window
+        for window, cmd, _ in chrome.commands
+        if cmd == "Network.setBlockedURLs"
+    ]
+
+
+def test_lean_prefetched_tab_blocks_resources(
+    chrome: list[_FakeChrome],
+) -> None:
+    driver = UdemyDriver("Default", "user-data-dir", lean=True)
+    driver.prefetch(_COURSE)
+    (fake,) = chrome
+
+    assert _blocking_windows(fake) == ["main", "prefetched"]
+    assert fake.commands[-4:] == [
+        (
+            "main",
+            "Target.createTarget",
+            {"url": "about:blank", "background": True},
+        ),
+        ("prefetched", "Network.enable", {}),
+        ("prefetched", "Network.setBlockedURLs", fake.commands[-2][2]),
+        ("prefetched", "Page.navigate", {"url": _COURSE.url}),
+    ]
+    assert fake.current_window_handle == "main"
+
+
+def test_prefetched_tab_loads_the_course(chrome: list[_FakeChrome]) -> None:
+    driver = UdemyDriver("Default", "user-data-dir")
+    driver.prefetch(_COURSE)
+    (fake,) = chrome
+
+    assert not _blocking_windows(fake)
+    assert fake.commands == [
+        (
+            "main",
+            "Target.createTarget",
+            {"url": _COURSE.url, "background": True},
+        ),
+    ]
+
+
+@pytest.mark.parametrize(
+    "in_cart",
+    [{"other-course"}, {_COURSE.url_id, "other-course"}, set()],
+)
+def test_unexpected_cart_is_not_checked_out(
+    chrome: list[_FakeChrome],
+    monkeypatch: pytest.MonkeyPatch,
+    in_cart: set[str],
+) -> None:
+    driver = UdemyDriver("Default", "user-data-dir")
+    monkeypatch.setattr(driver, "_wait_for_cart", lambda: None)
+    monkeypatch.setattr(driver, "_cart_items", lambda: dict.fromkeys(in_cart))
+
+    def click_checkout() -> None:
+        pytest.fail("The cart was checked out")
+
+    monkeypatch.setattr(driver, "_click_cart_checkout", click_checkout)
+
+    assert driver.checkout_cart([_COURSE]) is State.ERROR
+    assert chrome[0].commands[-1][1] == "get"
@@ -3,27 +3,42 @@
 from __future__ import annotations
 
 from asyncio import TaskGroup, run
+from collections.abc import Callable
+from datetime import timedelta
+from functools import partial
 from logging import getLogger
 from queue import Queue as MtQueue
+from statistics import fmean, median
 from threading import Event, Thread
 
 from aiohttp import ClientSession
 from dotenv import load_dotenv
 
+from udemy_autocoupons.checkpointer import Checkpointer
+from udemy_autocoupons.course_queue import CourseQueue
+from udemy_autocoupons.courses_store import BaseCoursesStore
+from udemy_autocoupons.daemon import run_daemon
+from udemy_autocoupons.enroller.timings import Timings
 from udemy_autocoupons.loggers import setup_loggers
 from udemy_autocoupons.parse_arguments import parse_arguments
 from udemy_autocoupons.persistent_data import (
+    dump_scrapers_data,
     load_courses_store,
     load_errors,
     load_scrapers_data,
+    open_course_journal,
     save_courses_store,
     save_errors,
     save_scrapers_data,
+    save_timings_report,
+    write_scrapers_data,
 )
-from udemy_autocoupons.queue_manager import QueueManager
+from udemy_autocoupons.pre_checker import PreChecker
+from udemy_autocoupons.queue_manager import AgePolicy, QueueManager
 from udemy_autocoupons.run_driver import run_driver
 from udemy_autocoupons.scrapers import ScrapersT, scraper_types
 from udemy_autocoupons.setup.setup_telegram import setup_telegram
+from udemy_autocoupons.udemy_course import CourseWithCoupon
 
 
 async def main() -> None:
@@ -33,6 +48,9 @@ async def main() -> None:
     are then validated, parsed and sent to another queue, where a listening
     thread uses a WebDriver to enroll in all provided courses.
 
+    In daemon mode, the scrapers are run periodically and the drivers are kept
+    open between them, until the run is stopped.
+
     """
     debug = getLogger("debug")
     printer = getLogger("printer")
@@ -43,57 +61,97 @@ async def main() -> None:
         return
 
     scrapers_data = load_scrapers_data()
-    courses_store = load_courses_store()
+    courses_store = load_courses_store(args["store"], args["prefilter"])
     errors = load_errors()
+    journal = open_course_journal()
+    redelivered = journal.unacknowledged()
 
     debug.debug("Got scrapers data %s", scraper_types[0].__name__)
 
     stop_event = Event()
+    timings = Timings()
 
-    # Listen for urls in the async queue
-    async with QueueManager(courses_store, stop_event) as (
-        async_queue,
-        mt_queue,
-    ):
-        for error in errors:
-            mt_queue.put(error)
-
-        printer.info("Reattempting %s previously failed courses", len(errors))
-        new_errors_queue = MtQueue()
-
-        # Listen for courses in the multithreading queue
-        thread = Thread(
-            target=run_driver,
-            args=(
-                mt_queue,
-                courses_store,
-                new_errors_queue,
+    async with ClientSession() as client:
+        pre_checker = (
+            PreChecker(client, stop_event) if args["pre_check"] else None
+        )
+
+        # Listen for urls in the async queue
+        queue_manager = QueueManager(
+            courses_store,
+            stop_event,
+            args["workers"],
+            pre_checker,
+            (
+                AgePolicy(
+                    timedelta(hours=args["max_coupon_age"]),
+                    args["drop_stale"],
+                )
+                if args["max_coupon_age"]
+                else None
+            ),
+            args["scraped_queue_size"],
+            args["course_queue_size"],
+            journal,
+        )
+        scrapers: ScrapersT = tuple(
+            scraper_type(
+                queue_manager.async_queue,
+                client,
+                scrapers_data[scraper_type.__name__],
                 stop_event,
-                args["profile_directory"],
-                args["user_data_dir"],
+            )
+            for scraper_type in scraper_types
+        )  # type: ignore
+
+        # Save the progress during the run, and on SIGINT or SIGTERM
+        checkpointer = Checkpointer(
+            partial(
+                _snapshot_checkpoint,
+                scrapers,
+                courses_store,
+                queue_manager.mt_queue,
+                errors,
             ),
-            name="UdemyDriverThread",
-            daemon=True,
+            stop_event,
+            args["checkpoint_every"],
         )
-        thread.start()
-        debug.debug("UdemyDriverThread started")
-
-        async with ClientSession() as client:
-            scrapers: ScrapersT = tuple(
-                scraper_type(
-                    async_queue,
-                    client,
-                    scrapers_data[scraper_type.__name__],
+        async with checkpointer, queue_manager as (_, mt_queue):
+            new_errors_queue = MtQueue()
+
+            # Listen for courses in the multithreading queue
+            thread = Thread(
+                target=run_driver,
+                args=(
+                    mt_queue,
+                    courses_store,
+                    new_errors_queue,
                     stop_event,
+                    timings,
+                    checkpointer.record_stored,
+                    args,
+                ),
+                name="UdemyDriverPoolThread",
+                daemon=True,
+            )
+            thread.start()
+            debug.debug("UdemyDriverPoolThread started")
+
+            # The queue may be bounded, so the driver must be already running
+            if redelivered:
+                printer.info(
+                    "Redelivering %s courses left unfinished by a crash",
+                    len(redelivered),
                 )
-                for scraper_type in scraper_types
-            )  # type: ignore
-
-            async with TaskGroup() as task_group:
-                # Start scrapers
-                for scraper in scrapers:
-                    task_group.create_task(scraper.scrap())
-            # Wait for scrapers to finish
+            await queue_manager.put_redelivered(redelivered)
+
+            printer.info(
+                "Reattempting %s previously failed courses",
+                len(errors),
+            )
+            await queue_manager.put_retried(errors)
+
+            await _run_scrapers(scrapers, args["daemon"], stop_event)
             debug.debug("All scrapers finished")
     # Wait for queues to finish
     # Wait for thread to finish
@@ -106,6 +164,35 @@ async def main() -> None:
     save_scrapers_data(scrapers)
     save_courses_store(courses_store)
     save_errors(errors)
+    # The unfinished courses are in the errors now
+    journal.clear()
+    journal.close()
+
+    if load_times := timings.durations("get"):
+        printer.info(
+            "Loaded %s courses in %.2fs on average, median %.2fs (lean browsing %s)",
+            len(load_times),
+            fmean(load_times),
+            median(load_times),
+            "on" if args["lean"] else "off",
+        )
+
+    report_path = save_timings_report(
+        timings.create_report(
+            {
+                key: args[key]
+                for key in (
+                    "workers",
+                    "event_waits",
+                    "lean",
+                    "pre_check",
+                    "prefetch_tabs",
+                    "cart_batch",
+                )
+            },
+        ),
+    )
+    debug.debug("Saved timings report to %s", report_path)
 
     printer.info(
         "Finished run. %s courses will be reattempted on next run",
@@ -113,6 +200,96 @@ async def main() -> None:
     )
 
 
+async def _run_scrapers(
+    scrapers: ScrapersT,
+    daemon: bool,
+    stop_event: Event,
+) -> None:
+    """Runs the scrapers until they finish, and then closes them.
+
+    Args:
+        scrapers: The scrapers to run.
+        daemon: Whether to run them periodically until the stop event is set,
+        instead of once.
+        stop_event: The event that stops the daemon when set.
+
+    """
+    try:
+        await (
+            run_daemon(scrapers, stop_event)
+            if daemon
+            else _scrap_once(scrapers)
+        )
+    finally:
+        for scraper in scrapers:
+            await scraper.close()
+
+
+async def _scrap_once(scrapers: ScrapersT) -> None:
+    """Runs all the scrapers once, concurrently.
+
+    Args:
+        scrapers: The scrapers to run.
+
+    """
+    async with TaskGroup() as task_group:
+        for scraper in scrapers:
+            task_group.create_task(scraper.scrap())
+
+
+def _snapshot_checkpoint(
+    scrapers: ScrapersT,
+    courses_store: BaseCoursesStore,
+    mt_queue: CourseQueue,
+    previous_errors: list[CourseWithCoupon],
+) -> Callable[[], None]:
+    """Takes the data that changes while the run is going on.
+
+    The courses that are not finished yet are saved as errors, so that they
+    are attempted again if the run does not finish.
+
+    Args:
+        scrapers: The scrapers, whose persistent data is saved.
+        courses_store: The courses store to save.
+        mt_queue: The queue with the unfinished courses.
+        previous_errors: The errors of the previous run.
+
+    Returns:
+        The function that saves the data, which can run in another thread.
+
+    """
+    errors = [
+        course
+        for course in dict.fromkeys([*previous_errors, *mt_queue.unfinished()])
+        if course not in courses_store
+    ]
+
+    return partial(
+        _save_checkpoint,
+        dump_scrapers_data(scrapers),
+        courses_store,
+        errors,
+    )
+
+
+def _save_checkpoint(
+    scrapers_data: bytes,
+    courses_store: BaseCoursesStore,
+    errors: list[CourseWithCoupon],
+) -> None:
+    """Saves the data taken by _snapshot_checkpoint.
+
+    Args:
+        scrapers_data: The pickled persistent data of the scrapers.
+        courses_store: The courses store to save, which is thread-safe.
+        errors: The courses to save as errors.
+
+    """
+    write_scrapers_data(scrapers_data)
+    save_courses_store(courses_store)
+    save_errors(errors)
+
+
 if __name__ == "__main__":
     load_dotenv()
     setup_loggers()
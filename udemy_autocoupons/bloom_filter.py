@@ -0,0 +1,85 @@
+"""This module contains the BloomFilter class."""
+
+from __future__ import annotations
+
+from math import ceil, log
+from zlib import crc32
+
+
+class BloomFilter:
+    """A set of strings that can give false positives, but no false negatives.
+
+    The positions of the bits of a string are derived from the CRC32 of the
+    string and of its reverse, so that they are the same across runs and the
+    filter can be pickled. They are much cheaper than a cryptographic hash,
+    with the same rate of false positives. Strings can't be removed.
+
+    """
+
+    def __init__(self, capacity: int, error_rate: float = 0.01) -> None:
+        """Creates an empty filter.
+
+        Args:
+            capacity: The number of strings for which the false positive rate
+            is error_rate. The size of the filter is fixed, so the rate gets
+            worse if more strings are added, see is_full.
+            error_rate: The rate of false positives when it is full.
+
+        """
+        self.capacity = capacity
+        self.count = 0
+
+        bits = ceil(-capacity * log(error_rate) / log(2) ** 2)
+        self._bits = bytearray(ceil(bits / 8))
+        self._size = len(self._bits) * 8
+        self._hashes = max(round(self._size / capacity * log(2)), 1)
+
+    def __contains__(self, key: str) -> bool:
+        """Checks if the string may have been added."""
+        first, second = _hash(key)
+        for index in range(self._hashes):
+            position = (first + index * second) % self._size
+            # Most strings that were not added stop at the first bits
+            if not self._bits[position >> 3] & 1 << (position & 7):
+                return False
+
+        return True
+
+    @property
+    def is_full(self) -> bool:
+        """Whether more strings were added than its capacity."""
+        return self.count > self.capacity
+
+    def add(self, key: str) -> None:
+        """Adds a string to the filter.
+
+        Args:
+            key: The string to add.
+
+        """
+        first, second = _hash(key)
+        is_new = False
+        for index in range(self._hashes):
+            position = (first + index * second) % self._size
+            mask = 1 << (position & 7)
+            if not self._bits[position >> 3] & mask:
+                self._bits[position >> 3] |= mask
+                is_new = True
+
+        if is_new:
+            self.count += 1
+
+
+def _hash(key: str) -> tuple[int, int]:
+    """Gets the two hashes of a string for double hashing.
+
+    Args:
+        key: The string.
+
+    Returns:
+        The hashes, where the second one is odd.
+
+    """
+    encoded = key.encode()
+
+    return crc32(encoded), crc32(encoded[::-1]) | 1
@@ -0,0 +1,191 @@
+"""This module contains the Checkpointer class."""
+
+from __future__ import annotations
+
+from asyncio import (
+    AbstractEventLoop,
+    Event as AsyncEvent,
+    Task,
+    TimeoutError as AsyncTimeoutError,
+    create_task,
+    get_running_loop,
+    to_thread,
+    wait_for,
+)
+from collections.abc import Callable
+from logging import getLogger
+from pickle import PickleError
+from signal import SIGINT, SIGTERM, Signals, signal
+from sqlite3 import Error as SqliteError
+from threading import Event, Lock
+from time import monotonic
+from types import FrameType
+from typing import Any
+
+from udemy_autocoupons.constants import CHECKPOINT_INTERVAL
+from udemy_autocoupons.data_file import DataFileError
+
+_debug = getLogger("debug")
+_printer = getLogger("printer")
+
+_SIGNALS = (SIGINT, SIGTERM)
+# What saving the data files, the pickles and the SQLite stores can raise
+_SAVE_ERRORS = (OSError, PickleError, SqliteError, DataFileError)
+
+
+class Checkpointer:
+    """A context manager that saves the persistent data during the run.
+
+    It should be used as an async context manager, in the main thread.
+
+    The data is saved every interval, after a number of courses are stored,
+    and when the process receives SIGINT or SIGTERM. The signal also sets the
+    stop event once the data is saved, so that the run finishes as usual, and
+    a second one stops the process right away.
+
+    The snapshot function is always called from the event loop, so it can read
+    the scrapers data safely. The function that it returns writes the data in
+    another thread, so that the event loop keeps running meanwhile, and only
+    one checkpoint is written at a time.
+
+    """
+
+    _STOP_CHECK_INTERVAL = 1  # Seconds
+
+    def __init__(
+        self,
+        snapshot: Callable[[], Callable[[], None]],
+        stop_event: Event,
+        every_stored: int = 0,
+        interval: float = CHECKPOINT_INTERVAL,
+    ) -> None:
+        """Stores provided parameters.
+
+        Args:
+            snapshot: The function that takes the persistent data, returning
+            the function that saves it.
+            stop_event: The event to set when a signal is received. No more
+            checkpoints are saved when it is set.
+            every_stored: The number of stored courses after which the data is
+            saved, 0 to only save it periodically.
+            interval: The maximum seconds between checkpoints.
+
+        """
+        self._snapshot = snapshot
+        self._stop_event = stop_event
+        self._every_stored = every_stored
+        self._interval = interval
+
+        self._stored_counter = 0
+        self._lock = Lock()
+        self._requested = AsyncEvent()
+        # Set by a signal, the stop event is set after the next checkpoint
+        self._stopping = False
+        self._closing = False
+        self._loop: AbstractEventLoop | None = None
+        self._task: Task[None] | None = None
+        self._previous_handlers: dict[Signals, Any] = {}
+
+    async def __aenter__(self) -> Checkpointer:
+        """Starts saving checkpoints and handling the signals."""
+        self._loop = get_running_loop()
+        self._task = create_task(self._run())
+
+        for signal_number in _SIGNALS:
+            self._previous_handlers[signal_number] = signal(
+                signal_number,
+                self._handle_signal,
+            )
+
+        return self
+
+    async def __aexit__(self, *_) -> None:
+        """Stops saving checkpoints and restores the signal handlers.
+
+        A checkpoint that is being written is finished first, so that it
+        doesn't overlap with the save at the end of the run.
+
+        """
+        self._restore_handlers()
+
+        if self._task:
+            self._closing = True
+            self._requested.set()
+            await self._task
+
+    def record_stored(self) -> None:
+        """Counts a stored course, requesting a checkpoint if it is due.
+
+        It is thread-safe, so it can be called by the enrollers.
+
+        """
+        if not self._every_stored or not self._loop:
+            return
+
+        with self._lock:
+            self._stored_counter += 1
+            due = not self._stored_counter % self._every_stored
+
+        if due:
+            self._loop.call_soon_threadsafe(self._requested.set)
+
+    async def _run(self) -> None:
+        """Saves a checkpoint when requested or due, until stopped."""
+        next_save = monotonic() + self._interval
+
+        while not self._stop_event.is_set():
+            try:
+                await wait_for(
+                    self._requested.wait(),
+                    self._STOP_CHECK_INTERVAL,
+                )
+            except AsyncTimeoutError:
+                if monotonic() < next_save:
+                    continue
+
+            if self._closing:
+                return
+
+            await self._checkpoint()
+            next_save = monotonic() + self._interval
+
+            if self._stopping:
+                self._stop_event.set()
+
+    async def _checkpoint(self) -> None:
+        """Saves the persistent data from another thread, logging any error."""
+        self._requested.clear()
+
+        _debug.debug("Saving checkpoint")
+        try:
+            await to_thread(self._snapshot())
+        except _SAVE_ERRORS:
+            _debug.exception("Could not save checkpoint")
+            _printer.error("Could not save the progress, check the logs.")
+
+    def _handle_signal(self, signal_number: int, _: FrameType | None) -> None:
+        """Requests a checkpoint and the stop of the run from the event loop.
+
+        Args:
+            signal_number: The received signal.
+
+        """
+        assert self._loop
+
+        _debug.debug("Received signal %s", signal_number)
+        self._loop.call_soon_threadsafe(self._stop)
+
+    def _stop(self) -> None:
+        """Requests a checkpoint, after which the stop event is set."""
+        _printer.info("Stopping, press Ctrl+C again to exit right away.")
+
+        self._restore_handlers()
+        self._stopping = True
+        self._requested.set()
+
+    def _restore_handlers(self) -> None:
+        """Restores the signal handlers that were set before entering."""
+        for signal_number, handler in self._previous_handlers.items():
+            signal(signal_number, handler)
+
+        self._previous_handlers.clear()
@@ -0,0 +1,453 @@
+"""This module contains the CompactCoursesStore class."""
+
+from __future__ import annotations
+
+from array import array
+from bisect import bisect_left
+from collections.abc import Iterable, Iterator
+from threading import RLock
+
+from udemy_autocoupons.courses_store import BaseCoursesStore
+from udemy_autocoupons.udemy_course import (
+    CourseWithAnyCoupon,
+    CourseWithCoupon,
+    UdemyCourseT,
+    is_with_any_coupon,
+    is_with_specific_coupon,
+)
+
+# Sorted arrays are rebuilt when the pending items reach this many, or this
+# fraction of the array, so that the cost of rebuilding them is amortized
+_MERGE_AFTER = 4096
+_MERGE_FRACTION = 64
+
+# Index keys pack a truncated hash of the string and its id
+_ID_BITS = 24
+_ID_MASK = (1 << _ID_BITS) - 1
+_HASH_MASK = (1 << (64 - _ID_BITS)) - 1
+
+# Pairs pack the slug id and the coupon id, where 0 is no coupon
+_COUPON_BITS = 32
+
+
+class _StringTable:
+    """Interned strings with integer ids, stored in a single buffer.
+
+    The strings are found through a sorted array of keys, which pack a hash
+    of the string and its id. New strings are kept in a dict until they are
+    merged into the array. Strings are never removed.
+
+    """
+
+    def __init__(self) -> None:
+        """Creates an empty table."""
+        self._buffer = bytearray()
+        self._offsets = array("Q", [0])
+        self._keys = array("Q")
+        self._pending: dict[str, int] = {}
+
+    def __len__(self) -> int:
+        """Returns the number of strings."""
+        return len(self._offsets) - 1
+
+    def __getitem__(self, string_id: int) -> str:
+        """Gets the string with the given id."""
+        return self._buffer[
+            self._offsets[string_id] : self._offsets[string_id + 1]
+        ].decode()
+
+    def find(self, string: str) -> int | None:
+        """Gets the id of a string.
+
+        Args:
+            string: The string to find.
+
+        Returns:
+            The id, or None if the string is not in the table.
+
+        """
+        if (string_id := self._pending.get(string)) is not None:
+            return string_id
+
+        truncated_hash = hash(string) & _HASH_MASK
+        encoded = string.encode()
+
+        index = bisect_left(self._keys, truncated_hash << _ID_BITS)
+        while (
+            index < len(self._keys)
+            and self._keys[index] >> _ID_BITS == truncated_hash
+        ):
+            string_id = self._keys[index] & _ID_MASK
+            start, end = self._offsets[string_id], self._offsets[string_id + 1]
+            if self._buffer[start:end] == encoded:
+                return string_id
+            index += 1
+
+        return None
+
+    def intern(self, string: str) -> int:
+        """Gets the id of a string, adding it if needed.
+
+        Args:
+            string: The string to intern.
+
+        Returns:
+            The id of the string.
+
+        """
+        if (string_id := self.find(string)) is not None:
+            return string_id
+
+        if (string_id := len(self)) > _ID_MASK:
+            raise OverflowError("Too many strings")
+
+        self._buffer += string.encode()
+        self._offsets.append(len(self._buffer))
+        self._pending[string] = string_id
+
+        return string_id
+
+    def merge(self, force: bool = False) -> None:
+        """Merges the new strings into the sorted array, if there are enough.
+
+        Args:
+            force: Whether to merge them even if there are a few.
+
+        """
+        if not self._pending or (
+            not force and not _should_merge(len(self._pending), len(self._keys))
+        ):
+            return
+
+        self._keys = _merge_sorted(
+            self._keys,
+            (
+                (hash(string) & _HASH_MASK) << _ID_BITS | string_id
+                for string, string_id in self._pending.items()
+            ),
+        )
+        self._pending.clear()
+
+
+class CompactCoursesStore(BaseCoursesStore):
+    """A set-like store for mixed UdemyCourse instances, packed in arrays.
+
+    The url_ids and coupons are interned into string tables, so each course
+    is stored as integers instead of an object with its own strings. Courses
+    with any coupon are a flag per url_id, and courses with a specific coupon
+    are (url_id, coupon) pairs packed in a sorted array. This uses a fraction
+    of the memory of CoursesStore, with the same semantics.
+
+    All the methods are thread-safe.
+
+    """
+
+    def __init__(self, *args: UdemyCourseT) -> None:
+        """Adds all passed courses to the store."""
+        self._slugs = _StringTable()
+        self._coupons = _StringTable()
+
+        # Whether each url_id has any coupon, by its id
+        self._any_coupon = bytearray()
+        self._any_coupon_count = 0
+
+        self._pairs = array("Q")
+        self._pending_pairs: set[int] = set()
+        # The url_ids that may have pending pairs, so that they are only
+        # searched when needed
+        self._pending_slug_ids: set[int] = set()
+
+        self._lock = RLock()
+
+        with self._lock:
+            for course in args:
+                self._add(course)
+            self._merge(force=True)
+
+    def __contains__(self, course: object) -> bool:
+        """Checks if the given element is in the store."""
+        if not isinstance(course, UdemyCourseT):
+            return False
+
+        with self._lock:
+            if (slug_id := self._slugs.find(course.url_id)) is None:
+                return False
+
+            if self._any_coupon[slug_id]:
+                return True
+
+            if course.any_coupon:
+                return False
+
+            if (pair := self._find_pair(slug_id, course.coupon)) is None:
+                return False
+
+            return pair in self._pending_pairs or _contains_sorted(
+                self._pairs,
+                pair,
+            )
+
+    def __iter__(self) -> Iterator[UdemyCourseT]:
+        """Iterates first over the courses with a specific coupon.
+
+        The courses are created while iterating, from a copy of the ids taken
+        when the iteration starts.
+
+        """
+        with self._lock:
+            pairs = [*self._pairs, *self._pending_pairs]
+            slug_ids = [
+                slug_id
+                for slug_id, any_coupon in enumerate(self._any_coupon)
+                if any_coupon
+            ]
+
+        for pair in pairs:
+            coupon_id = pair & ((1 << _COUPON_BITS) - 1)
+            yield CourseWithCoupon(
+                self._slugs[pair >> _COUPON_BITS],
+                self._coupons[coupon_id - 1] if coupon_id else None,
+            )
+
+        for slug_id in slug_ids:
+            yield CourseWithAnyCoupon(self._slugs[slug_id])
+
+    def __len__(self) -> int:
+        """Returns the number of items in the store."""
+        with self._lock:
+            return (
+                self._any_coupon_count
+                + len(self._pairs)
+                + len(self._pending_pairs)
+            )
+
+    def add(self, value: UdemyCourseT) -> None:  # noqa: WPS110
+        """Adds a course to the store."""
+        with self._lock:
+            self._add(value)
+            self._merge()
+
+    def discard(self, value: UdemyCourseT) -> None:  # noqa: WPS110
+        """Removes a course without raising if it doesn't exist."""
+        with self._lock:
+            if (slug_id := self._slugs.find(value.url_id)) is None:
+                return
+
+            if is_with_any_coupon(value):
+                self._discard_any_coupon(slug_id)
+            elif is_with_specific_coupon(value):
+                self._discard_pair(slug_id, value.coupon)
+            else:
+                raise TypeError
+
+    def optimize(self) -> None:
+        """Merges the pending items into the sorted arrays.
+
+        The redundant courses are removed as they appear.
+
+        """
+        with self._lock:
+            self._merge(force=True)
+
+    def load_compressed(
+        self,
+        compressed: tuple[str | tuple[str, str], ...],
+    ) -> None:
+        """Loads courses into the store from a compressed representation.
+
+        The arrays are sorted once, after all the courses are added.
+
+        Args:
+            compressed: The compressed representation, as returned by
+            create_compressed.
+
+        """
+        with self._lock:
+            super().load_compressed(compressed)
+            self._merge(force=True)
+
+    def _add(self, course: UdemyCourseT) -> None:
+        """Adds a course without merging. The lock must be held."""
+        slug_id = self._intern_slug(course.url_id)
+        if self._any_coupon[slug_id]:
+            return
+
+        if is_with_any_coupon(course):
+            self._any_coupon[slug_id] = 1
+            self._any_coupon_count += 1
+
+            # They are contained by the course with any_coupon now
+            self._discard_pairs(slug_id)
+        elif is_with_specific_coupon(course):
+            coupon_id = (
+                self._coupons.intern(course.coupon) + 1
+                if course.coupon is not None
+                else 0
+            )
+            pair = slug_id << _COUPON_BITS | coupon_id
+            if pair not in self._pending_pairs and not _contains_sorted(
+                self._pairs,
+                pair,
+            ):
+                self._pending_pairs.add(pair)
+                self._pending_slug_ids.add(slug_id)
+        else:
+            raise TypeError
+
+    def _intern_slug(self, url_id: str) -> int:
+        """Gets the id of a url_id, adding it if needed. The lock must be held.
+
+        Args:
+            url_id: The url_id.
+
+        Returns:
+            The id of the url_id, which has a flag in _any_coupon.
+
+        """
+        if (slug_id := self._slugs.intern(url_id)) == len(self._any_coupon):
+            self._any_coupon.append(0)
+
+        return slug_id
+
+    def _discard_any_coupon(self, slug_id: int) -> None:
+        """Removes a course with any coupon. The lock must be held.
+
+        Args:
+            slug_id: The id of the url_id.
+
+        """
+        if self._any_coupon[slug_id]:
+            self._any_coupon[slug_id] = 0
+            self._any_coupon_count -= 1
+
+    def _discard_pair(self, slug_id: int, coupon: str | None) -> None:
+        """Removes a course with a specific coupon. The lock must be held.
+
+        Args:
+            slug_id: The id of the url_id.
+            coupon: The coupon.
+
+        """
+        if (pair := self._find_pair(slug_id, coupon)) is None:
+            return
+
+        if pair in self._pending_pairs:
+            self._pending_pairs.remove(pair)
+        elif _contains_sorted(self._pairs, pair):
+            del self._pairs[bisect_left(self._pairs, pair)]
+
+    def _discard_pairs(self, slug_id: int) -> None:
+        """Removes the courses with a specific coupon of a url_id.
+
+        The lock must be held.
+
+        Args:
+            slug_id: The id of the url_id.
+
+        """
+        # Its pairs are a run of the sorted array
+        start = bisect_left(self._pairs, slug_id << _COUPON_BITS)
+        end = bisect_left(self._pairs, (slug_id + 1) << _COUPON_BITS, start)
+        del self._pairs[start:end]
+
+        if slug_id in self._pending_slug_ids:
+            self._pending_pairs = {
+                pair
+                for pair in self._pending_pairs
+                if pair >> _COUPON_BITS != slug_id
+            }
+            self._pending_slug_ids.remove(slug_id)
+
+    def _find_pair(self, slug_id: int, coupon: str | None) -> int | None:
+        """Packs the ids of a course with a specific coupon.
+
+        Args:
+            slug_id: The id of the url_id.
+            coupon: The coupon.
+
+        Returns:
+            The packed pair, or None if the coupon was never interned.
+
+        """
+        if coupon is None:
+            return slug_id << _COUPON_BITS
+
+        if (coupon_id := self._coupons.find(coupon)) is None:
+            return None
+
+        return slug_id << _COUPON_BITS | coupon_id + 1
+
+    def _merge(self, force: bool = False) -> None:
+        """Merges the pending items into the sorted arrays, if needed.
+
+        Args:
+            force: Whether to merge them even if there are a few.
+
+        """
+        self._slugs.merge(force)
+        self._coupons.merge(force)
+
+        if self._pending_pairs and (
+            force or _should_merge(len(self._pending_pairs), len(self._pairs))
+        ):
+            self._pairs = _merge_sorted(self._pairs, self._pending_pairs)
+            self._pending_pairs.clear()
+            self._pending_slug_ids.clear()
+
+
+def _should_merge(pending: int, merged: int) -> bool:
+    """Checks if there are enough pending items to rebuild a sorted array.
+
+    Args:
+        pending: The number of pending items.
+        merged: The number of items in the sorted array.
+
+    Returns:
+        Whether the array should be rebuilt.
+
+    """
+    return pending >= max(_MERGE_AFTER, merged // _MERGE_FRACTION)
+
+
+def _merge_sorted(sorted_array: array[int], new: Iterable[int]) -> array[int]:
+    """Creates a sorted array with the items of a sorted array and new ones.
+
+    The runs of the sorted array between the new items are copied as slices,
+    so its items are not converted to int objects.
+
+    Args:
+        sorted_array: The sorted array.
+        new: The new items.
+
+    Returns:
+        The new sorted array.
+
+    """
+    if not sorted_array:
+        return array("Q", sorted(new))
+
+    merged = array("Q")
+    start = 0
+    for item in sorted(new):
+        end = bisect_left(sorted_array, item, start)
+        merged += sorted_array[start:end]
+        merged.append(item)
+        start = end
+    merged += sorted_array[start:]
+
+    return merged
+
+
+def _contains_sorted(sorted_array: array[int], item: int) -> bool:
+    """Checks if a sorted array contains the item, with a binary search.
+
+    Args:
+        sorted_array: The sorted array.
+        item: The item to find.
+
+    Returns:
+        Whether the item is in the array.
+
+    """
+    index = bisect_left(sorted_array, item)
+    return index < len(sorted_array) and sorted_array[index] == item
@@ -2,5 +2,9 @@
 
 WAIT_TIMEOUT = 10
 WAIT_POLL_FREQUENCY = 0.05
+# Maximum seconds for a single enrollment before the driver is restarted
+ENROLL_DEADLINE = 120
 
 SCRAPER_WAIT = 1
+# Seconds between the saves of the persistent data in daemon mode
+CHECKPOINT_INTERVAL = 10 * 60
@@ -0,0 +1,164 @@
+"""This module contains the CourseJournal class."""
+
+from __future__ import annotations
+
+import sqlite3
+from datetime import datetime, timezone
+from logging import getLogger
+from pathlib import Path
+from threading import Lock
+from typing import NamedTuple
+
+from udemy_autocoupons.udemy_course import CourseWithCoupon
+
+_debug = getLogger("debug")
+
+
+class JournaledCourse(NamedTuple):
+    """A course in the journal, with the priority it was queued with.
+
+    Attributes:
+        course: The course.
+        retries: How many times the course had been attempted.
+        posted: When the source posted the course, if it is known.
+        stale: Whether the coupon was stale.
+
+    """
+
+    course: CourseWithCoupon
+    retries: int
+    posted: datetime | None
+    stale: bool
+
+
+class CourseJournal:
+    """The on-disk copy of the courses of a CourseQueue.
+
+    Courses are appended when they are queued and removed when they are
+    acknowledged, so the courses left in it were not finished, either because
+    they failed or because the process died. Those are redelivered on the
+    next start, and the journal is cleared once they are saved elsewhere.
+
+    It uses SQLite in WAL mode, committing every change, and it is
+    thread-safe, so the enrollers can acknowledge from their threads.
+
+    """
+
+    def __init__(self, path: Path) -> None:
+        """Opens the journal, creating it if needed.
+
+        Args:
+            path: The path of the database file.
+
+        """
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._lock = Lock()
+
+        with self._lock, self._connection:
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            # Durable on crashes of the process, which is what matters here
+            self._connection.execute("PRAGMA synchronous=NORMAL")
+            self._connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS courses (
+                    url_id TEXT NOT NULL,
+                    coupon TEXT,
+                    retries INTEGER NOT NULL,
+                    posted REAL,
+                    stale INTEGER NOT NULL
+                )
+                """,
+            )
+            self._connection.execute(
+                "CREATE INDEX IF NOT EXISTS courses_url_id "
+                + "ON courses (url_id, coupon)",
+            )
+
+    def append(
+        self,
+        course: CourseWithCoupon,
+        retries: int = 0,
+        posted: datetime | None = None,
+        stale: bool = False,
+    ) -> None:
+        """Adds a course, replacing it if it is already in the journal.
+
+        Args:
+            course: The queued course.
+            retries: How many times the course has already been attempted.
+            posted: When the source posted the course, if it is known.
+            stale: Whether the coupon is stale.
+
+        """
+        with self._lock, self._connection:
+            self._delete(course)
+            self._connection.execute(
+                "INSERT INTO courses VALUES (?, ?, ?, ?, ?)",
+                (
+                    course.url_id,
+                    course.coupon,
+                    retries,
+                    posted.timestamp() if posted else None,
+                    stale,
+                ),
+            )
+
+    def acknowledge(self, course: CourseWithCoupon) -> None:
+        """Removes a finished course.
+
+        Args:
+            course: The finished course.
+
+        """
+        with self._lock, self._connection:
+            self._delete(course)
+
+    def unacknowledged(self) -> list[JournaledCourse]:
+        """Gets the courses that were not finished, in the order they were added.
+
+        Returns:
+            The courses with their priority information.
+
+        """
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT url_id, coupon, retries, posted, stale FROM courses "
+                + "ORDER BY rowid",
+            ).fetchall()
+
+        return [
+            JournaledCourse(
+                CourseWithCoupon(url_id, coupon),
+                retries,
+                (
+                    datetime.fromtimestamp(posted, timezone.utc)
+                    if posted is not None
+                    else None
+                ),
+                bool(stale),
+            )
+            for url_id, coupon, retries, posted, stale in rows
+        ]
+
+    def clear(self) -> None:
+        """Removes every course, once they are saved elsewhere."""
+        with self._lock, self._connection:
+            self._connection.execute("DELETE FROM courses")
+
+    def close(self) -> None:
+        """Closes the database."""
+        with self._lock:
+            self._connection.close()
+
+    def _delete(self, course: CourseWithCoupon) -> None:
+        """Deletes the course. The lock must be held.
+
+        Args:
+            course: The course to delete.
+
+        """
+        # IS matches the courses without coupon too
+        self._connection.execute(
+            "DELETE FROM courses WHERE url_id = ? AND coupon IS ?",
+            (course.url_id, course.coupon),
+        )
@@ -0,0 +1,190 @@
+"""This module contains the CourseQueue class."""
+
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from datetime import datetime
+from heapq import heappop, heappush
+from itertools import count
+from queue import Full, Queue as MtQueue
+from time import time
+
+from udemy_autocoupons.course_journal import CourseJournal
+from udemy_autocoupons.udemy_course import CourseWithCoupon
+
+
+@dataclass(frozen=True, slots=True, order=True)
+class _Entry:
+    """An item of the queue, ordered by its priority.
+
+    Sentinels go after every course, and stale courses after the rest. Then,
+    courses with fewer retries go first, and among them the freshest ones, by
+    the date reported by the source or else by when they were scraped. The
+    sequence keeps the insertion order for ties.
+
+    """
+
+    is_sentinel: bool
+    is_stale: bool
+    retries: int
+    negative_freshness: float
+    sequence: int
+    course: CourseWithCoupon | None = field(compare=False)
+
+
+class CourseQueue(MtQueue["CourseWithCoupon | None"]):
+    """A thread-safe priority queue of courses, freshest first.
+
+    Fresh coupons are the ones that are likely to run out of redemptions
+    soon, so they are enrolled first. It can be used as a regular
+    multithreading queue, including task_done and join. The None sentinels
+    are always given after the courses that were put before or after them.
+
+    Courses put with put_course are in flight until they are completed, and
+    can't be put again meanwhile. Those completed as failed are kept, so that
+    the unfinished courses can be saved at any time.
+
+    If a CourseJournal is provided, courses put with put_course are appended
+    to it, and acknowledged when they are completed without failing.
+
+    """
+
+    def __init__(
+        self,
+        maxsize: int = 0,
+        journal: CourseJournal | None = None,
+    ) -> None:
+        """Creates the queue.
+
+        Args:
+            maxsize: The maximum number of items, 0 for no limit.
+            journal: The journal to keep the courses in, if any.
+
+        """
+        super().__init__(maxsize)
+        # A heap of entries instead of the deque of queue.Queue
+        self.queue: list[_Entry] = []  # type: ignore[assignment]
+        self._journal = journal
+
+        self._sequence = count()
+        self._in_flight: set[CourseWithCoupon] = set()
+        self._failed: set[CourseWithCoupon] = set()
+
+    def put_course(
+        self,
+        course: CourseWithCoupon,
+        retries: int = 0,
+        posted: datetime | None = None,
+        stale: bool = False,
+        block: bool = True,
+    ) -> bool:
+        """Puts a course with its priority information, unless it is in flight.
+
+        Args:
+            course: The course to put.
+            retries: How many times the course has already been attempted.
+            posted: When the source posted the course, if it is known.
+            stale: Whether the coupon is considered too old, which puts it
+            after all the others.
+            block: Whether to wait for a free slot if the queue is full.
+
+        Returns:
+            Whether the course was put, False if it was already in flight.
+
+        Raises:
+            Full: If block is False and the queue is full. The course is not
+            in flight then.
+
+        """
+        with self.mutex:
+            if course in self._in_flight:
+                return False
+
+            self._in_flight.add(course)
+
+        if self._journal:
+            self._journal.append(course, retries, posted, stale)
+
+        try:
+            self.put(
+                _Entry(
+                    is_sentinel=False,
+                    is_stale=stale,
+                    retries=retries,
+                    negative_freshness=-(
+                        posted.timestamp() if posted else time()
+                    ),
+                    sequence=next(self._sequence),
+                    course=course,
+                ),
+                block,
+            )
+        except Full:
+            self.complete(course)
+            raise
+
+        return True
+
+    def is_in_flight(self, course: CourseWithCoupon) -> bool:
+        """Checks if the course was put and it is not completed yet.
+
+        Args:
+            course: The course to check.
+
+        Returns:
+            Whether the course is in flight.
+
+        """
+        with self.mutex:
+            return course in self._in_flight
+
+    def complete(self, course: CourseWithCoupon, failed: bool = False) -> None:
+        """Marks the course as finished, so that it can be put again.
+
+        Args:
+            course: The finished course.
+            failed: Whether the course could not be enrolled.
+
+        """
+        with self.mutex:
+            self._in_flight.discard(course)
+
+            if failed:
+                self._failed.add(course)
+            else:
+                self._failed.discard(course)
+
+        if self._journal and not failed:
+            self._journal.acknowledge(course)
+
+    def unfinished(self) -> list[CourseWithCoupon]:
+        """Gets the courses that are in flight or failed.
+
+        Returns:
+            The courses that would need to be attempted again if the run
+            stopped now.
+
+        """
+        with self.mutex:
+            return [*self._in_flight, *self._failed]
+
+    # These override the storage of queue.Queue, and are called with its lock
+
+    def _qsize(self) -> int:
+        return len(self.queue)
+
+    def _put(self, item: _Entry | CourseWithCoupon | None) -> None:
+        if not isinstance(item, _Entry):
+            item = _Entry(
+                is_sentinel=item is None,
+                is_stale=False,
+                retries=0,
+                negative_freshness=-time(),
+                sequence=next(self._sequence),
+                course=item,
+            )
+
+        heappush(self.queue, item)
+
+    def _get(self) -> CourseWithCoupon | None:
+        return heappop(self.queue).course
@@ -1,5 +1,6 @@
-"""This module contains the CoursesStore class."""
+"""This module contains the CoursesStore class and its base class."""
 
+from abc import abstractmethod
 from collections.abc import Iterator, MutableSet
 from dataclasses import astuple
 from threading import RLock
@@ -13,11 +14,75 @@ from udemy_autocoupons.udemy_course import (
 )
 
 
-class CoursesStore(MutableSet):
-    """A set-like store for mixed UdemyCourse instances.
+class BaseCoursesStore(MutableSet):
+    """The interface of the stores for mixed UdemyCourse instances.
+
+    Stores consider that if they contain a course with any_coupon, then all
+    courses that have the same url_id are contained too. They must be
+    thread-safe, using the reentrant lock that they create in _lock.
+
+    """
+
+    _lock: RLock
+
+    @abstractmethod
+    def optimize(self) -> None:
+        """Removes the courses that are contained by a course with any_coupon."""
+
+    def create_compressed(self) -> tuple[str | tuple[str, str], ...]:
+        """Creates a smaller representation of the store.
+
+        The store can be recreated by using load_compressed with the return
+        value of this method.
+
+        Side effect: the store is optimized.
+
+        Returns:
+            The compressed representation.
+
+        """
+        with self._lock:
+            self.optimize()
+            return tuple(
+                course.url_id if course.any_coupon else astuple(course)
+                for course in self
+            )  # type: ignore
+
+    def load_compressed(
+        self,
+        compressed: tuple[str | tuple[str, str], ...],
+    ) -> None:
+        """Loads courses into the store from a compressed representation.
+
+        Args:
+            compressed: The compressed representation, as returned by
+            create_compressed.
+
+        """
+        with self._lock:
+            for compressed_course in compressed:
+                if isinstance(compressed_course, str):
+                    self._add(CourseWithAnyCoupon(compressed_course))
+                else:
+                    self._add(CourseWithCoupon(*compressed_course))
+
+    def _add(self, course: UdemyCourseT) -> None:
+        """Adds a course to the store. The lock must be held.
+
+        Stores can override it to skip the work that add does for every
+        course, like merging or committing it.
+
+        """
+        self.add(course)
+
+
+class CoursesStore(BaseCoursesStore):
+    """A set-like store for mixed UdemyCourse instances, held in memory.
 
     This store considers that if it contains a course with any_coupon, then all
-    courses that have the same url_id are contained too.
+    courses that have the same url_id are contained too. The courses with a
+    specific coupon are indexed by url_id, so they are removed as soon as a
+    course with any_coupon contains them.
 
     Mutation methods are thread-safe. Reading do not use a mutex, so while it is
     safe to read from multiple threads, the result might not be consistent.
@@ -28,7 +93,10 @@ class CoursesStore(MutableSet):
         """Adds all passed courses to the store."""
         # The key is the url_id
         self._any_coupon: dict[str, CourseWithAnyCoupon] = {}
-        self._specific_coupon: set[CourseWithCoupon] = set()
+        # The key is the url_id, and the value its coupons. Most url_ids have
+        # one or a few, so a tuple takes much less memory than a set
+        self._specific_coupon: dict[str, tuple[str | None, ...]] = {}
+        self._specific_coupon_count = 0
 
         self._lock = RLock()
 
@@ -43,20 +111,19 @@ class CoursesStore(MutableSet):
         if course.url_id in self._any_coupon:
             return True
 
-        return False if course.any_coupon else course in self._specific_coupon
+        if course.any_coupon:
+            return False
+
+        return course.coupon in self._specific_coupon.get(course.url_id, ())
 
     def __iter__(self) -> Iterator[UdemyCourseT]:
         """Iterates first over the courses with a specific coupon."""
-        yield from self._specific_coupon
+        yield from self._iter_specific_coupon()
         yield from self._any_coupon.values()
 
     def __len__(self) -> int:
-        """Returns the number of items in the store.
-
-        This number could be reduced after calling optimize().
-
-        """
-        return len(self._any_coupon) + len(self._specific_coupon)
+        """Returns the number of items in the store."""
+        return len(self._any_coupon) + self._specific_coupon_count
 
     def __repr__(self) -> str:
         """String representation of the object.
@@ -67,7 +134,8 @@ class CoursesStore(MutableSet):
         repr_ = "CoursesStore("
 
         if self._specific_coupon:
-            specific_repr = repr(self._specific_coupon)[1:-1]
+            specific_coupon_set = set(self._iter_specific_coupon())
+            specific_repr = repr(specific_coupon_set)[1:-1]
             repr_ += f"{specific_repr}, "
 
         if self._any_coupon:
@@ -88,15 +156,21 @@ class CoursesStore(MutableSet):
         with self._lock:
             self._discard(value)
 
-    def optimize(self) -> None:
-        """Optimizes the memory usage by removing redundant courses."""
-        with self._lock:
-            to_remove = set()
-            for specific_coupon in self._specific_coupon:
-                if specific_coupon.url_id in self._any_coupon:
-                    to_remove.add(specific_coupon)
+    def coupons_of(self, url_id: str) -> tuple[str | None, ...]:
+        """Gets the coupons of the courses with a specific coupon of a url_id.
 
-            self._specific_coupon -= to_remove
+        Args:
+            url_id: The url_id of the courses.
+
+        Returns:
+            The coupons, which are none if the store contains the course with
+            any_coupon.
+
+        """
+        return self._specific_coupon.get(url_id, ())
+
+    def optimize(self) -> None:
+        """Does nothing, the redundant courses are removed as they appear."""
 
     def create_compressed(self) -> tuple[str | tuple[str, str], ...]:
         """Creates a smaller representation of the store.
@@ -104,37 +178,18 @@ class CoursesStore(MutableSet):
         The store can be recreated by using load_compressed with the return
         value of this method.
 
-        Side effect: the store is optimized.
-
         Returns:
             The compressed representation.
 
         """
         with self._lock:
-            self.optimize()
+            # The same tuples as astuple, without creating the courses
             return tuple(self._any_coupon.keys()) + tuple(
-                astuple(specific_coupon)
-                for specific_coupon in self._specific_coupon
+                (url_id, coupon, False)
+                for url_id, coupons in self._specific_coupon.items()
+                for coupon in coupons
             )  # type: ignore
 
-    def load_compressed(
-        self,
-        compressed: tuple[str | tuple[str, str], ...],
-    ) -> None:
-        """Loads courses into the store from a compressed representation.
-
-        Args:
-            compressed: The compressed representation, as returned by
-            create_compressed.
-
-        """
-        with self._lock:
-            for compressed_course in compressed:
-                if isinstance(compressed_course, str):
-                    self._add(CourseWithAnyCoupon(compressed_course))
-                else:
-                    self._add(CourseWithCoupon(*compressed_course))
-
     def _add(self, course: UdemyCourseT) -> None:
         """Adds a course to the store."""
         if course in self:
@@ -142,16 +197,40 @@ class CoursesStore(MutableSet):
 
         if is_with_any_coupon(course):
             self._any_coupon[course.url_id] = course
+
+            # They are contained by the course with any_coupon now
+            coupons = self._specific_coupon.pop(course.url_id, ())
+            self._specific_coupon_count -= len(coupons)
         elif is_with_specific_coupon(course):
-            self._specific_coupon.add(course)
+            self._specific_coupon[course.url_id] = (
+                *self._specific_coupon.get(course.url_id, ()),
+                course.coupon,
+            )
+            self._specific_coupon_count += 1
         else:
             raise TypeError
 
     def _discard(self, course: UdemyCourseT) -> None:
         """Removes a course without raising if it doesn't exist."""
-        if is_with_any_coupon(course) and course.url_id in self._any_coupon:
-            self._any_coupon.pop(course.url_id)
+        if is_with_any_coupon(course):
+            self._any_coupon.pop(course.url_id, None)
         elif is_with_specific_coupon(course):
-            self._specific_coupon.discard(course)
+            coupons = self._specific_coupon.get(course.url_id, ())
+            if course.coupon not in coupons:
+                return
+
+            if remaining := tuple(
+                coupon for coupon in coupons if coupon != course.coupon
+            ):
+                self._specific_coupon[course.url_id] = remaining
+            else:
+                del self._specific_coupon[course.url_id]
+            self._specific_coupon_count -= 1
         else:
             raise TypeError
+
+    def _iter_specific_coupon(self) -> Iterator[CourseWithCoupon]:
+        """Iterates over the courses with a specific coupon."""
+        for url_id, coupons in self._specific_coupon.items():
+            for coupon in coupons:
+                yield CourseWithCoupon(url_id, coupon)
@@ -0,0 +1,103 @@
+"""This module contains the functions to keep scraping in daemon mode."""
+
+from __future__ import annotations
+
+from asyncio import TaskGroup, sleep
+from collections.abc import Awaitable, Iterable
+from logging import getLogger
+from threading import Event
+from time import monotonic
+
+from aiohttp import ClientError
+
+from udemy_autocoupons.scrapers.scraper import Scraper
+
+_debug = getLogger("debug")
+_printer = getLogger("printer")
+
+_STOP_CHECK_INTERVAL = 1  # Seconds
+# What a scrap can raise when a source is down or changes its format
+_SCRAP_ERRORS = (ClientError, OSError, KeyError, TypeError, ValueError)
+
+
+async def run_daemon(
+    scrapers: Iterable[Scraper],
+    stop_event: Event,
+) -> None:
+    """Runs every scraper on its own interval until the stop event is set.
+
+    Args:
+        scrapers: The scrapers to run.
+        stop_event: The event that stops the daemon when set.
+
+    """
+    _printer.info("Running as a daemon, waiting for new coupons")
+
+    async with TaskGroup() as task_group:
+        for scraper in scrapers:
+            task_group.create_task(_poll(scraper, stop_event))
+
+    _debug.debug("Daemon stopped")
+
+
+async def _poll(scraper: Scraper, stop_event: Event) -> None:
+    """Runs the scraper every poll_interval until the stop event is set.
+
+    After the first scrap, the scraper is subscribed to new posts. An error in
+    a scrap is logged, and the scraper is run again on the next interval.
+
+    Args:
+        scraper: The scraper to run.
+        stop_event: The event that stops the polling when set.
+
+    """
+    name = scraper.__class__.__name__
+    subscribed = False
+
+    while not stop_event.is_set():
+        _debug.debug("Polling %s", name)
+
+        if await _succeeds(scraper.scrap(), name) and not subscribed:
+            subscribed = await _succeeds(scraper.subscribe(), name)
+
+        await _sleep_unless_stopped(scraper.poll_interval, stop_event)
+
+
+async def _succeeds(call: Awaitable[None], name: str) -> bool:
+    """Awaits a call of a scraper, logging the error if it fails.
+
+    Args:
+        call: The call to await.
+        name: The name of the scraper, for logging.
+
+    Returns:
+        Whether the call finished without errors.
+
+    """
+    try:
+        await call
+    except _SCRAP_ERRORS:
+        _debug.exception("Error while polling %s", name)
+        _printer.error("%s failed, it will be retried later", name)
+        return False
+
+    return True
+
+
+async def _sleep_unless_stopped(seconds: float, stop_event: Event) -> None:
+    """Sleeps for the given seconds, waking up early if the event is set.
+
+    The event is a threading one, so it is checked periodically.
+
+    Args:
+        seconds: The seconds to sleep.
+        stop_event: The event to check.
+
+    """
+    deadline = monotonic() + seconds
+
+    while not stop_event.is_set():
+        if (remaining := deadline - monotonic()) <= 0:
+            return
+
+        await sleep(min(remaining, _STOP_CHECK_INTERVAL))
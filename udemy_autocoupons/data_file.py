@@ -0,0 +1,354 @@
+"""This module contains the versioned binary format of the data files.
+
+Every file starts with a header with a magic number, the version of the
+format, the kind of payload, its codec, its length and its CRC32. Courses
+are stored as a table of string lengths followed by the strings, and
+anything else is pickled. Raw payloads can also be memory-mapped.
+
+"""
+
+from __future__ import annotations
+
+import sys
+from array import array
+from enum import Enum
+from itertools import accumulate, chain
+from mmap import ACCESS_READ, mmap
+from os import fsync, replace
+from pathlib import Path
+from struct import Struct, error as StructError
+from typing import Any, Final
+from zlib import compress, crc32, decompress
+
+_MAGIC = b"UDAC"
+VERSION = 1
+
+# Magic, version, kind, codec, payload length and payload CRC32
+_HEADER = Struct("<4sHBBQI")
+HEADER_SIZE: Final = _HEADER.size
+
+_COUNTS = Struct("<II")
+
+# The length of a coupon that is None
+_NONE = 0xFFFFFFFF
+
+_CompressedT = tuple[str | tuple[str, str | None], ...]
+
+
+class DataFileError(Exception):
+    """Raised when a data file is not valid."""
+
+
+class DataKind(Enum):
+    """The possible kinds of payload of a data file."""
+
+    COURSES = 1
+    PICKLE = 2
+    COURSES_INDEX = 3
+
+
+class Codec(Enum):
+    """The possible codecs of the payload of a data file."""
+
+    RAW = 0
+    ZLIB = 1
+
+
+def write_data_file(
+    path: Path,
+    kind: DataKind,
+    payload: bytes,
+    codec: Codec = Codec.ZLIB,
+) -> None:
+    """Writes a data file atomically.
+
+    The data is written to a temporary file that then replaces the previous
+    one, so that a crash while saving never leaves a corrupted file.
+
+    Args:
+        path: The path of the file.
+        kind: The kind of payload.
+        payload: The payload.
+        codec: The codec to store the payload with.
+
+    """
+    if codec is Codec.ZLIB:
+        # The fastest level, most of the gain is from the repeated slugs
+        payload = compress(payload, 1)
+
+    header = _HEADER.pack(
+        _MAGIC,
+        VERSION,
+        kind.value,
+        codec.value,
+        len(payload),
+        crc32(payload),
+    )
+    write_atomically(path, header, payload)
+
+
+def write_atomically(path: Path, *chunks: bytes) -> None:
+    """Writes a file atomically.
+
+    The chunks are written to a temporary file that then replaces the previous
+    one, so that a crash while saving never leaves a corrupted file.
+
+    Args:
+        path: The path of the file.
+        chunks: The contents of the file, in order.
+
+    """
+    temporary_path = path.with_name(f"{path.name}.tmp")
+    with temporary_path.open("wb") as data_file:
+        for chunk in chunks:
+            data_file.write(chunk)
+
+        data_file.flush()
+        fsync(data_file.fileno())
+
+    replace(temporary_path, path)
+
+
+def read_data_file(path: Path, kind: DataKind) -> bytes:
+    """Reads a data file, checking its header.
+
+    Args:
+        path: The path of the file.
+        kind: The expected kind of payload.
+
+    Returns:
+        The payload.
+
+    Raises:
+        DataFileError: If the file is not a valid data file of that kind.
+
+    """
+    data = path.read_bytes()
+
+    codec, length, checksum = _check_header(path, data, kind)
+
+    payload = data[_HEADER.size :]
+    if len(payload) != length or crc32(payload) != checksum:
+        raise DataFileError(f"{path} is corrupted")
+
+    return decompress(payload) if codec is Codec.ZLIB else payload
+
+
+def map_data_file(path: Path, kind: DataKind) -> mmap:
+    """Maps a raw data file into memory, checking its header.
+
+    The checksum is not checked, since that would read the whole file.
+
+    Args:
+        path: The path of the file.
+        kind: The expected kind of payload.
+
+    Returns:
+        The read-only map of the file. The payload starts at HEADER_SIZE.
+
+    Raises:
+        DataFileError: If the file is not a valid raw data file of that kind.
+
+    """
+    # An empty file can't be mapped
+    if path.stat().st_size < _HEADER.size:
+        raise DataFileError(f"{path} is truncated")
+
+    with path.open("rb") as data_file:
+        data = mmap(data_file.fileno(), 0, access=ACCESS_READ)
+
+    try:
+        _check_raw_header(path, data, kind)
+    except DataFileError:
+        data.close()
+        raise
+
+    return data
+
+
+def _check_raw_header(path: Path, data: mmap, kind: DataKind) -> None:
+    """Checks the header of a mapped data file, which must be raw.
+
+    Args:
+        path: The path of the file, for the errors.
+        data: The map of the file.
+        kind: The expected kind of payload.
+
+    Raises:
+        DataFileError: If the file is not a valid raw data file of that kind.
+
+    """
+    codec, length, _ = _check_header(path, data, kind)
+    if codec is not Codec.RAW:
+        raise DataFileError(f"{path} is compressed")
+    if len(data) - _HEADER.size != length:
+        raise DataFileError(f"{path} is corrupted")
+
+
+def _check_header(
+    path: Path,
+    data: bytes | mmap,
+    kind: DataKind,
+) -> tuple[Codec, int, int]:
+    """Checks the header of a data file.
+
+    Args:
+        path: The path of the file, for the errors.
+        data: The contents of the file.
+        kind: The expected kind of payload.
+
+    Returns:
+        The codec, the length and the checksum of the payload.
+
+    Raises:
+        DataFileError: If the file is not a valid data file of that kind.
+
+    """
+    if len(data) < _HEADER.size:
+        raise DataFileError(f"{path} is truncated")
+
+    magic, version, kind_value, codec_value, length, checksum = (
+        _HEADER.unpack_from(data)
+    )
+    if magic != _MAGIC:
+        raise DataFileError(f"{path} is not a data file")
+    if version > VERSION:
+        raise DataFileError(f"{path} has the newer version {version}")
+    if kind_value != kind.value:
+        raise DataFileError(f"{path} does not contain {kind.name}")
+
+    try:
+        codec = Codec(codec_value)
+    except ValueError as error:
+        raise DataFileError(
+            f"{path} has unknown codec {codec_value}",
+        ) from error
+
+    return codec, length, checksum
+
+
+def encode_courses(compressed: _CompressedT) -> bytes:
+    """Encodes the compressed representation of a courses store.
+
+    Args:
+        compressed: The url_ids of the courses with any coupon and the
+        (url_id, coupon) tuples of the rest. Longer tuples, like the ones from
+        astuple, are accepted too.
+
+    Returns:
+        The payload.
+
+    """
+    any_coupon = [course for course in compressed if isinstance(course, str)]
+    specific_coupon = [
+        course[:2] for course in compressed if not isinstance(course, str)
+    ]
+
+    strings = [*any_coupon, *chain.from_iterable(specific_coupon)]
+    none_indexes = _indexes(strings, None)
+    for index in none_indexes:
+        strings[index] = ""
+
+    lengths = array("I", [len(string) for string in strings])
+    for index in none_indexes:
+        lengths[index] = _NONE
+    if sys.byteorder == "big":
+        lengths.byteswap()
+
+    return b"".join(
+        (
+            _COUNTS.pack(len(any_coupon), len(specific_coupon)),
+            lengths.tobytes(),
+            "".join(strings).encode(),
+        ),
+    )
+
+
+def decode_courses(payload: bytes) -> _CompressedT:
+    """Decodes the compressed representation of a courses store.
+
+    Args:
+        payload: The payload, as returned by encode_courses.
+
+    Returns:
+        The url_ids of the courses with any coupon and the (url_id, coupon)
+        tuples of the rest.
+
+    Raises:
+        DataFileError: If the payload is malformed.
+
+    """
+    try:
+        any_count, specific_count, lengths, text = _split_courses(payload)
+    except (StructError, ValueError) as error:
+        raise DataFileError("The courses are malformed") from error
+
+    # The lengths are in characters, and a None takes none
+    none_indexes = _indexes(lengths, _NONE)
+    for index in none_indexes:
+        lengths[index] = 0
+
+    ends = list(accumulate(lengths))
+    if len(lengths) != any_count + 2 * specific_count or (
+        ends[-1] if ends else 0
+    ) != len(text):
+        raise DataFileError("The courses do not match their counts")
+
+    strings: list[str | None] = [
+        text[start:end] for start, end in zip([0, *ends], ends)
+    ]
+    for index in none_indexes:
+        strings[index] = None
+
+    specific_coupon = zip(
+        strings[any_count::2],
+        strings[any_count + 1 :: 2],
+    )
+
+    return (*strings[:any_count], *specific_coupon)  # type: ignore
+
+
+def _split_courses(payload: bytes) -> tuple[int, int, array[int], str]:
+    """Splits a courses payload into its counts, lengths and text.
+
+    Args:
+        payload: The payload, as returned by encode_courses.
+
+    Returns:
+        The number of courses with any coupon and with a specific coupon, the
+        lengths of the strings and the text with all of them.
+
+    Raises:
+        StructError: If the counts are truncated.
+        ValueError: If the lengths are truncated or the text is not UTF-8.
+
+    """
+    any_count, specific_count = _COUNTS.unpack_from(payload)
+
+    lengths = array("I")
+    lengths_end = (
+        _COUNTS.size + (any_count + 2 * specific_count) * lengths.itemsize
+    )
+    lengths.frombytes(payload[_COUNTS.size : lengths_end])
+    if sys.byteorder == "big":
+        lengths.byteswap()
+
+    return any_count, specific_count, lengths, payload[lengths_end:].decode()
+
+
+def _indexes(sequence: list[Any] | array[int], value: Any) -> list[int]:
+    """Finds all the indexes of a value, searching in C.
+
+    Args:
+        sequence: The sequence to search.
+        value: The value to find.
+
+    Returns:
+        The indexes of the value.
+
+    """
+    indexes: list[int] = []
+    for _ in range(sequence.count(value)):
+        indexes.append(sequence.index(value, indexes[-1] + 1 if indexes else 0))
+
+    return indexes
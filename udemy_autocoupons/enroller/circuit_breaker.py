@@ -0,0 +1,202 @@
+"""This module contains the CircuitBreaker class."""
+
+from enum import Enum
+from logging import getLogger
+from threading import Condition, Event, get_ident
+from time import monotonic
+
+_debug = getLogger("debug")
+_printer = getLogger("printer")
+
+
+class ErrorBudgetExhausted(Exception):
+    """Raised when there are more errors than the error budget allows."""
+
+
+class BreakerState(Enum):
+    """The possible states of the circuit breaker."""
+
+    CLOSED = "CLOSED"
+    OPEN = "OPEN"
+    HALF_OPEN = "HALF_OPEN"
+
+
+class CircuitBreaker:
+    """Pauses the enrollments after consecutive errors, with backoff.
+
+    While closed, every enrollment is allowed. After too many consecutive
+    errors it opens, and enrollments wait until the backoff ends. Then it is
+    half-open, and a single probe enrollment is allowed. If the probe succeeds
+    it closes again, otherwise it opens with twice the backoff.
+
+    The run is only aborted when the total errors exceed the error budget,
+    if there is one.
+
+    It is thread-safe, so the same instance can be shared by several workers,
+    in which case all of them are paused and the errors of any of them count
+    towards the same limits.
+
+    """
+
+    _MAX_CONSECUTIVE_ERRORS = 3  # Allowed quantity, next one will open
+    _BASE_BACKOFF = 30
+    _MAX_BACKOFF = 600
+    # How often waiting enrollments check the stop event
+    _STOP_CHECK_INTERVAL = 1
+
+    def __init__(self, error_budget: int, stop_event: Event) -> None:
+        """Starts closed, with no errors.
+
+        Args:
+            error_budget: The total errors allowed, the next one will raise.
+            If it is 0, any number of errors is allowed.
+            stop_event: The event that will be set when the run should stop,
+            which ends the waits.
+
+        """
+        self._error_budget = error_budget
+        self._stop_event = stop_event
+
+        self._condition = Condition()
+        self._state = BreakerState.CLOSED
+        self._consecutive_errors = 0
+        self._total_errors = 0
+        self._backoff = self._BASE_BACKOFF
+        self._open_until = 0.0
+        # The thread of the probe enrollment, while the breaker is half-open
+        self._probe_thread: int | None = None
+
+    @property
+    def state(self) -> BreakerState:
+        """The current state of the breaker."""
+        with self._condition:
+            return self._state
+
+    def acquire(self) -> bool:
+        """Waits until an enrollment is allowed.
+
+        If the breaker is half-open, the calling thread becomes the probe, and
+        the others wait until it records its result or releases it.
+
+        Returns:
+            Whether the enrollment is allowed, False if the run was stopped
+            while waiting.
+
+        """
+        with self._condition:
+            while not self._stop_event.is_set():
+                if self._state is BreakerState.CLOSED:
+                    return True
+
+                if self._state is BreakerState.OPEN:
+                    if (remaining := self._open_until - monotonic()) > 0:
+                        self._condition.wait(
+                            min(remaining, self._STOP_CHECK_INTERVAL),
+                        )
+                        continue
+
+                    self._transition(BreakerState.HALF_OPEN)
+
+                if self._probe_thread is None:
+                    self._probe_thread = get_ident()
+                    _debug.debug("Sending probe enrollment")
+                    return True
+
+                self._condition.wait(self._STOP_CHECK_INTERVAL)
+
+            return False
+
+    def release(self) -> None:
+        """Ends the enrollment of the calling thread.
+
+        If it was the probe and it didn't record a result, for example because
+        the course didn't need to be enrolled, another probe is allowed.
+
+        """
+        with self._condition:
+            if self._probe_thread == get_ident():
+                self._probe_thread = None
+                self._condition.notify_all()
+
+    def record_success(self) -> None:
+        """Resets the consecutive errors, and closes the breaker if probing."""
+        with self._condition:
+            self._consecutive_errors = 0
+
+            if self._is_probe():
+                self._backoff = self._BASE_BACKOFF
+                self._transition(BreakerState.CLOSED)
+
+    def record_error(self) -> None:
+        """Adds an error, which can open the breaker.
+
+        Raises:
+            ErrorBudgetExhausted: If there is an error budget and it is
+            exceeded.
+
+        """
+        with self._condition:
+            self._consecutive_errors += 1
+            self._total_errors += 1
+
+            _debug.debug(
+                "Consecutive errors is %s, total errors is %s",
+                self._consecutive_errors,
+                self._total_errors,
+            )
+
+            if self._error_budget and self._total_errors > self._error_budget:
+                raise ErrorBudgetExhausted()
+
+            if self._is_probe():
+                self._backoff = min(self._backoff * 2, self._MAX_BACKOFF)
+                self._open()
+            elif (
+                self._state is BreakerState.CLOSED
+                and self._consecutive_errors > self._MAX_CONSECUTIVE_ERRORS
+            ):
+                self._open()
+
+    def _is_probe(self) -> bool:
+        """Checks if the calling thread is the probe of the half-open breaker.
+
+        Returns:
+            Whether it is the probe.
+
+        """
+        return (
+            self._state is BreakerState.HALF_OPEN
+            and self._probe_thread == get_ident()
+        )
+
+    def _open(self) -> None:
+        """Opens the breaker for the current backoff."""
+        self._open_until = monotonic() + self._backoff
+        self._transition(BreakerState.OPEN)
+
+        _printer.warning(
+            "Enroller: Too many errors, pausing for %ss",
+            self._backoff,
+        )
+
+    def _transition(self, state: BreakerState) -> None:
+        """Changes the state of the breaker, waking the waiting threads.
+
+        Args:
+            state: The new state.
+
+        """
+        _debug.info(
+            "Circuit breaker %s -> %s. Consecutive errors: %s; total errors: "
+            "%s/%s; backoff: %ss",
+            self._state.value,
+            state.value,
+            self._consecutive_errors,
+            self._total_errors,
+            self._error_budget,
+            self._backoff,
+        )
+
+        self._state = state
+        self._probe_thread = None
+        self._condition.notify_all()
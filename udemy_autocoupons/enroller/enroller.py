@@ -1,54 +1,93 @@
 """This module contains the Enroller class."""
 
 from collections import defaultdict, deque
+from collections.abc import Callable
 from logging import getLogger
-from queue import Queue as MtQueue
+from queue import Empty
 from threading import Event
 
-from udemy_autocoupons.courses_store import CoursesStore
+from udemy_autocoupons.course_queue import CourseQueue
+from udemy_autocoupons.courses_store import BaseCoursesStore
+from udemy_autocoupons.enroller.circuit_breaker import (
+    CircuitBreaker,
+    ErrorBudgetExhausted,
+)
 from udemy_autocoupons.enroller.state import DoneOrErrorT, State
-from udemy_autocoupons.enroller.udemy_driver import UdemyDriver
+from udemy_autocoupons.enroller.supervised_driver import (
+    DriverRestarted,
+    DriverUnavailable,
+    SupervisedDriver,
+)
 from udemy_autocoupons.udemy_course import CourseWithCoupon
 
 _printer = getLogger("printer")
 _debug = getLogger("debug")
 
 
-class ConsecutiveErrors(Exception):
-    """Raised when there are too many consecutive errors."""
+class Enroller:
+    """A class that handles enrolling from a queue using a WebDriver.
 
+    Several enrollers can consume the same queue, each one with its own driver
+    and reattempts, in which case each of them needs its own None in the queue.
 
-class Enroller:
-    """A class that handles enrolling from a queue using a WebDriver."""
+    It can take a few courses ahead from the queue, which the driver starts
+    loading in background tabs while the current one is enrolled.
+
+    Courses that can only be enrolled through the cart can be left in it, to
+    check out several of them at once. Reattempts are always done one by one.
+
+    """
 
     _MAX_REATTEMPTS = 2
-    _MAX_CONSECUTIVE_ERRORS = 3  # Allowed quantity, next one will raise
 
     def __init__(
         self,
-        driver: UdemyDriver,
-        mt_queue: MtQueue[CourseWithCoupon | None],
-        courses_store: CoursesStore,
+        driver: SupervisedDriver,
+        mt_queue: CourseQueue,
+        courses_store: BaseCoursesStore,
         stop_event: Event,
+        circuit_breaker: CircuitBreaker,
+        prefetch_tabs: int = 0,
+        cart_batch: int = 0,
+        on_stored: Callable[[], None] | None = None,
     ) -> None:
         """Stores the given driver and mt_queue.
 
         Args:
             driver: The WebDriver to use.
-            mt_queue: The multithreading queue to get the courses from.
+            mt_queue: The multithreading queue to get the courses from. Courses
+            are completed in it once they are finished.
             courses_store: The courses store to use.
             stop_event: The event to set when the run should stop.
+            circuit_breaker: The circuit breaker that pauses the enrollments
+            on errors, which can be shared with other enrollers.
+            prefetch_tabs: The number of courses to load ahead in background
+            tabs.
+            cart_batch: The number of courses to check out together from the
+            cart. Batching is disabled if it is less than 2.
+            on_stored: A function to call after a course is added to the
+            store, which must be thread-safe.
 
         """
         self._driver = driver
         self._mt_queue = mt_queue
         self._courses_store = courses_store
         self._stop_event = stop_event
+        self._circuit_breaker = circuit_breaker
+        self._prefetch_tabs = prefetch_tabs
+        self._cart_batch = cart_batch
+        self._on_stored = on_stored
+
+        # Courses already taken from the queue, but not processed yet
+        self._lookahead: deque[CourseWithCoupon | None] = deque()
 
         self._errors: list[CourseWithCoupon] = []
 
+        # Courses left in the cart, to be checked out together
+        self._cart: list[CourseWithCoupon] = []
+
         self._enrolled_counter = 0
-        self._consecutive_errors = 0
+        self._queue_finished = False
 
         self._attempts: defaultdict[CourseWithCoupon, int] = defaultdict(int)
         self._reattempt_queue: deque[CourseWithCoupon] = deque()
@@ -61,23 +100,33 @@ class Enroller:
 
         Courses that fail too many times are put in the errors queue.
 
+        If the stop event is set, by this or any other enroller, the remaining
+        courses are put in the errors queue instead.
+
+        If the driver dies or hangs, it is restarted and the course is
+        attempted again later, unless the driver can't be started anymore.
+
         """
         try:
             self._enroll_from_queue()
-        except ConsecutiveErrors:
+        except ErrorBudgetExhausted:
             self._stop_event.set()
-            self._errors.extend(self._reattempt_queue)
 
-            while course := self._mt_queue.get():
-                self._errors.append(course)
-                self._mt_queue.task_done()
+            _printer.info("Too many errors, stopping early.")
+            _debug.debug("Error budget exhausted, stopping early.")
+        except DriverUnavailable:
+            self._stop_event.set()
 
-            self._mt_queue.task_done()  # For the None
+            _printer.info("The browser can't be started, stopping early.")
+            _debug.debug("The browser can't be started, stopping early.")
 
-            _printer.info("Too many consecutive errors, stopping early.")
-            _debug.debug("Too many consecutive errors, stopping early.")
+        self._give_up(*self._cart, *self._reattempt_queue)
+        self._cart.clear()
+        self._reattempt_queue.clear()
 
-        self._mt_queue.task_done()  # For the None or the last task that failed
+        if not self._queue_finished:
+            # The stop event is set, so this moves the rest to the errors
+            self._next_course()
 
         _debug.debug("Enrolled in %s courses", self._enrolled_counter)
         _printer.info("Enrolled in %s courses", self._enrolled_counter)
@@ -91,13 +140,18 @@ class Enroller:
         any more courses.
 
         """
-        while course := self._mt_queue.get():
-            self._handle_enroll(course, reattempt=False)
-            self._mt_queue.task_done()
+        while course := self._next_course():
+            try:
+                self._handle_enroll(course, reattempt=False)
+            finally:
+                self._mt_queue.task_done()
 
         _debug.debug("Got None in multithreading queue")
 
-        while self._reattempt_queue:
+        if self._cart:
+            self._checkout_cart()
+
+        while self._reattempt_queue and not self._stop_event.is_set():
             course = self._reattempt_queue.popleft()
 
             _debug.debug("Reattempting %s", course)
@@ -109,16 +163,92 @@ class Enroller:
 
             self._handle_enroll(course, reattempt=True)
 
-    def _handle_enroll(self, course: CourseWithCoupon, reattempt: bool) -> None:
+    def _next_course(self) -> CourseWithCoupon | None:
+        """Gets the next course from the queue.
+
+        Once the stop event is set, the courses received are put in the errors
+        instead, until the None is received.
+
+        Returns:
+            The next course, or None if there won't be any more courses.
+
+        """
+        while course := self._get():
+            if not self._stop_event.is_set():
+                self._prefetch_next()
+                return course
+
+            self._give_up(course)
+            self._driver.discard_prefetched(course)
+            self._mt_queue.task_done()
+
+        self._mt_queue.task_done()  # For the None
+        self._queue_finished = True
+
+        return None
+
+    def _get(self) -> CourseWithCoupon | None:
+        """Gets the next item, taking it from the lookahead if possible.
+
+        Returns:
+            The next item.
+
+        """
+        if self._lookahead:
+            return self._lookahead.popleft()
+
+        if (
+            self._cart
+            and self._mt_queue.empty()
+            and not self._stop_event.is_set()
+        ):
+            # Coupons can expire while waiting for more courses
+            self._checkout_cart()
+
+        return self._mt_queue.get()
+
+    def _prefetch_next(self) -> None:
+        """Takes available courses from the queue and prefetches them.
+
+        It stops at the first None, as the next ones are for other enrollers.
+
+        """
+        while len(self._lookahead) < self._prefetch_tabs and (
+            not self._lookahead or self._lookahead[-1] is not None
+        ):
+            try:
+                course = self._mt_queue.get_nowait()
+            except Empty:
+                return
+
+            self._lookahead.append(course)
+
+            if course and self._will_enroll(course, reattempt=False):
+                self._driver.prefetch(course)
+
+    def _will_enroll(self, course: CourseWithCoupon, reattempt: bool) -> bool:
         if not reattempt and self._attempts[course]:
             _debug.debug("%s is already in reattempt queue", course)
-        elif course in self._courses_store:
+            return False
+
+        if course in self._courses_store:
             _debug.debug("%s is already in store", course)
-        else:
-            state = self._driver.enroll(course)
-            self._handle_state(course, state)
+            return False
 
-            _debug.debug("Enroll finished for %s", course)
+        return True
+
+    def _handle_enroll(self, course: CourseWithCoupon, reattempt: bool) -> None:
+        if not self._will_enroll(course, reattempt):
+            self._skip(course)
+        elif not self._circuit_breaker.acquire():
+            # The run was stopped while the enrollments were paused
+            self._give_up(course)
+            self._driver.discard_prefetched(course)
+        else:
+            try:
+                self._enroll(course, reattempt)
+            finally:
+                self._circuit_breaker.release()
 
         _debug.debug(
             "mt qsize is %s, reattempt queue size is %s",
@@ -126,6 +256,120 @@ class Enroller:
             len(self._reattempt_queue),
         )
 
+    def _skip(self, course: CourseWithCoupon) -> None:
+        """Skips a course that doesn't need to be enrolled now.
+
+        Args:
+            course: The course to skip.
+
+        """
+        self._driver.discard_prefetched(course)
+
+        if course in self._courses_store:
+            self._mt_queue.complete(course)
+
+    def _enroll(self, course: CourseWithCoupon, reattempt: bool) -> None:
+        try:
+            state = self._driver.enroll(
+                course,
+                add_to_cart=self._cart_batch > 1 and not reattempt,
+            )
+        except DriverRestarted:
+            self._requeue(course)
+            return
+        except DriverUnavailable:
+            self._give_up(course)
+            raise
+
+        if state is State.IN_CART:
+            self._add_to_cart(course)
+        else:
+            self._handle_state(course, state)
+
+        _debug.debug("Enroll finished for %s", course)
+
+    def _add_to_cart(self, course: CourseWithCoupon) -> None:
+        _debug.debug("%s is in the cart", course)
+        _printer.info("Added %s to the cart", course.url_id)
+
+        self._cart.append(course)
+
+        if len(self._cart) >= self._cart_batch:
+            self._checkout_cart()
+
+    def _checkout_cart(self) -> None:
+        """Checks out the courses in the cart, and handles their state.
+
+        If the checkout fails, batching is disabled and the courses are
+        reattempted one by one, counting a single error for the checkout.
+
+        """
+        courses = self._cart
+        self._cart = []
+
+        if not self._circuit_breaker.acquire():
+            self._give_up(*courses)
+            return
+
+        try:
+            self._checkout_courses(courses)
+        finally:
+            self._circuit_breaker.release()
+
+    def _checkout_courses(self, courses: list[CourseWithCoupon]) -> None:
+        _debug.debug("Checking out %s courses from the cart", len(courses))
+        _printer.info("Enroller: Checking out %s courses", len(courses))
+
+        try:
+            state = self._driver.checkout_cart(courses)
+        except DriverRestarted:
+            state = None
+        except DriverUnavailable:
+            self._give_up(*courses)
+            raise
+
+        if state is State.ENROLLED:
+            for course in courses:
+                self._handle_state(course, state)
+            return
+
+        _printer.warning("Enroller: Checkout failed, no longer using the cart")
+        self._cart_batch = 0
+
+        # Courses left in the cart would be checked out with any later course,
+        # so they are only reattempted once they are out of it
+        if self._remove_from_cart(courses):
+            for course in courses:
+                self._requeue(course)
+        else:
+            self._give_up(*courses)
+
+        # A restarted driver is not counted as an error
+        if state is State.ERROR:
+            self._circuit_breaker.record_error()
+
+    def _remove_from_cart(self, courses: list[CourseWithCoupon]) -> bool:
+        """Removes the courses from the cart, after a failed checkout.
+
+        Args:
+            courses: The courses that were being checked out.
+
+        Returns:
+            Whether none of the courses is in the cart anymore.
+
+        Raises:
+            DriverUnavailable: If the driver can't be started, after giving up
+            the courses.
+
+        """
+        try:
+            return self._driver.remove_from_cart(courses)
+        except DriverRestarted:
+            return False
+        except DriverUnavailable:
+            self._give_up(*courses)
+            raise
+
     def _handle_state(
         self,
         course: CourseWithCoupon,
@@ -138,34 +382,56 @@ class Enroller:
             _printer.info("Enrolled in %s", course.url_id)
 
         if state in {State.ENROLLED, State.PAID}:
-            self._consecutive_errors = 0
+            self._circuit_breaker.record_success()
 
         if state in {State.TO_BLACKLIST, State.PAID}:
             _printer.info("Skipping %s", course.url_id)
 
         if state in {State.ENROLLED, State.TO_BLACKLIST}:
             self._courses_store.add(course.with_any_coupon())
+            self._mt_queue.complete(course)
         elif state is State.PAID:
             self._courses_store.add(course)
+            self._mt_queue.complete(course)
         # Only case left is ERROR
         else:
             self._handle_error(course)
+            return
+
+        if self._on_stored:
+            self._on_stored()
 
     def _handle_error(self, course: CourseWithCoupon) -> None:
-        self._consecutive_errors += 1
+        _debug.debug("Error %s", course)
 
-        _debug.debug(
-            "Error %s, consecutive errors is %s",
-            course,
-            self._consecutive_errors,
-        )
+        try:
+            self._circuit_breaker.record_error()
+        except ErrorBudgetExhausted:
+            self._give_up(course)
+            raise
 
-        if self._consecutive_errors > self._MAX_CONSECUTIVE_ERRORS:
-            self._errors.append(course)
-            raise ConsecutiveErrors()
+        self._requeue(course)
+
+    def _requeue(self, course: CourseWithCoupon) -> None:
+        """Reattempts the course later, or puts it in the errors if exhausted.
 
+        Args:
+            course: The course to requeue.
+
+        """
         if self._attempts[course] < self._MAX_REATTEMPTS:
             self._attempts[course] += 1
             self._reattempt_queue.append(course)
         else:
+            self._give_up(course)
+
+    def _give_up(self, *courses: CourseWithCoupon) -> None:
+        """Puts the courses in the errors, completing them as failed.
+
+        Args:
+            courses: The courses that won't be attempted again in this run.
+
+        """
+        for course in courses:
             self._errors.append(course)
+            self._mt_queue.complete(course, failed=True)
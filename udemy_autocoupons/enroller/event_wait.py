@@ -0,0 +1,341 @@
+"""This module contains the EventWait class and the conditions it uses."""
+
+from __future__ import annotations
+
+from collections.abc import Callable
+from dataclasses import dataclass
+from json import dumps
+from logging import getLogger
+from time import monotonic
+from typing import Generic, Literal, TypeVar
+
+from selenium.common.exceptions import (
+    JavascriptException,
+    NoSuchElementException,
+    TimeoutException,
+)
+from selenium.webdriver.remote.webdriver import WebDriver
+from selenium.webdriver.support import expected_conditions as EC  # noqa: N812
+
+from udemy_autocoupons.constants import WAIT_POLL_FREQUENCY
+
+_debug = getLogger("debug")
+
+_T = TypeVar("_T")
+
+# Extra time for the WebDriver to wait for the script, which ends by itself
+_SCRIPT_TIMEOUT_MARGIN = 5
+
+# Resolves when the predicate is truthy, the URL changes or the timeout is
+# reached. Without a predicate, it resolves on the first mutation. Computed
+# styles can change without mutations, so the predicate is also checked on an
+# interval, which runs in the browser and needs no requests to the WebDriver.
+# When settling, the predicate was truthy but the condition failed, so it
+# resolves on the first mutation or after the interval instead of right away.
+# It resolves with whether the predicate is truthy.
+_WAIT_SCRIPT = """
+const [timeout, interval, anyMutation, settling] = arguments;
+const done = arguments[arguments.length - 1];
+
+const isReady = () => {
+    try {
+        return Boolean(__PREDICATE__);
+    } catch {
+        return false;
+    }
+};
+
+if (!settling && isReady()) {
+    done(true);
+    return;
+}
+
+const startUrl = window.location.href;
+const handles = {};
+const finish = () => {
+    handles.observer.disconnect();
+    clearInterval(handles.interval);
+    clearTimeout(handles.timeout);
+    done(isReady());
+};
+const check = () => {
+    if (isReady() || window.location.href !== startUrl) {
+        finish();
+    }
+};
+
+handles.observer = new MutationObserver(
+    anyMutation || settling ? finish : check,
+);
+handles.observer.observe(document, {
+    attributes: true,
+    characterData: true,
+    childList: true,
+    subtree: true,
+});
+handles.interval = setInterval(settling ? finish : check, interval);
+handles.timeout = setTimeout(finish, timeout);
+"""
+
+
+@dataclass(frozen=True, slots=True)
+class DomCondition(Generic[_T]):
+    """An expected condition that can also be watched from the browser.
+
+    It can be used as a regular expected condition, for example with
+    WebDriverWait. EventWait additionally uses the script to know when it is
+    worth checking it.
+
+    Attributes:
+        check: The expected condition.
+        script: A JavaScript expression that is truthy when check is expected
+        to succeed.
+
+    """
+
+    check: Callable[[WebDriver], _T]
+    script: str
+
+    def __call__(self, driver: WebDriver) -> _T:
+        """Checks the expected condition.
+
+        Args:
+            driver: The WebDriver to use.
+
+        Returns:
+            The value returned by check.
+
+        """
+        return self.check(driver)
+
+
+class EventWait:
+    """A replacement for WebDriverWait that does not poll the WebDriver.
+
+    Between checks of the condition, it waits in the browser with a
+    MutationObserver until the page changes in a way that the condition could
+    be satisfied, so it reacts as soon as that happens while sending very few
+    requests to the WebDriver.
+
+    """
+
+    def __init__(self, driver: WebDriver, timeout: float) -> None:
+        """Stores the driver and sets its script timeout.
+
+        Args:
+            driver: The WebDriver to use.
+            timeout: The maximum number of seconds to wait.
+
+        """
+        self._driver = driver
+        self._timeout = timeout
+
+        driver.set_script_timeout(timeout + _SCRIPT_TIMEOUT_MARGIN)
+
+    def until(
+        self,
+        method: Callable[[WebDriver], _T | Literal[False]],
+        message: str = "",
+    ) -> _T:
+        """Waits until the method returns a truthy value.
+
+        Args:
+            method: The expected condition. If it is a DomCondition, its
+            script is watched in the browser, otherwise any change in the page
+            causes a new check.
+            message: The message of the exception if the timeout is reached.
+
+        Returns:
+            The value returned by method.
+
+        Raises:
+            TimeoutException: If the timeout is reached.
+
+        """
+        deadline = monotonic() + self._timeout
+        script = method.script if isinstance(method, DomCondition) else None
+        settling = False
+
+        while True:
+            try:
+                value = method(self._driver)
+            except NoSuchElementException:
+                value = False
+
+            if value:
+                return value
+
+            if (remaining := deadline - monotonic()) <= 0:
+                raise TimeoutException(message)
+
+            # The script can be truthy while the condition fails, as they
+            # can't always check the same, so it must not resolve right away
+            settling = self._wait_for_change(script, remaining, settling)
+
+    def _wait_for_change(
+        self,
+        script: str | None,
+        timeout: float,
+        settling: bool,
+    ) -> bool:
+        """Waits in the browser until the script is truthy or the page changes.
+
+        Args:
+            script: The JavaScript expression to wait for. If None, waits for
+            any mutation.
+            timeout: The maximum number of seconds to wait.
+            settling: Whether the script was truthy while the condition failed,
+            in which case it waits for any mutation or the poll interval.
+
+        Returns:
+            Whether the script is truthy when it stops waiting.
+
+        """
+        try:
+            return bool(
+                self._driver.execute_async_script(
+                    _WAIT_SCRIPT.replace("__PREDICATE__", script or "false"),
+                    int(timeout * 1000),
+                    int(WAIT_POLL_FREQUENCY * 1000),
+                    script is None,
+                    settling,
+                ),
+            )
+        except (JavascriptException, TimeoutException):
+            # Navigating unloads the document, which interrupts the script
+            _debug.debug("Waiting script was interrupted", exc_info=True)
+            return False
+
+
+def located_script(css_selector: str) -> str:
+    """Creates a script that checks if an element is present.
+
+    Args:
+        css_selector: The CSS selector of the element.
+
+    Returns:
+        The JavaScript expression.
+
+    """
+    return f"document.querySelector({dumps(css_selector)}) !== null"
+
+
+def text_script(css_selector: str) -> str:
+    """Creates a script that checks if any of the elements has text.
+
+    Args:
+        css_selector: The CSS selector of the elements.
+
+    Returns:
+        The JavaScript expression.
+
+    """
+    return (
+        f"Array.from(document.querySelectorAll({dumps(css_selector)}))"
+        ".some((element) => element.textContent.trim())"
+    )
+
+
+def clickable_script(css_selector: str) -> str:
+    """Creates a script that checks if an element is visible and enabled.
+
+    Args:
+        css_selector: The CSS selector of the element.
+
+    Returns:
+        The JavaScript expression.
+
+    """
+    return (
+        "((element) => element !== null && !element.disabled"
+        " && element.getClientRects().length > 0)"
+        f"(document.querySelector({dumps(css_selector)}))"
+    )
+
+
+def cursor_allowed_script(css_selector: str) -> str:
+    """Creates a script that checks if the cursor of an element is allowed.
+
+    Args:
+        css_selector: The CSS selector of the element.
+
+    Returns:
+        The JavaScript expression.
+
+    """
+    return (
+        "((element) => element !== null"
+        ' && getComputedStyle(element).cursor !== "not-allowed")'
+        f"(document.querySelector({dumps(css_selector)}))"
+    )
+
+
+def url_contains_script(fragment: str) -> str:
+    """Creates a script that checks if the URL contains the given fragment.
+
+    Args:
+        fragment: The fragment that the URL should contain.
+
+    Returns:
+        The JavaScript expression.
+
+    """
+    return f"window.location.href.includes({dumps(fragment)})"
+
+
+def url_to_be_script(url: str) -> str:
+    """Creates a script that checks if the URL is the given one.
+
+    Args:
+        url: The expected URL.
+
+    Returns:
+        The JavaScript expression.
+
+    """
+    return f"window.location.href === {dumps(url)}"
+
+
+def any_script(*scripts: str) -> str:
+    """Combines the scripts into one that is truthy if any of them is.
+
+    Args:
+        scripts: The JavaScript expressions to combine.
+
+    Returns:
+        The combined JavaScript expression.
+
+    """
+    return " || ".join(f"({script})" for script in scripts)
+
+
+def any_of(*conditions: DomCondition) -> DomCondition:
+    """Combines the conditions into one that succeeds if any of them does.
+
+    Args:
+        conditions: The conditions to combine.
+
+    Returns:
+        The combined condition, which returns the first truthy value.
+
+    """
+    return DomCondition(
+        EC.any_of(*conditions),
+        any_script(*(condition.script for condition in conditions)),
+    )
+
+
+def all_of(*conditions: DomCondition) -> DomCondition:
+    """Combines the conditions into one that succeeds if all of them do.
+
+    Args:
+        conditions: The conditions to combine.
+
+    Returns:
+        The combined condition, which returns the list of values.
+
+    """
+    return DomCondition(
+        EC.all_of(*conditions),
+        " && ".join(f"({condition.script})" for condition in conditions),
+    )
@@ -10,6 +10,7 @@ class State(Enum):
     ENROLLABLE = "ENROLLABLE"
     ENROLLED = "ENROLLED"
     ERROR = "ERROR"
+    IN_CART = "IN_CART"
     PAID = "PAID"
     TO_BLACKLIST = "TO_BLACKLIST"
 
@@ -17,3 +18,5 @@ class State(Enum):
 DoneT = Literal[State.ENROLLED, State.PAID, State.TO_BLACKLIST]
 
 DoneOrErrorT = DoneT | Literal[State.ERROR]
+
+EnrollResultT = DoneOrErrorT | Literal[State.IN_CART]
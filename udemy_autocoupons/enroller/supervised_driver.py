@@ -0,0 +1,298 @@
+"""This module contains the SupervisedDriver class."""
+
+from __future__ import annotations
+
+from collections.abc import Callable, Collection
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from logging import getLogger
+from threading import Thread, current_thread
+from typing import Literal, TypeVar
+
+from selenium.common.exceptions import WebDriverException
+
+from udemy_autocoupons.constants import ENROLL_DEADLINE
+from udemy_autocoupons.enroller.state import EnrollResultT, State
+from udemy_autocoupons.enroller.udemy_driver import UdemyDriver, is_dead_session
+from udemy_autocoupons.udemy_course import CourseWithCoupon
+
+_debug = getLogger("debug")
+_printer = getLogger("printer")
+
+_T = TypeVar("_T")
+
+
+class DriverRestarted(Exception):
+    """Raised when the driver died or hung, and was restarted.
+
+    The course that was being enrolled should be attempted again.
+
+    """
+
+
+class DriverUnavailable(Exception):
+    """Raised when the driver can't be started again."""
+
+
+class SupervisedDriver:
+    """Wraps a UdemyDriver, restarting it when it dies or hangs.
+
+    Every enrollment runs in a helper thread with a deadline. If the session
+    dies or the deadline is exceeded, the driver is quit and a new one is
+    started on the next use, so that the enroller can keep consuming. Any
+    other error is raised as is, since restarting would not fix it.
+
+    """
+
+    _MAX_CONSECUTIVE_RESTARTS = 3  # Allowed quantity, next one will raise
+    _QUIT_DEADLINE = 30  # Seconds before a driver that is quitting is killed
+
+    def __init__(
+        self,
+        create_driver: Callable[[], UdemyDriver],
+        deadline: float = ENROLL_DEADLINE,
+    ) -> None:
+        """Stores provided parameters. The driver is started on first use.
+
+        Args:
+            create_driver: A function that starts a new driver.
+            deadline: The maximum number of seconds for a single enrollment.
+
+        """
+        self._create_driver = create_driver
+        self._deadline = deadline
+
+        self._driver: UdemyDriver | None = None
+        self._consecutive_restarts = 0
+
+    def enroll(
+        self,
+        course: CourseWithCoupon,
+        add_to_cart: bool = False,
+    ) -> EnrollResultT:
+        """Enrolls in the course with the driver, see UdemyDriver.enroll.
+
+        Args:
+            course: The course to enroll in.
+            add_to_cart: Whether to leave the course in the cart.
+
+        Returns:
+            The state of the course after trying to enroll.
+
+        Raises:
+            DriverRestarted: If the driver died or hung while enrolling.
+            DriverUnavailable: If the driver can't be started.
+
+        """
+        return self._supervise(
+            lambda driver: driver.enroll(course, add_to_cart),
+            str(course),
+        )
+
+    def checkout_cart(
+        self,
+        courses: Collection[CourseWithCoupon],
+    ) -> Literal[State.ENROLLED, State.ERROR]:
+        """Checks out the cart with the driver, see UdemyDriver.checkout_cart.
+
+        Args:
+            courses: The courses that should be in the cart.
+
+        Returns:
+            The state of all the courses in the cart.
+
+        Raises:
+            DriverRestarted: If the driver died or hung while checking out.
+            DriverUnavailable: If the driver can't be started.
+
+        """
+        return self._supervise(
+            lambda driver: driver.checkout_cart(courses),
+            "the cart",
+        )
+
+    def remove_from_cart(self, courses: Collection[CourseWithCoupon]) -> bool:
+        """Removes the courses with the driver, see UdemyDriver.remove_from_cart.
+
+        Args:
+            courses: The courses to remove.
+
+        Returns:
+            Whether none of the courses is in the cart anymore.
+
+        Raises:
+            DriverRestarted: If the driver died or hung while removing them.
+            DriverUnavailable: If the driver can't be started.
+
+        """
+        return self._supervise(
+            lambda driver: driver.remove_from_cart(courses),
+            "the removal from the cart",
+        )
+
+    def prefetch(self, course: CourseWithCoupon) -> None:
+        """Prefetches the course if the driver is running.
+
+        Args:
+            course: The course that will be enrolled next.
+
+        """
+        if self._driver:
+            self._driver.prefetch(course)
+
+    def discard_prefetched(self, course: CourseWithCoupon) -> None:
+        """Discards the prefetched course if the driver is running.
+
+        Args:
+            course: The prefetched course.
+
+        """
+        if self._driver:
+            self._driver.discard_prefetched(course)
+
+    def quit(self) -> None:
+        """Quits the driver if it is running."""
+        if self._driver:
+            self._quit_driver()
+
+    def _supervise(
+        self,
+        action: Callable[[UdemyDriver], _T],
+        description: str,
+    ) -> _T:
+        """Runs the action with the driver in a helper thread, with a deadline.
+
+        Errors of the action that don't mean that the session died are raised
+        as they are.
+
+        Args:
+            action: The function to run with the driver.
+            description: What the action is used for, for logging.
+
+        Returns:
+            The value returned by the action.
+
+        Raises:
+            DriverRestarted: If the driver died or hung.
+            DriverUnavailable: If the driver can't be started.
+
+        """
+        future = _run_in_thread(action, self._get_driver(), "Action")
+
+        try:
+            result = future.result(timeout=self._deadline)
+        except FutureTimeoutError:
+            _debug.error("Driver exceeded the deadline for %s", description)
+            _printer.error("Enroller: The browser hung, restarting it.")
+            self._restart()
+            raise DriverRestarted() from None
+        except WebDriverException as exception:
+            if not is_dead_session(exception):
+                raise
+
+            _debug.exception("Driver died while used for %s", description)
+            _printer.error("Enroller: The browser crashed, restarting it.")
+            self._restart()
+            raise DriverRestarted() from exception
+
+        self._consecutive_restarts = 0
+
+        return result
+
+    def _get_driver(self) -> UdemyDriver:
+        """Gets the running driver, starting one if needed.
+
+        Returns:
+            The driver.
+
+        Raises:
+            DriverUnavailable: If there were too many consecutive restarts.
+
+        """
+        while self._driver is None:
+            if self._consecutive_restarts > self._MAX_CONSECUTIVE_RESTARTS:
+                raise DriverUnavailable()
+
+            try:
+                self._driver = self._create_driver()
+            except (WebDriverException, OSError):
+                _debug.exception("Could not start the driver")
+                self._consecutive_restarts += 1
+
+        return self._driver
+
+    def _restart(self) -> None:
+        """Quits the driver, so that a new one is started on the next use."""
+        self._consecutive_restarts += 1
+        _debug.debug("Consecutive restarts is %s", self._consecutive_restarts)
+
+        self._quit_driver()
+
+    def _quit_driver(self) -> None:
+        """Quits the driver, ignoring errors as it may already be dead.
+
+        Quitting runs in a helper thread with a deadline, after which the
+        driver is killed, so that a hung browser doesn't block its replacement.
+
+        """
+        assert self._driver
+
+        driver = self._driver
+        self._driver = None
+
+        future = _run_in_thread(lambda driver: driver.quit(), driver, "Quit")
+
+        try:
+            future.result(timeout=self._QUIT_DEADLINE)
+        except FutureTimeoutError:
+            _debug.error("Driver exceeded the deadline for quitting")
+            driver.kill()
+        except (WebDriverException, OSError):
+            _debug.exception("Could not quit the driver")
+
+
+def _run_in_thread(
+    action: Callable[[UdemyDriver], _T],
+    driver: UdemyDriver,
+    name: str,
+) -> Future[_T]:
+    """Runs the action with the driver in a daemon helper thread.
+
+    Args:
+        action: The function to run with the driver.
+        driver: The driver to use.
+        name: The name of the thread, after the name of the current one.
+
+    Returns:
+        The future with the result of the action.
+
+    """
+    future: Future[_T] = Future()
+    Thread(
+        target=_run_into_future,
+        args=(future, action, driver),
+        name=f"{current_thread().name}-{name}",
+        daemon=True,
+    ).start()
+
+    return future
+
+
+def _run_into_future(
+    future: Future[_T],
+    action: Callable[[UdemyDriver], _T],
+    driver: UdemyDriver,
+) -> None:
+    """Runs the action, setting its result or exception in the future.
+
+    Args:
+        future: The future to set.
+        action: The function to run with the driver.
+        driver: The driver to use.
+
+    """
+    try:
+        future.set_result(action(driver))
+    # Whatever is raised belongs to the waiting thread, which decides on it
+    # pylint: disable-next=broad-exception-caught
+    except BaseException as exception:  # noqa: B036
+        future.set_exception(exception)
@@ -0,0 +1,147 @@
+"""This module contains the Timings class and the types of its report."""
+
+from __future__ import annotations
+
+from bisect import bisect_left
+from collections import defaultdict
+from collections.abc import Iterable, Mapping
+from statistics import fmean, median, quantiles
+from threading import Lock
+from typing import TypedDict
+
+from udemy_autocoupons.enroller.state import State
+
+# Upper bounds of the histogram buckets, in seconds
+_BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+_BUCKET_NAMES = (*(str(bucket) for bucket in _BUCKETS), "+Inf")
+
+SpanT = tuple[str, float]
+
+
+class PhaseStatsJson(TypedDict):
+    """The aggregated durations of a phase for a resulting state.
+
+    The histogram maps the upper bound of each bucket, in seconds, to the
+    number of spans that fall in it and not in the previous one.
+
+    """
+
+    count: int
+    total: float
+    mean: float
+    median: float
+    p90: float
+    max: float
+    histogram: dict[str, int]
+
+
+class TimingsReportJson(TypedDict):
+    """The report of a run, by phase and then by resulting state.
+
+    The settings are the options of the run that affect the timings.
+
+    """
+
+    settings: dict[str, bool | int]
+    phases: dict[str, dict[str, PhaseStatsJson]]
+
+
+class Timings:
+    """Collects how long each phase of the enrollments takes.
+
+    Spans are tagged with the state that the enrollment resulted in, as slow
+    phases usually depend on it. It is thread-safe, so the same instance can
+    be shared by all the drivers of the pool.
+
+    """
+
+    def __init__(self) -> None:
+        """Starts with no spans."""
+        self._durations: defaultdict[
+            str,
+            defaultdict[State, list[float]],
+        ] = defaultdict(lambda: defaultdict(list))
+        self._lock = Lock()
+
+    def record(self, spans: Iterable[SpanT], state: State) -> None:
+        """Records the spans of an enrollment.
+
+        Args:
+            spans: The phases and their durations in seconds.
+            state: The state that the enrollment resulted in.
+
+        """
+        with self._lock:
+            for phase, duration in spans:
+                self._durations[phase][state].append(duration)
+
+    def durations(self, phase: str) -> list[float]:
+        """Gets the durations of a phase, regardless of the state.
+
+        Args:
+            phase: The phase to get.
+
+        Returns:
+            The durations in seconds, which can be empty.
+
+        """
+        with self._lock:
+            return [
+                duration
+                for durations in self._durations.get(phase, {}).values()
+                for duration in durations
+            ]
+
+    def create_report(
+        self,
+        settings: Mapping[str, bool | int],
+    ) -> TimingsReportJson:
+        """Aggregates the spans into histograms.
+
+        Args:
+            settings: The options of the run to include in the report.
+
+        Returns:
+            The report, which can be serialized to JSON.
+
+        """
+        with self._lock:
+            return {
+                "settings": dict(settings),
+                "phases": {
+                    phase: {
+                        state.value: _aggregate(durations)
+                        for state, durations in by_state.items()
+                    }
+                    for phase, by_state in self._durations.items()
+                },
+            }
+
+
+def _aggregate(durations: list[float]) -> PhaseStatsJson:
+    """Aggregates the durations of a phase.
+
+    Args:
+        durations: The durations, which can't be empty.
+
+    Returns:
+        The stats of the durations.
+
+    """
+    histogram = dict.fromkeys(_BUCKET_NAMES, 0)
+    for duration in durations:
+        histogram[_BUCKET_NAMES[bisect_left(_BUCKETS, duration)]] += 1
+
+    return {
+        "count": len(durations),
+        "total": sum(durations),
+        "mean": fmean(durations),
+        "median": median(durations),
+        "p90": (
+            quantiles(durations, n=10, method="inclusive")[-1]
+            if len(durations) > 1
+            else durations[0]
+        ),
+        "max": max(durations),
+        "histogram": histogram,
+    }
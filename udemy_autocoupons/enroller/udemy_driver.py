@@ -2,12 +2,19 @@
 
 from __future__ import annotations
 
-from collections.abc import Callable
+import signal
+from collections.abc import Callable, Collection, Iterator
+from contextlib import contextmanager
 from functools import partial
 from logging import getLogger
-from typing import Literal
-
-from selenium.common.exceptions import WebDriverException
+from os import kill
+from time import perf_counter
+from typing import Final, Literal, TypedDict
+
+from selenium.common.exceptions import (
+    InvalidSessionIdException,
+    WebDriverException,
+)
 from selenium.webdriver.common.by import By
 from selenium.webdriver.remote.webdriver import WebDriver
 from selenium.webdriver.remote.webelement import WebElement
@@ -16,7 +23,21 @@ from selenium.webdriver.support.wait import WebDriverWait
 from undetected_chromedriver import Chrome, ChromeOptions
 
 from udemy_autocoupons.constants import WAIT_POLL_FREQUENCY, WAIT_TIMEOUT
-from udemy_autocoupons.enroller.state import DoneOrErrorT, DoneT, State
+from udemy_autocoupons.enroller.event_wait import (
+    DomCondition,
+    EventWait,
+    all_of,
+    any_of,
+    any_script,
+    clickable_script,
+    cursor_allowed_script,
+    located_script,
+    text_script,
+    url_contains_script,
+    url_to_be_script,
+)
+from udemy_autocoupons.enroller.state import DoneT, EnrollResultT, State
+from udemy_autocoupons.enroller.timings import SpanT, Timings
 from udemy_autocoupons.udemy_course import CourseWithCoupon
 
 _printer = getLogger("printer")
@@ -25,6 +46,96 @@ _debug = getLogger("debug")
 _CheckedStateT = Literal[State.PAID, State.TO_BLACKLIST, State.ENROLLABLE]
 
 
+class _PageState(TypedDict):
+    """The state of the page, as returned by _PROBE_SCRIPT."""
+
+    url: str
+    forbidden: bool
+    found: dict[str, bool]
+    texts: dict[str, str]
+
+
+# Resources blocked in lean browsing. The enrollment only inspects a few DOM
+# nodes, so images, media, fonts and trackers are not needed. Stylesheets are
+# still loaded, as the visibility of the buttons depends on them.
+_LEAN_BLOCKED_URLS = (
+    "*.png",
+    "*.jpg",
+    "*.jpeg",
+    "*.gif",
+    "*.webp",
+    "*.svg",
+    "*.ico",
+    "*.woff",
+    "*.woff2",
+    "*.ttf",
+    "*.mp4",
+    "*.webm",
+    "*.m3u8",
+    "*img-c.udemycdn.com*",
+    "*img-b.udemycdn.com*",
+    "*mp4-c.udemycdn.com*",
+    "*google-analytics.com*",
+    "*googletagmanager.com*",
+    "*doubleclick.net*",
+    "*facebook.net*",
+    "*facebook.com/tr*",
+    "*hotjar.com*",
+    "*bat.bing.com*",
+    "*analytics.tiktok.com*",
+)
+
+# Messages of the errors after which the session can't be used anymore
+# Windows has no SIGKILL, but os.kill terminates the process with any signal
+_KILL_SIGNAL: Final = getattr(signal, "SIGKILL", signal.SIGTERM)
+
+_DEAD_SESSION_MESSAGES = (
+    "tab crashed",
+    "page crash",
+    "chrome not reachable",
+    "disconnected:",
+)
+
+_BLACKLISTED_URL_PARTS = ("/topic/", "/courses/", "/draft/")
+_HOME_URL = "https://www.udemy.com/"
+_CART_URL = "https://www.udemy.com/cart/"
+
+# textContent doesn't need a layout like innerText, as it is run on mutations
+_FORBIDDEN_SCRIPT = 'document.body?.textContent.trim() === "Forbidden"'
+
+_BLACKLISTED_URL_SCRIPT = any_script(
+    *(url_contains_script(part) for part in _BLACKLISTED_URL_PARTS),
+    url_to_be_script(_HOME_URL),
+)
+
+# Checks every selector in a single round trip. Receives the selectors to find
+# and the selectors to get the first non-empty text of, both by name. Texts
+# are read with textContent, like text_script, since innerText forces a layout.
+_PROBE_SCRIPT = """
+const [selectors, textSelectors] = arguments;
+
+const found = {};
+for (const [name, selector] of Object.entries(selectors)) {
+    found[name] = document.querySelector(selector) !== null;
+}
+
+const texts = {};
+for (const [name, selector] of Object.entries(textSelectors)) {
+    const elements = Array.from(document.querySelectorAll(selector));
+    texts[name] =
+        elements.map((element) => element.textContent.trim()).find(Boolean) ||
+        "";
+}
+
+return {
+    url: window.location.href,
+    forbidden: document.body?.textContent.trim() === "Forbidden",
+    found,
+    texts,
+};
+"""
+
+
 class UdemyDriver:
     """Handles Udemy usage.
 
@@ -43,19 +154,62 @@ class UdemyDriver:
         "PURCHASED": '[class*="purchase-info"]',
         "FREE_COURSE": '[class*="generic-purchase-section--free-course"]',
         "PRICE_SELECTOR": '[class*="sidebar-container--content"] [data-purpose*="course-price-text"] span:not(.ud-sr-only)',
+        "UNAVAILABLE": '[class*="limited-access-container--content"]',
+        "BANNER_404": ".error__container",
+        "PRIVATE": '[class*="course-landing-page-private"]',
+        "TOTAL_AMOUNT": '[data-purpose*="total-amount-summary"] span:nth-child(2)',
+        "CART_CHECKOUT": '[data-purpose*="shopping-cart-checkout"]',
+        "CART_ITEM": '[class*="shopping-item--shopping-item"]',
+        "CART_ITEM_LINK": 'a[href*="/course/"]',
+        "CART_ITEM_REMOVE": '[data-purpose*="shopping-item-remove"]',
+        "EMPTY_CART": '[class*="empty-shopping-cart"]',
+    }
+
+    # The selectors whose text is included in the page state
+    _TEXT_SELECTORS = {
+        "PRICE_SELECTOR": _SELECTORS["PRICE_SELECTOR"],
+        "TOTAL_AMOUNT": _SELECTORS["TOTAL_AMOUNT"],
     }
 
-    def __init__(self, profile_directory: str, user_data_dir: str) -> None:
+    # Any of these is enough for _fast_course_state to decide
+    _FAST_STATE_SELECTORS = (
+        "UNAVAILABLE",
+        "BANNER_404",
+        "PRIVATE",
+        "ENROLL_BUTTON",
+        "FREE_BADGE",
+        "PURCHASED",
+        "FREE_COURSE",
+        "PRICE_SELECTOR",
+    )
+
+    def __init__(
+        self,
+        profile_directory: str,
+        user_data_dir: str,
+        event_waits: bool = False,
+        lean: bool = False,
+        timings: Timings | None = None,
+    ) -> None:
         """Starts the driver.
 
         Args:
             profile_directory: The directory of the profile to use.
             user_data_dir: The directory with the profile directory.
+            event_waits: Whether to wait for DOM events in the browser instead
+            of polling the WebDriver.
+            lean: Whether to block non-essential resources and stop waiting
+            for the page load once the DOM is ready.
+            timings: Where to record how long each phase of the enrollments
+            takes, which can be shared with other drivers.
 
         """
         options = ChromeOptions()
         options.add_argument("--start-maximized")
 
+        if lean:
+            options.page_load_strategy = "eager"
+
         options.add_argument(f"--profile-directory={profile_directory}")
         options.add_argument(f"user-data-dir={user_data_dir}")
 
@@ -69,53 +223,268 @@ class UdemyDriver:
 
         _debug.debug("Started WebDriver")
 
-        self._wait = WebDriverWait(
-            self.driver,
-            WAIT_TIMEOUT,
-            WAIT_POLL_FREQUENCY,
+        self._lean = lean
+        if lean:
+            self._block_resources()
+            _debug.debug("Lean browsing enabled")
+
+        self._timings = timings or Timings()
+        # Spans of the current enrollment, recorded once its state is known
+        self._spans: list[SpanT] = []
+
+        # Background tabs with courses that will be enrolled next
+        self._main_window = self.driver.current_window_handle
+        self._prefetched_tabs: dict[CourseWithCoupon, str] = {}
+        self._in_prefetched_tab = False
+
+        self._wait: WebDriverWait | EventWait = (
+            EventWait(self.driver, WAIT_TIMEOUT)
+            if event_waits
+            else WebDriverWait(self.driver, WAIT_TIMEOUT, WAIT_POLL_FREQUENCY)
         )
 
     def quit(self) -> None:
         """Quits the WebDriver instance."""
         self.driver.quit()
 
-    def enroll(self, course: CourseWithCoupon) -> DoneOrErrorT:
+    def kill(self) -> None:
+        """Kills the browser and the WebDriver, for when quitting hangs."""
+        for pid in (self.driver.browser_pid, self.driver.service.process.pid):
+            try:
+                kill(pid, _KILL_SIGNAL)
+            except OSError:
+                _debug.exception("Could not kill the process %s", pid)
+
+    def prefetch(self, course: CourseWithCoupon) -> None:
+        """Starts loading the course in a background tab.
+
+        When the course is enrolled, the tab is used instead of loading it
+        again, so its load time is hidden behind the previous courses.
+
+        In lean browsing, the tab is opened blank, so that its resources are
+        blocked before the course starts loading.
+
+        Args:
+            course: The course that will be enrolled next.
+
+        """
+        if course in self._prefetched_tabs:
+            return
+
+        try:
+            target = self.driver.execute_cdp_cmd(
+                "Target.createTarget",
+                {
+                    "url": "about:blank" if self._lean else course.url,
+                    "background": True,
+                },
+            )
+        except WebDriverException:
+            _debug.exception("Could not prefetch %s", course)
+            return
+
+        # Window handles are the ids of the targets
+        self._prefetched_tabs[course] = target["targetId"]
+        _debug.debug("Prefetching %s in %s", course, target["targetId"])
+
+        if self._lean:
+            self._load_lean(course, target["targetId"])
+
+    def discard_prefetched(self, course: CourseWithCoupon) -> None:
+        """Closes the tab of a prefetched course that won't be enrolled.
+
+        Args:
+            course: The prefetched course.
+
+        """
+        if (handle := self._prefetched_tabs.pop(course, None)) is None:
+            return
+
+        try:
+            self.driver.execute_cdp_cmd(
+                "Target.closeTarget",
+                {"targetId": handle},
+            )
+        except WebDriverException:
+            _debug.exception("Could not close the tab of %s", course)
+
+    def enroll(
+        self,
+        course: CourseWithCoupon,
+        add_to_cart: bool = False,
+    ) -> EnrollResultT:
         """If the course is discounted, it enrolls the account in it.
 
         Args:
             course: The course to enroll in.
+            add_to_cart: Whether to leave the course in the cart, if it can
+            only be enrolled through it, to check it out later with others.
 
         Returns:
-            The state of the course after trying to enroll.
+            The state of the course after trying to enroll, IN_CART if it was
+            left in the cart.
+
+        Raises:
+            WebDriverException: If the session died, see is_dead_session.
 
         """
         try:
-            return self._enroll(course)
-        except WebDriverException:
+            state = self._enroll(course, add_to_cart)
+        except WebDriverException as exception:
+            if is_dead_session(exception):
+                raise
+
             _debug.exception(
                 "A WebDriverException was encountered while enrolling in %s",
                 course,
             )
             _printer.error("Enroller: An error occurred while enrolling.")
+            state = State.ERROR
+        finally:
+            self._leave_prefetched_tab()
+
+        self._record_spans(state)
+
+        return state
+
+    def checkout_cart(
+        self,
+        courses: Collection[CourseWithCoupon],
+    ) -> Literal[State.ENROLLED, State.ERROR]:
+        """Checks out the courses that were left in the cart.
+
+        The cart is shared by every driver logged in to the account, so it is
+        only checked out if it holds exactly the given courses.
+
+        Args:
+            courses: The courses that should be in the cart.
+
+        Returns:
+            ENROLLED if all the courses in the cart were enrolled, ERROR
+            otherwise, as the result of each course cannot be known.
+
+        Raises:
+            WebDriverException: If the session died, see is_dead_session.
+
+        """
+        _debug.debug("Checking out the cart")
+
+        try:
+            state = self._checkout_cart(courses)
+        except WebDriverException as exception:
+            if is_dead_session(exception):
+                raise
+
+            _debug.exception(
+                "A WebDriverException was encountered while checking out",
+            )
+            _printer.error("Enroller: An error occurred while checking out.")
+            state = State.ERROR
+
+        self._record_spans(state)
+
+        return state
+
+    def remove_from_cart(self, courses: Collection[CourseWithCoupon]) -> bool:
+        """Removes the courses from the cart, so that no checkout includes them.
+
+        Other courses in the cart are left as they are.
+
+        Args:
+            courses: The courses to remove.
+
+        Returns:
+            Whether none of the courses is in the cart anymore.
+
+        Raises:
+            WebDriverException: If the session died, see is_dead_session.
+
+        """
+        _debug.debug("Removing %s courses from the cart", len(courses))
+
+        try:
+            removed = self._remove_from_cart(
+                {course.url_id for course in courses},
+            )
+        except WebDriverException as exception:
+            if is_dead_session(exception):
+                raise
+
+            _debug.exception(
+                "A WebDriverException was encountered while removing courses",
+            )
+            removed = False
+
+        if not removed:
+            _printer.error("Enroller: Could not remove courses from the cart.")
+
+        return removed
+
+    def _checkout_cart(
+        self,
+        courses: Collection[CourseWithCoupon],
+    ) -> Literal[State.ENROLLED, State.ERROR]:
+        with self._phase("cart.get"):
+            self.driver.get(_CART_URL)
+            self._wait_for_cart()
+
+        with self._phase("cart.holds_courses"):
+            in_cart = self._cart_items().keys()
+
+        if in_cart != {course.url_id for course in courses}:
+            _debug.error("The cart holds %s instead of %s", in_cart, courses)
+            return State.ERROR
+
+        with self._phase("cart.go_to_checkout"):
+            self._click_cart_checkout()
+
+        with self._phase("cart.checkout_is_correct"):
+            state = self._checkout_is_correct()
+
+        if state != State.ENROLLABLE:
+            _debug.error("_checkout_is_correct returned %s for cart", state)
             return State.ERROR
 
-    def _enroll(self, course: CourseWithCoupon) -> DoneT:
+        with self._phase("cart.complete_checkout"):
+            self._complete_checkout()
+
+        return State.ENROLLED
+
+    def _enroll(
+        self,
+        course: CourseWithCoupon,
+        add_to_cart: bool,
+    ) -> DoneT | Literal[State.IN_CART]:
         _debug.debug("Enrolling in %s", course.url)
 
-        self.driver.get(course.url)
+        self._open(course)
 
-        if (state := self._fast_course_state(course)) != State.ENROLLABLE:
+        with self._phase("fast_course_state"):
+            state, page_state = self._fast_course_state(course)
+        if state != State.ENROLLABLE:
             _debug.debug("_fast_course_state is %s for %s", state, course.url)
             return state
 
-        if (state := self._get_course_state()) != State.ENROLLABLE:
+        with self._phase("get_course_state"):
+            state = self._get_course_state(page_state)
+        if state != State.ENROLLABLE:
             _debug.debug("_get_course_state is %s for %s", state, course.url)
             return state
 
-        self._go_to_checkout()
+        with self._phase("go_to_checkout"):
+            has_enroll_button = self._wait_for_purchase_buttons()
+
+            if add_to_cart and not has_enroll_button:
+                self._add_to_cart()
+                _debug.debug("Left %s in the cart", course.url)
+                return State.IN_CART
+
+            self._go_to_checkout(has_enroll_button)
 
         _debug.debug("Checking if checkout is correct")
-        if (state := self._checkout_is_correct()) != State.ENROLLABLE:
+        with self._phase("checkout_is_correct"):
+            state = self._checkout_is_correct()
+        if state != State.ENROLLABLE:
             # This is only intended as a safeguard, the execution should never
             # hit this branch
             _debug.error(
@@ -125,13 +494,20 @@ class UdemyDriver:
             )
             return state
 
+        with self._phase("complete_checkout"):
+            self._complete_checkout()
+
+        return State.ENROLLED
+
+    def _complete_checkout(self) -> None:
+        """Completes the checkout on the checkout page."""
         checkout_button_selector = (
             '[class*="checkout-button--checkout-button--button"]'
         )
 
         _debug.debug("Waiting for checkout button clickable")
         self._wait.until(
-            EC.all_of(
+            all_of(
                 self._ec_clickable(checkout_button_selector),
                 self._ec_cursor_allowed(checkout_button_selector),
             ),
@@ -139,17 +515,150 @@ class UdemyDriver:
 
         self._find(checkout_button_selector).click()
 
-        self._wait.until(lambda driver: "checkout" not in driver.current_url)
-        return State.ENROLLED
+        self._wait.until(
+            DomCondition(
+                lambda driver: "checkout" not in driver.current_url,
+                f"!({url_contains_script('checkout')})",
+            ),
+        )
+
+    def _open(self, course: CourseWithCoupon) -> None:
+        """Opens the course, in its prefetched tab if there is one.
 
-    def _go_to_checkout(self) -> None:
-        """Goes to the checkout page."""
+        Args:
+            course: The course to open.
+
+        """
+        if (handle := self._prefetched_tabs.pop(course, None)) is None:
+            self._get(course.url)
+            return
+
+        try:
+            self.driver.switch_to.window(handle)
+        except WebDriverException:
+            _debug.exception("Prefetched tab of %s is not available", course)
+            self._get(course.url)
+            return
+
+        self._in_prefetched_tab = True
+        _debug.debug("Using prefetched tab for %s", course)
+
+    def _leave_prefetched_tab(self) -> None:
+        """Closes the current tab if it was prefetched, going back to the main one."""
+        if not self._in_prefetched_tab:
+            return
+
+        self._in_prefetched_tab = False
+        try:
+            self.driver.close()
+        except WebDriverException:
+            _debug.exception("Could not close the prefetched tab")
+
+        # Even if the tab could not be closed, the main one must be used
+        try:
+            self.driver.switch_to.window(self._main_window)
+        except WebDriverException:
+            _debug.exception("Could not go back to the main window")
+
+    def _block_resources(self) -> None:
+        """Blocks the non-essential resources in the current tab.
+
+        The blocked URLs only apply to the tab that receives the commands.
+
+        """
+        self.driver.execute_cdp_cmd("Network.enable", {})
+        self.driver.execute_cdp_cmd(
+            "Network.setBlockedURLs",
+            {"urls": list(_LEAN_BLOCKED_URLS)},
+        )
+
+    def _load_lean(self, course: CourseWithCoupon, handle: str) -> None:
+        """Loads the course in its blank prefetched tab, blocking resources.
+
+        If it fails, the tab is left blank, and the course is loaded when it
+        is opened.
+
+        Args:
+            course: The prefetched course.
+            handle: The handle of its tab.
+
+        """
+        try:
+            self._navigate_blocking(handle, course.url)
+        except WebDriverException:
+            _debug.exception("Could not load the prefetched %s", course)
+
+        # The enrollment continues in the main tab
+        try:
+            self.driver.switch_to.window(self._main_window)
+        except WebDriverException:
+            _debug.exception("Could not go back to the main window")
+
+    def _navigate_blocking(self, handle: str, url: str) -> None:
+        """Starts loading a URL in a tab, blocking non-essential resources.
+
+        The tab is left as the current one.
+
+        Args:
+            handle: The handle of the tab.
+            url: The URL to load.
+
+        """
+        self.driver.switch_to.window(handle)
+        self._block_resources()
+        # Unlike get, it doesn't wait for the page to load
+        self.driver.execute_cdp_cmd("Page.navigate", {"url": url})
+
+    def _get(self, url: str) -> None:
+        """Loads the URL, measuring how long it takes.
+
+        Args:
+            url: The URL to load.
+
+        """
+        with self._phase("get"):
+            self.driver.get(url)
+
+        _debug.debug("Loaded %s in %.3fs", url, self._spans[-1][1])
+
+    @contextmanager
+    def _phase(self, name: str) -> Iterator[None]:
+        """Measures how long the block takes, even if it raises.
+
+        Args:
+            name: The name of the phase.
+
+        """
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            self._spans.append((name, perf_counter() - start))
+
+    def _record_spans(self, state: State) -> None:
+        """Records the spans of the current enrollment with its state.
+
+        Args:
+            state: The state that the enrollment resulted in.
+
+        """
+        self._timings.record(self._spans, state)
+        self._spans = []
+
+    def _wait_for_purchase_buttons(self) -> bool:
+        """Waits for the enroll or cart buttons of the course.
+
+        Returns:
+            Whether the course can be enrolled directly, instead of through
+            the cart.
+
+        """
         checks = [
             self._ec_located(self._SELECTORS["ENROLL_BUTTON"]),
             self._ec_clickable(self._SELECTORS["CART_BUTTON"]),
         ]
         _debug.debug("Waiting for enroll or cart buttons")
-        self._wait.until(EC.any_of(*checks))
+        self._wait.until(any_of(*checks))
 
         enroll_buttons = self._find_elements(self._SELECTORS["ENROLL_BUTTON"])
         cart_buttons = self._find_elements(self._SELECTORS["CART_BUTTON"])
@@ -160,146 +669,202 @@ class UdemyDriver:
             cart_buttons,
         )
 
-        if enroll_buttons:
+        return bool(enroll_buttons)
+
+    def _go_to_checkout(self, has_enroll_button: bool) -> None:
+        """Goes to the checkout page.
+
+        Args:
+            has_enroll_button: Whether the course can be enrolled directly.
+
+        """
+        if has_enroll_button:
             self._wait_for_clickable(self._SELECTORS["ENROLL_BUTTON"]).click()
             return
 
-        cart_buttons[0].click()
+        self._add_to_cart().click()
+        self._click_cart_checkout()
+
+    def _click_cart_checkout(self) -> None:
+        """Goes from the cart to the checkout page."""
+        _debug.debug("Waiting for checkout button")
+        self._wait_for_clickable(self._SELECTORS["CART_CHECKOUT"]).click()
+
+    def _wait_for_cart(self) -> None:
+        """Waits until the cart shows its courses, or that it is empty."""
+        checks = [
+            self._ec_clickable(self._SELECTORS["CART_CHECKOUT"]),
+            self._ec_located(self._SELECTORS["EMPTY_CART"]),
+        ]
+        _debug.debug("Waiting for the cart")
+        self._wait.until(any_of(*checks))
+
+    def _cart_items(self) -> dict[str, WebElement]:
+        """Finds the courses in the cart, which must be already shown.
+
+        Returns:
+            The item of each course in the cart, by its url_id.
+
+        """
+        items = {}
+
+        for item in self._find_elements(self._SELECTORS["CART_ITEM"]):
+            link = item.find_element(
+                By.CSS_SELECTOR,
+                self._SELECTORS["CART_ITEM_LINK"],
+            )
+
+            href = link.get_attribute("href") or ""
+            if course := CourseWithCoupon.from_url(href):
+                items[course.url_id] = item
+
+        return items
+
+    def _remove_from_cart(self, url_ids: set[str]) -> bool:
+        """Removes the courses from the cart one by one.
+
+        Args:
+            url_ids: The url_ids of the courses to remove.
+
+        Returns:
+            Whether none of the courses is in the cart anymore.
+
+        """
+        self.driver.get(_CART_URL)
+
+        # Each removal takes one attempt, the last one only checks the cart
+        for _ in range(len(url_ids) + 1):
+            self._wait_for_cart()
+
+            items = self._cart_items()
+            if not (in_cart := url_ids & items.keys()):
+                return True
+
+            item = items[next(iter(in_cart))]
+            item.find_element(
+                By.CSS_SELECTOR,
+                self._SELECTORS["CART_ITEM_REMOVE"],
+            ).click()
+            self._wait.until(EC.staleness_of(item))
+
+        return False
+
+    def _add_to_cart(self) -> WebElement:
+        """Adds the course to the cart.
+
+        Returns:
+            The go to cart button, which shows that the course is in the cart.
+
+        """
+        self._wait_for_clickable(self._SELECTORS["CART_BUTTON"]).click()
         go_to_cart_button_selector = '[data-purpose*="go-to-cart-button"]'
         _debug.debug("Waiting for go to cart button")
-        self._wait_for_clickable(go_to_cart_button_selector).click()
-        checkout_button_selector = '[data-purpose*="shopping-cart-checkout"]'
-        _debug.debug("Waiting for checkout button")
-        self._wait_for_clickable(checkout_button_selector).click()
+        return self._wait_for_clickable(go_to_cart_button_selector)
 
-    def _fast_course_state(self, course: CourseWithCoupon) -> _CheckedStateT:
+    def _fast_course_state(
+        self,
+        course: CourseWithCoupon,
+    ) -> tuple[_CheckedStateT, _PageState]:
         """Check if the current course on screen is enrollable.
 
         This might return a false positive, but it's the fastest method so it
         should be used first.
 
+        Args:
+            course: The course that should be on screen.
+
         Returns:
-           True if the current course is enrollable, False otherwise.
+           The state of the course and the page state it was decided from.
 
         """
-        unavailable_selector = '[class*="limited-access-container--content"]'
-        banner404_selector = ".error__container"
-        private_button_selector = '[class*="course-landing-page-private"]'
-
-        checks = [
-            lambda driver: driver.find_element(By.CSS_SELECTOR, "body").text
-            == "Forbidden",
-            EC.url_contains("/topic/"),
-            EC.url_contains("/courses/"),
-            EC.url_contains("/draft/"),
-            EC.url_to_be("https://www.udemy.com/"),
-            self._ec_located(unavailable_selector),
-            self._ec_located(banner404_selector),
-            self._ec_located(private_button_selector),
-            self._ec_located(self._SELECTORS["ENROLL_BUTTON"]),
-            self._ec_located(self._SELECTORS["FREE_BADGE"]),
-            self._ec_located(self._SELECTORS["PURCHASED"]),
-            self._ec_located(self._SELECTORS["FREE_COURSE"]),
-            self._ec_located(self._SELECTORS["PRICE_SELECTOR"]),
-        ]
-
-        if course.coupon:
-            checks.append(EC.url_to_be(course.with_any_coupon().url))
-
-        self._wait.until(EC.any_of(*checks))
+        any_coupon_url = course.with_any_coupon().url
+
+        def is_decided(page_state: _PageState) -> bool:
+            return (
+                page_state["forbidden"]
+                or self._is_blacklisted_url(page_state["url"])
+                or bool(course.coupon and page_state["url"] == any_coupon_url)
+                or any(
+                    page_state["found"][name]
+                    for name in self._FAST_STATE_SELECTORS
+                )
+            )
 
-        body_text = self.driver.find_element(By.CSS_SELECTOR, "body").text
-        unavailable_elements = self._find_elements(unavailable_selector)
-        banner404_elements = self._find_elements(banner404_selector)
-        private_button_elements = self._find_elements(private_button_selector)
-        free_badge_elements = self._find_elements(self._SELECTORS["PURCHASED"])
-        purchased_elements = self._find_elements(self._SELECTORS["FREE_BADGE"])
-        free_course_elements = self._find_elements(
-            self._SELECTORS["FREE_COURSE"],
+        page_state = self._wait_for_page_state(
+            is_decided,
+            any_script(
+                _FORBIDDEN_SCRIPT,
+                _BLACKLISTED_URL_SCRIPT,
+                *(
+                    located_script(self._SELECTORS[name])
+                    for name in self._FAST_STATE_SELECTORS
+                ),
+                url_to_be_script(any_coupon_url) if course.coupon else "false",
+            ),
         )
-        price = self._find_elements(
-            self._SELECTORS["PRICE_SELECTOR"],
-        ) and self._get_price(self.driver)
 
-        _debug.debug(
-            "Url: %s; unavailable: %s; banner404: %s",
-            self.driver.current_url,
-            unavailable_elements,
-            banner404_elements,
-        )
-        _debug.debug(
-            "private_button: %s; free_badge: %s; purchased: %s; free_course: %s; price: %s",
-            private_button_elements,
-            free_badge_elements,
-            purchased_elements,
-            free_course_elements,
-            price,
-        )
+        _debug.debug("Page state: %s", page_state)
 
+        found = page_state["found"]
         to_blacklist = (
-            body_text == "Forbidden"
-            or "/topic/" in self.driver.current_url
-            or "/courses/" in self.driver.current_url
-            or "/draft/" in self.driver.current_url
-            or self.driver.current_url == "https://www.udemy.com/"
-            or unavailable_elements
-            or banner404_elements
-            or private_button_elements
-            or free_badge_elements
-            or purchased_elements
-            or free_course_elements
+            page_state["forbidden"]
+            or self._is_blacklisted_url(page_state["url"])
+            or found["UNAVAILABLE"]
+            or found["BANNER_404"]
+            or found["PRIVATE"]
+            or found["FREE_BADGE"]
+            or found["PURCHASED"]
+            or found["FREE_COURSE"]
         )
 
         if to_blacklist:
-            return State.TO_BLACKLIST
-
-        is_paid = self.driver.current_url == course.with_any_coupon().url or (
-            price and "$" in price
-        )
+            return State.TO_BLACKLIST, page_state
 
-        if is_paid:
-            return State.PAID
+        price = page_state["texts"]["PRICE_SELECTOR"]
+        if page_state["url"] == any_coupon_url or "$" in price:
+            return State.PAID, page_state
 
-        return State.ENROLLABLE
+        return State.ENROLLABLE, page_state
 
-    def _get_course_state(self) -> _CheckedStateT:
+    def _get_course_state(self, page_state: _PageState) -> _CheckedStateT:
         """Checks the state of the course in screen.
 
+        Args:
+            page_state: The last page state, which is probed again only if it
+            is not enough to decide.
+
         Returns:
             The state of the course.
 
         """
-        self._wait.until(
-            EC.any_of(
-                self._ec_located(self._SELECTORS["PURCHASED"]),
-                self._ec_located(self._SELECTORS["PRICE_SELECTOR"]),
-                self._ec_located(self._SELECTORS["FREE_BADGE"]),
-                self._ec_located(self._SELECTORS["FREE_COURSE"]),
-            ),
-        )
 
-        free_badge_elements = self._find_elements(self._SELECTORS["FREE_BADGE"])
-        purchased_elements = self._find_elements(self._SELECTORS["PURCHASED"])
-        free_course_elements = self._find_elements(
-            self._SELECTORS["FREE_COURSE"],
-        )
+        def is_decided(page_state: _PageState) -> bool:
+            return bool(
+                page_state["found"]["PURCHASED"]
+                or page_state["found"]["FREE_BADGE"]
+                or page_state["found"]["FREE_COURSE"]
+                # Sometimes the element renders before its text
+                or page_state["texts"]["PRICE_SELECTOR"],
+            )
 
-        if free_badge_elements or purchased_elements or free_course_elements:
-            _debug.debug(
-                "In %s, free badge %s, purchased, %s, free course %s",
-                self.driver.current_url,
-                free_badge_elements,
-                purchased_elements,
-                free_course_elements,
+        if not is_decided(page_state):
+            page_state = self._wait_for_page_state(
+                is_decided,
+                any_script(
+                    located_script(self._SELECTORS["PURCHASED"]),
+                    located_script(self._SELECTORS["FREE_BADGE"]),
+                    located_script(self._SELECTORS["FREE_COURSE"]),
+                    text_script(self._SELECTORS["PRICE_SELECTOR"]),
+                ),
             )
 
-            return State.TO_BLACKLIST
+        found = page_state["found"]
+        if found["FREE_BADGE"] or found["PURCHASED"] or found["FREE_COURSE"]:
+            _debug.debug("Page state is %s", page_state)
 
-        # Wait first so that we can then use find_element instead of nesting waits
-        self._wait_for(self._SELECTORS["PRICE_SELECTOR"])
+            return State.TO_BLACKLIST
 
-        # Sometimes the element renders before its text
-        price_text: str = self._wait.until(self._get_price)
+        price_text = page_state["texts"]["PRICE_SELECTOR"]
 
         _debug.debug("price_text is %s", price_text)
 
@@ -314,29 +879,29 @@ class UdemyDriver:
             The state of the course.
 
         """
-        total_amount_locator = (
-            '[data-purpose*="total-amount-summary"] span:nth-child(2)'
-        )
 
-        self._wait.until(
-            EC.any_of(
-                EC.url_contains("/learn/lecture/"),
-                EC.url_contains("/cart/subscribe/course/"),
-                lambda driver: bool(
-                    self._ec_located(total_amount_locator)(driver),
-                ),
+        def is_enrolled(page_state: _PageState) -> bool:
+            return (
+                "/learn/lecture/" in page_state["url"]
+                or "/cart/subscribe/course/" in page_state["url"]
+            )
+
+        page_state = self._wait_for_page_state(
+            lambda page_state: is_enrolled(page_state)
+            or bool(page_state["texts"]["TOTAL_AMOUNT"]),
+            any_script(
+                url_contains_script("/learn/lecture/"),
+                url_contains_script("/cart/subscribe/course/"),
+                text_script(self._SELECTORS["TOTAL_AMOUNT"]),
             ),
         )
 
-        _debug.debug("Url is %s", self.driver.current_url)
+        _debug.debug("Url is %s", page_state["url"])
 
-        if (
-            "/learn/lecture/" in self.driver.current_url
-            or "/cart/subscribe/course/" in self.driver.current_url
-        ):
+        if is_enrolled(page_state):
             return State.TO_BLACKLIST
 
-        total_amount_text = self._wait_for(total_amount_locator).text
+        total_amount_text = page_state["texts"]["TOTAL_AMOUNT"]
 
         _debug.debug("Total amount text is %s", total_amount_text)
 
@@ -346,29 +911,59 @@ class UdemyDriver:
             else State.PAID
         )
 
-    def _get_price(self, driver: WebDriver) -> str | Literal[False]:
-        elements = driver.find_elements(
-            By.CSS_SELECTOR,
-            self._SELECTORS["PRICE_SELECTOR"],
+    def _probe(self) -> _PageState:
+        """Gets the state of the page in a single request to the WebDriver.
+
+        Returns:
+            Which of the known selectors are present, the text of the ones
+            that need it, and the current URL.
+
+        """
+        return self.driver.execute_script(
+            _PROBE_SCRIPT,
+            self._SELECTORS,
+            self._TEXT_SELECTORS,
         )
-        _debug.debug("Found %s price elements: %s", len(elements), elements)
-        for element in elements:
-            if element.text:
-                return element.text
 
-        return False
+    def _wait_for_page_state(
+        self,
+        predicate: Callable[[_PageState], bool],
+        script: str,
+    ) -> _PageState:
+        """Probes the page until its state satisfies the predicate.
 
-    def _wait_for(self, css_selector: str) -> WebElement:
-        """Waits until the element with the given CSS selector is located.
+        Args:
+            predicate: A function that returns whether the state is the
+            expected one.
+            script: A JavaScript expression equivalent to the predicate, used
+            to wait for it in the browser.
+
+        Returns:
+            The first page state that satisfies the predicate.
+
+        """
+
+        def probe_until(_: WebDriver) -> _PageState | Literal[False]:
+            page_state = self._probe()
+            return page_state if predicate(page_state) else False
+
+        return self._wait.until(DomCondition(probe_until, script))
+
+    @staticmethod
+    def _is_blacklisted_url(url: str) -> bool:
+        """Checks if the URL is one to which Udemy redirects bad courses.
 
         Args:
-            css_selector: The CSS selector of the element.
+            url: The URL to check.
 
         Returns:
-            The element once it's found.
+            Whether the course should be blacklisted.
 
         """
-        return self._wait.until(self._ec_located(css_selector))
+        return (
+            any(part in url for part in _BLACKLISTED_URL_PARTS)
+            or url == _HOME_URL
+        )
 
     def _wait_for_clickable(self, css_selector: str) -> WebElement:
         """Waits until the element with the given CSS selector is clickable.
@@ -410,7 +1005,7 @@ class UdemyDriver:
         return self.driver.find_elements(By.CSS_SELECTOR, css_selector)
 
     @staticmethod
-    def _ec_located(css_selector: str) -> Callable[[WebDriver], WebElement]:
+    def _ec_located(css_selector: str) -> DomCondition[WebElement]:
         """Creates an expected condition for locating the given selector.
 
         Args:
@@ -420,12 +1015,15 @@ class UdemyDriver:
             An expected condition which returns the found element.
 
         """
-        return EC.presence_of_element_located((By.CSS_SELECTOR, css_selector))
+        return DomCondition(
+            EC.presence_of_element_located((By.CSS_SELECTOR, css_selector)),
+            located_script(css_selector),
+        )
 
     @staticmethod
     def _ec_clickable(
         css_selector: str,
-    ) -> Callable[[WebDriver], WebElement | Literal[False]]:
+    ) -> DomCondition[WebElement | Literal[False]]:
         """Creates an expected condition for the given selector to be clickable.
 
         Args:
@@ -435,7 +1033,10 @@ class UdemyDriver:
             An expected condition which returns the found element.
 
         """
-        return EC.element_to_be_clickable((By.CSS_SELECTOR, css_selector))
+        return DomCondition(
+            EC.element_to_be_clickable((By.CSS_SELECTOR, css_selector)),
+            clickable_script(css_selector),
+        )
 
     @staticmethod
     def _cursor_to_be_allowed(
@@ -460,7 +1061,7 @@ class UdemyDriver:
     def _ec_cursor_allowed(
         cls,
         css_selector: str,
-    ) -> Callable[[WebDriver], WebElement | Literal[False]]:
+    ) -> DomCondition[WebElement | Literal[False]]:
         """Creates an expected condition for the cursor to be allowed.
 
         Args:
@@ -470,4 +1071,27 @@ class UdemyDriver:
             An expected condition which returns the found element.
 
         """
-        return partial(cls._cursor_to_be_allowed, css_selector)
+        return DomCondition(
+            partial(cls._cursor_to_be_allowed, css_selector),
+            cursor_allowed_script(css_selector),
+        )
+
+
+def is_dead_session(exception: WebDriverException) -> bool:
+    """Checks if the exception means that the session can't be used anymore.
+
+    That happens when the session is closed, the renderer crashes or Chrome
+    can't be reached, in which case the driver has to be started again.
+
+    Args:
+        exception: The exception raised by the WebDriver.
+
+    Returns:
+        Whether the session is dead.
+
+    """
+    if isinstance(exception, InvalidSessionIdException):
+        return True
+
+    message = (exception.msg or "").lower()
+    return any(part in message for part in _DEAD_SESSION_MESSAGES)
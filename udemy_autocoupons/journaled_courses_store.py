@@ -0,0 +1,301 @@
+"""This module contains the JournaledCoursesStore class."""
+
+from __future__ import annotations
+
+from collections.abc import Callable
+from json import dumps, loads
+from logging import getLogger
+from os import fsync
+from pathlib import Path
+from threading import Thread
+from typing import BinaryIO
+
+from udemy_autocoupons.courses_store import CoursesStore
+from udemy_autocoupons.udemy_course import (
+    CourseWithAnyCoupon,
+    CourseWithCoupon,
+    UdemyCourseT,
+)
+
+_debug = getLogger("debug")
+
+_CompressedT = tuple[str | tuple[str, str], ...]
+
+_ADD = "+"
+_DISCARD = "-"
+
+
+class JournaledCoursesStore(CoursesStore):
+    """A CoursesStore that appends every change to a journal file.
+
+    The store is loaded from the last snapshot plus the journal, so there is
+    nothing to save at the end of the run, and a crash loses at most the
+    record being written.
+
+    Once the journal has enough records, it is folded into a new snapshot in
+    a background thread, while the changes go to a new journal. The old
+    journal is kept until the snapshot is saved, and replayed on load if it
+    is still there. If the snapshot can't be saved, the old journal is moved
+    back in front of the new one, so that a later compaction can retry.
+
+    """
+
+    _COMPACT_AFTER = 10_000  # Records
+
+    def __init__(
+        self,
+        journal_path: Path,
+        save_snapshot: Callable[[_CompressedT], None],
+        snapshot: _CompressedT | None = None,
+    ) -> None:
+        """Loads the snapshot and replays the journal on top of it.
+
+        Args:
+            journal_path: The path of the journal file.
+            save_snapshot: A function that saves the compressed store, which
+            is called from the compaction thread.
+            snapshot: The compressed store of the last snapshot, if any.
+
+        """
+        super().__init__()
+        self._journal_path = journal_path
+        self._compacting_path = journal_path.with_name(
+            f"{journal_path.name}.compacting",
+        )
+        self._save_snapshot = save_snapshot
+        self._compaction: Thread | None = None
+        self._records = 0
+
+        with self._lock:
+            if snapshot:
+                self.load_compressed(snapshot)
+
+            for path in (self._compacting_path, self._journal_path):
+                self._records += self._replay(path)
+
+            if self._compacting_path.is_file():
+                self._recover()
+
+            self._journal = self._open_journal()
+
+        if self._records >= self._COMPACT_AFTER:
+            self.compact()
+
+    def add(self, value: UdemyCourseT) -> None:  # noqa: WPS110
+        """Adds a course to the store, journaling it if it is new."""
+        with self._lock:
+            if value in self:
+                return
+
+            self._add(value)
+            self._append(_ADD, value)
+
+    def discard(self, value: UdemyCourseT) -> None:  # noqa: WPS110
+        """Removes a course without raising if it doesn't exist.
+
+        It is only journaled if it was removed.
+
+        """
+        with self._lock:
+            length = len(self)
+            self._discard(value)
+
+            if len(self) < length:
+                self._append(_DISCARD, value)
+
+    def compact(self) -> None:
+        """Folds the journal into a new snapshot in a background thread.
+
+        Nothing is done if the previous compaction did not finish.
+
+        """
+        with self._lock:
+            if self._compacting_path.exists():
+                _debug.debug("Previous compaction is not finished")
+                return
+
+            compressed = self.create_compressed()
+
+            self._journal.close()
+            self._journal_path.replace(self._compacting_path)
+            self._journal = self._open_journal()
+            self._records = 0
+
+            self._compaction = Thread(
+                target=self._finish_compaction,
+                args=(compressed,),
+                name="CoursesStoreCompactionThread",
+            )
+            self._compaction.start()
+
+    def sync(self) -> None:
+        """Makes sure that the journal is written to the disk."""
+        with self._lock:
+            self._journal.flush()
+            fsync(self._journal.fileno())
+
+    def close(self) -> None:
+        """Waits for the compaction, if any, and closes the journal."""
+        if self._compaction:
+            self._compaction.join()
+
+        with self._lock:
+            self._journal.close()
+
+    def _append(self, operation: str, course: UdemyCourseT) -> None:
+        """Appends a record to the journal. The lock must be held.
+
+        Args:
+            operation: Whether the course was added or discarded.
+            course: The course.
+
+        """
+        record = (
+            [operation, course.url_id]
+            if course.any_coupon
+            else [operation, course.url_id, course.coupon]
+        )
+        self._journal.write(
+            f"{dumps(record, separators=(',', ':'))}\n".encode(),
+        )
+        # Flushed to the OS, so that it survives a crash of the process
+        self._journal.flush()
+
+        self._records += 1
+        if self._records >= self._COMPACT_AFTER:
+            self.compact()
+
+    def _replay(self, path: Path) -> int:
+        """Applies the records of a journal file. The lock must be held.
+
+        Invalid records, like the last one if the write was interrupted, are
+        skipped.
+
+        Args:
+            path: The journal file, which may not exist.
+
+        Returns:
+            The number of records.
+
+        """
+        if not path.is_file():
+            return 0
+
+        records = 0
+        with path.open("rb") as journal:
+            for line in journal:
+                try:
+                    operation, url_id, *coupon = loads(line)
+                # JSONDecodeError is a ValueError
+                except (TypeError, ValueError):
+                    _debug.warning("Skipping invalid record %r", line)
+                    continue
+
+                course: UdemyCourseT = (
+                    CourseWithCoupon(url_id, coupon[0])
+                    if coupon
+                    else CourseWithAnyCoupon(url_id)
+                )
+                if operation == _ADD:
+                    self._add(course)
+                # It may be replayed on a snapshot that does not have it
+                elif course in self:
+                    self._discard(course)
+                records += 1
+
+        _debug.debug("Replayed %s records from %s", records, path)
+
+        return records
+
+    def _recover(self) -> None:
+        """Finishes a compaction interrupted by a crash. The lock must be held.
+
+        Both journals were already replayed, so they are folded into the
+        snapshot.
+
+        """
+        _debug.debug("Finishing interrupted compaction")
+
+        self._save_snapshot(self.create_compressed())
+        self._compacting_path.unlink()
+        self._journal_path.unlink(missing_ok=True)
+        self._records = 0
+
+    def _open_journal(self) -> BinaryIO:
+        """Opens the journal for appending, after any interrupted record.
+
+        Returns:
+            The journal file.
+
+        """
+        journal = self._journal_path.open("a+b")
+
+        # An interrupted record must not be joined with the next one
+        if end := journal.tell():
+            journal.seek(end - 1)
+            if journal.read(1) != b"\n":
+                journal.write(b"\n")
+
+        return journal
+
+    def _finish_compaction(self, compressed: _CompressedT) -> None:
+        """Saves the snapshot and removes the journal that it replaces.
+
+        Args:
+            compressed: The compressed store, as of the start of the
+            compaction.
+
+        """
+        try:
+            self._save_snapshot(compressed)
+        except OSError:
+            _debug.exception("Could not save the courses store snapshot")
+            self._abort_compaction()
+            return
+
+        self._compacting_path.unlink()
+        _debug.debug("Compacted the courses store journal")
+
+    def _abort_compaction(self) -> None:
+        """Moves the records of the old journal back in front of the new one.
+
+        The merged journal replaces the new one atomically, so a crash keeps
+        both journals, which are replayed on load. If they can't be merged,
+        the old journal is kept, and no compaction is done until the next
+        load.
+
+        """
+        merged_path = self._journal_path.with_name(
+            f"{self._journal_path.name}.merging",
+        )
+
+        with self._lock:
+            self._journal.close()
+
+            try:
+                self._merge_journals(merged_path)
+            except OSError:
+                _debug.exception("Could not merge the courses store journals")
+            else:
+                self._compacting_path.unlink()
+                _debug.debug("Moved the records back to the journal")
+
+            self._journal = self._open_journal()
+
+    def _merge_journals(self, merged_path: Path) -> None:
+        """Writes the old and the new journals into the journal file.
+
+        The lock must be held and the journal must be closed.
+
+        Args:
+            merged_path: The temporary file to write the merged journal to.
+
+        """
+        with merged_path.open("wb") as merged:
+            for path in (self._compacting_path, self._journal_path):
+                merged.write(path.read_bytes())
+
+            merged.flush()
+            fsync(merged.fileno())
+
+        merged_path.replace(self._journal_path)
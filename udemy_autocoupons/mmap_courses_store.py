@@ -0,0 +1,471 @@
+"""This module contains the MmapCoursesStore class."""
+
+from __future__ import annotations
+
+import sys
+from array import array
+from collections.abc import Iterator
+from itertools import accumulate
+from mmap import mmap
+from pathlib import Path
+from struct import Struct
+from threading import RLock
+from typing import Final, NamedTuple
+
+from udemy_autocoupons.courses_store import BaseCoursesStore, CoursesStore
+from udemy_autocoupons.data_file import (
+    HEADER_SIZE,
+    Codec,
+    DataKind,
+    map_data_file,
+    write_data_file,
+)
+from udemy_autocoupons.udemy_course import (
+    CourseWithAnyCoupon,
+    CourseWithCoupon,
+    UdemyCourseT,
+    is_with_any_coupon,
+)
+
+_CompressedT = tuple[str | tuple[str, str | None], ...]
+
+# The counts of the tables, then an offset per entry and one for the end
+_COUNTS = Struct("<QQ")
+_OFFSET = Struct("<Q")
+_OFFSETS = Struct("<QQ")
+_OFFSET_SIZE: Final = _OFFSET.size
+
+# Keys of the courses with a specific coupon start with the url_id length
+_URL_ID_LENGTH = Struct(">I")
+# Separates the url_id from the coupon, which is missing if it is None
+_COUPON_MARK = b"\x00"
+
+
+class _Table(NamedTuple):
+    """A sorted table of keys in the index."""
+
+    count: int
+    offsets_start: int
+    keys_start: int
+
+
+class MmapCoursesStore(BaseCoursesStore):
+    """A set-like store for mixed UdemyCourse instances, mapped from a file.
+
+    The saved courses are in a read-only index of sorted keys with an offset
+    table, which is memory-mapped and searched by binary search, so opening
+    it takes the same time no matter how big it is. The courses added since
+    the last save are kept in a CoursesStore, and the saved ones that are
+    discarded are kept as tombstones. Saving writes a new index with all of
+    them.
+
+    Like CoursesStore, adding a course with any_coupon removes the courses
+    with a specific coupon that it contains.
+
+    All the methods are thread-safe.
+
+    """
+
+    def __init__(self, path: Path) -> None:
+        """Maps the index, if it exists.
+
+        Args:
+            path: The path of the index file.
+
+        """
+        self._path = path
+        self._lock = RLock()
+
+        self._added = CoursesStore()
+        self._discarded: set[UdemyCourseT] = set()
+
+        self._index: mmap | None = None
+        self._any_coupon = _Table(0, 0, 0)
+        self._specific_coupon = _Table(0, 0, 0)
+
+        self._map_index()
+
+    def __contains__(self, course: object) -> bool:
+        """Checks if the given element is in the store."""
+        if not isinstance(course, UdemyCourseT):
+            return False
+
+        with self._lock:
+            if course in self._added:
+                return True
+
+            if self._is_saved(CourseWithAnyCoupon(course.url_id)):
+                return True
+
+            return not course.any_coupon and self._is_saved(course)
+
+    def __iter__(self) -> Iterator[UdemyCourseT]:
+        """Iterates over the saved courses and then over the added ones.
+
+        The courses are read when the iteration starts.
+
+        """
+        with self._lock:
+            courses = [
+                course
+                for course in self._iter_saved()
+                if course not in self._discarded
+            ]
+            courses.extend(self._added)
+
+        yield from courses
+
+    def __len__(self) -> int:
+        """Returns the number of items in the store.
+
+        This number could be reduced after calling optimize().
+
+        """
+        with self._lock:
+            return (
+                self._any_coupon.count
+                + self._specific_coupon.count
+                - len(self._discarded)
+                + len(self._added)
+            )
+
+    def add(self, value: UdemyCourseT) -> None:  # noqa: WPS110
+        """Adds a course to the store."""
+        with self._lock:
+            if value in self:
+                return
+
+            if value in self._discarded:
+                self._discarded.remove(value)
+            else:
+                self._added.add(value)
+
+            if is_with_any_coupon(value):
+                # The added ones are already removed unless it was restored
+                for coupon in self._added.coupons_of(value.url_id):
+                    self._added.discard(CourseWithCoupon(value.url_id, coupon))
+                self._discarded.update(self._iter_saved_coupons(value.url_id))
+
+    def discard(self, value: UdemyCourseT) -> None:  # noqa: WPS110
+        """Removes a course without raising if it doesn't exist."""
+        with self._lock:
+            self._added.discard(value)
+
+            if self._is_saved(value):
+                self._discarded.add(value)
+
+    def optimize(self) -> None:
+        """Removes the courses that are contained by a course with any_coupon.
+
+        Only the added courses are optimized, the index is optimized when it
+        is saved.
+
+        """
+        with self._lock:
+            self._added.optimize()
+
+    def save(self) -> None:
+        """Writes a new index with all the courses, if there are changes.
+
+        The new index replaces the old one atomically, and it is mapped
+        instead of it.
+
+        """
+        with self._lock:
+            if not self._added and not self._discarded:
+                return
+
+            any_keys = self._saved_keys(self._any_coupon)
+            specific_keys = self._saved_keys(self._specific_coupon)
+
+            if self._discarded:
+                discarded_any = set()
+                discarded_specific = set()
+                for course in self._discarded:
+                    if is_with_any_coupon(course):
+                        discarded_any.add(course.url_id.encode())
+                    else:
+                        discarded_specific.add(
+                            _specific_key(course.url_id, course.coupon),
+                        )
+
+                any_keys = [key for key in any_keys if key not in discarded_any]
+                specific_keys = [
+                    key
+                    for key in specific_keys
+                    if key not in discarded_specific
+                ]
+
+            for course in self._added:
+                if is_with_any_coupon(course):
+                    any_keys.append(course.url_id.encode())
+                else:
+                    specific_keys.append(
+                        _specific_key(course.url_id, course.coupon),
+                    )
+
+            payload = _encode_index(any_keys, specific_keys)
+
+            # A mapped file can't be replaced on Windows
+            self._unmap_index()
+            try:
+                write_data_file(
+                    self._path,
+                    DataKind.COURSES_INDEX,
+                    payload,
+                    Codec.RAW,
+                )
+            finally:
+                self._map_index()
+
+            self._added = CoursesStore()
+            self._discarded.clear()
+
+    def close(self) -> None:
+        """Unmaps the index, without saving the changes."""
+        with self._lock:
+            self._unmap_index()
+
+    def _map_index(self) -> None:
+        """Maps the index file and reads its tables. The lock must be held."""
+        if not self._path.is_file():
+            return
+
+        self._index = map_data_file(self._path, DataKind.COURSES_INDEX)
+
+        any_count, specific_count = _COUNTS.unpack_from(
+            self._index,
+            HEADER_SIZE,
+        )
+        any_offsets_start = HEADER_SIZE + _COUNTS.size
+        specific_offsets_start = (
+            any_offsets_start + (any_count + 1) * _OFFSET_SIZE
+        )
+        any_keys_start = specific_offsets_start + (
+            (specific_count + 1) * _OFFSET_SIZE
+        )
+        (any_keys_length,) = _OFFSET.unpack_from(
+            self._index,
+            any_offsets_start + any_count * _OFFSET_SIZE,
+        )
+
+        self._any_coupon = _Table(any_count, any_offsets_start, any_keys_start)
+        self._specific_coupon = _Table(
+            specific_count,
+            specific_offsets_start,
+            any_keys_start + any_keys_length,
+        )
+
+    def _unmap_index(self) -> None:
+        """Closes the map of the index, if any. The lock must be held."""
+        if self._index is not None:
+            self._index.close()
+            self._index = None
+
+        self._any_coupon = _Table(0, 0, 0)
+        self._specific_coupon = _Table(0, 0, 0)
+
+    def _is_saved(self, course: UdemyCourseT) -> bool:
+        """Checks if a course is in the index and not discarded.
+
+        The lock must be held.
+
+        """
+        if self._discarded and course in self._discarded:
+            return False
+
+        if is_with_any_coupon(course):
+            return self._search(self._any_coupon, course.url_id.encode())
+
+        return self._search(
+            self._specific_coupon,
+            _specific_key(course.url_id, course.coupon),
+        )
+
+    def _search(self, table: _Table, key: bytes) -> bool:
+        """Searches a key in a table. The lock must be held.
+
+        Args:
+            table: The table.
+            key: The key.
+
+        Returns:
+            Whether the table contains the key.
+
+        """
+        position = self._lower_bound(table, key)
+
+        return position < table.count and self._entry(table, position) == key
+
+    def _lower_bound(self, table: _Table, key: bytes) -> int:
+        """Finds the first key that is not less than a key, by binary search.
+
+        The lock must be held.
+
+        Args:
+            table: The table.
+            key: The key.
+
+        Returns:
+            The position of the first key, or the count if there is none.
+
+        """
+        # Inlined, since it runs for every check of a course
+        index = self._index
+        unpack_offsets = _OFFSETS.unpack_from
+        offsets_start, keys_start = table.offsets_start, table.keys_start
+
+        low, high = 0, table.count
+        while low < high:
+            middle = (low + high) // 2
+            start, end = unpack_offsets(
+                index,
+                offsets_start + middle * _OFFSET_SIZE,
+            )
+            if index[keys_start + start : keys_start + end] < key:
+                low = middle + 1
+            else:
+                high = middle
+
+        return low
+
+    def _entry(self, table: _Table, position: int) -> bytes:
+        """Reads a key of a table. The lock must be held."""
+        assert self._index is not None
+        start, end = _OFFSETS.unpack_from(
+            self._index,
+            table.offsets_start + position * _OFFSET_SIZE,
+        )
+
+        return self._index[table.keys_start + start : table.keys_start + end]
+
+    def _saved_keys(self, table: _Table) -> list[bytes]:
+        """Reads all the keys of a table. The lock must be held.
+
+        Args:
+            table: The table.
+
+        Returns:
+            The keys, sorted.
+
+        """
+        if not table.count:
+            return []
+
+        assert self._index is not None
+        offsets = array("Q")
+        offsets.frombytes(
+            self._index[
+                table.offsets_start : table.offsets_start
+                + (table.count + 1) * _OFFSET_SIZE
+            ],
+        )
+        if sys.byteorder == "big":
+            offsets.byteswap()
+
+        keys = self._index[table.keys_start : table.keys_start + offsets[-1]]
+
+        return [keys[start:end] for start, end in zip(offsets, offsets[1:])]
+
+    def _iter_saved_coupons(self, url_id: str) -> Iterator[CourseWithCoupon]:
+        """Iterates over the saved courses with a specific coupon of a url_id.
+
+        Their keys are together, since they start with the same url_id. The
+        lock must be held.
+
+        """
+        prefix = _specific_key(url_id, None)
+        position = self._lower_bound(self._specific_coupon, prefix)
+
+        while position < self._specific_coupon.count:
+            key = self._entry(self._specific_coupon, position)
+            if not key.startswith(prefix):
+                return
+
+            yield _decode_specific_key(key)
+            position += 1
+
+    def _iter_saved(self) -> Iterator[UdemyCourseT]:
+        """Iterates over the courses of the index. The lock must be held."""
+        for key in self._saved_keys(self._any_coupon):
+            yield CourseWithAnyCoupon(key.decode())
+
+        for key in self._saved_keys(self._specific_coupon):
+            yield _decode_specific_key(key)
+
+
+def _specific_key(url_id: str, coupon: str | None) -> bytes:
+    """Creates the key of a course with a specific coupon.
+
+    The url_id is prefixed with its length, so that keys are unambiguous,
+    and a None coupon has no mark, so that it differs from an empty one.
+
+    Args:
+        url_id: The url_id of the course.
+        coupon: The coupon of the course.
+
+    Returns:
+        The key.
+
+    """
+    encoded_url_id = url_id.encode()
+    key = _URL_ID_LENGTH.pack(len(encoded_url_id)) + encoded_url_id
+
+    return key if coupon is None else key + _COUPON_MARK + coupon.encode()
+
+
+def _decode_specific_key(key: bytes) -> CourseWithCoupon:
+    """Creates the course with a specific coupon of a key.
+
+    Args:
+        key: The key, as returned by _specific_key.
+
+    Returns:
+        The course.
+
+    """
+    (url_id_length,) = _URL_ID_LENGTH.unpack_from(key)
+    url_id_end = _URL_ID_LENGTH.size + url_id_length
+
+    return CourseWithCoupon(
+        key[_URL_ID_LENGTH.size : url_id_end].decode(),
+        (
+            key[url_id_end + len(_COUPON_MARK) :].decode()
+            if len(key) > url_id_end
+            else None
+        ),
+    )
+
+
+def _encode_index(any_keys: list[bytes], specific_keys: list[bytes]) -> bytes:
+    """Encodes the index of the keys of the courses.
+
+    Args:
+        any_keys: The keys of the courses with any coupon. They are sorted in
+        place.
+        specific_keys: The keys of the courses with a specific coupon, as
+        returned by _specific_key. They are sorted in place.
+
+    Returns:
+        The payload of the index file.
+
+    """
+    # The saved keys come first and are sorted, which makes sorting cheap
+    any_keys.sort()
+    specific_keys.sort()
+
+    tables = []
+    for keys in (any_keys, specific_keys):
+        offsets = array("Q", accumulate((len(key) for key in keys), initial=0))
+        if sys.byteorder == "big":
+            offsets.byteswap()
+        tables.append(offsets.tobytes())
+
+    return b"".join(
+        (
+            _COUNTS.pack(len(any_keys), len(specific_keys)),
+            *tables,
+            *any_keys,
+            *specific_keys,
+        ),
+    )
@@ -13,6 +13,21 @@ class ParsedArguments(TypedDict):
     profile_directory: str
     user_data_dir: str
     setup: str
+    workers: int
+    event_waits: bool
+    lean: bool
+    pre_check: bool
+    prefetch_tabs: int
+    cart_batch: int
+    error_budget: int
+    max_coupon_age: float
+    drop_stale: bool
+    scraped_queue_size: int
+    course_queue_size: int
+    daemon: bool
+    checkpoint_every: int
+    store: str
+    prefilter: bool
 
 
 DIRECTORIES_BY_SYSTEM = frozendict(
@@ -38,6 +53,25 @@ def parse_arguments() -> ParsedArguments:
         default=DIRECTORIES_BY_SYSTEM[system()],
     )
     parser.add_argument("--setup", choices=["telegram"])
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--event-waits", action="store_true")
+    parser.add_argument("--lean", action="store_true")
+    parser.add_argument("--no-pre-check", action="store_true")
+    parser.add_argument("--prefetch-tabs", type=int, default=0)
+    parser.add_argument("--cart-batch", type=int, default=0)
+    parser.add_argument("--error-budget", type=int, default=0)
+    parser.add_argument("--max-coupon-age", type=float, default=72)
+    parser.add_argument("--drop-stale", action="store_true")
+    parser.add_argument("--scraped-queue-size", type=int, default=1000)
+    parser.add_argument("--course-queue-size", type=int, default=100)
+    parser.add_argument("--daemon", action="store_true")
+    parser.add_argument("--checkpoint-every", type=int, default=0)
+    parser.add_argument(
+        "--store",
+        choices=["pickle", "compact", "journal", "sqlite", "mmap"],
+        default="pickle",
+    )
+    parser.add_argument("--prefilter", action="store_true")
 
     args = parser.parse_args()
 
@@ -45,4 +79,19 @@ def parse_arguments() -> ParsedArguments:
         "profile_directory": args.profile_directory,
         "user_data_dir": args.user_data_dir,
         "setup": args.setup,
+        "workers": max(args.workers, 1),
+        "event_waits": args.event_waits,
+        "lean": args.lean,
+        "pre_check": not args.no_pre_check,
+        "prefetch_tabs": max(args.prefetch_tabs, 0),
+        "cart_batch": max(args.cart_batch, 0),
+        "error_budget": max(args.error_budget, 0),
+        "max_coupon_age": max(args.max_coupon_age, 0),
+        "drop_stale": args.drop_stale,
+        "scraped_queue_size": max(args.scraped_queue_size, 0),
+        "course_queue_size": max(args.course_queue_size, 0),
+        "daemon": args.daemon,
+        "checkpoint_every": max(args.checkpoint_every, 0),
+        "store": args.store,
+        "prefilter": args.prefilter,
     }
@@ -1,17 +1,40 @@
 """This file contains functions to load and save persistent data."""
 
 from collections import defaultdict
+from datetime import datetime, timezone
+from functools import partial
+from json import dumps
 from logging import getLogger
 from pathlib import Path
-from pickle import Pickler, Unpickler
+from pickle import Unpickler, dumps as dump_pickle, loads as load_pickle
 from typing import Any
 
-from udemy_autocoupons.courses_store import CoursesStore
+from udemy_autocoupons.bloom_filter import BloomFilter
+from udemy_autocoupons.compact_courses_store import CompactCoursesStore
+from udemy_autocoupons.course_journal import CourseJournal
+from udemy_autocoupons.courses_store import BaseCoursesStore, CoursesStore
+from udemy_autocoupons.data_file import (
+    DataKind,
+    decode_courses,
+    encode_courses,
+    read_data_file,
+    write_atomically,
+    write_data_file,
+)
+from udemy_autocoupons.enroller.timings import TimingsReportJson
+from udemy_autocoupons.journaled_courses_store import JournaledCoursesStore
+from udemy_autocoupons.mmap_courses_store import MmapCoursesStore
+from udemy_autocoupons.prefiltered_courses_store import PrefilteredCoursesStore
 from udemy_autocoupons.scrapers import ScrapersT
+from udemy_autocoupons.sqlite_courses_store import SqliteCoursesStore
 from udemy_autocoupons.udemy_course import CourseWithCoupon
 
 _debug = getLogger("debug")
 
+_MIN_BLOOM_FILTER_CAPACITY = 100_000
+
+_CompressedT = tuple[str | tuple[str, str | None], ...]
+
 
 def save_scrapers_data(scrapers: ScrapersT) -> None:
     """Saves the scrapers persistent data to a file.
@@ -19,13 +42,39 @@ def save_scrapers_data(scrapers: ScrapersT) -> None:
     Args:
         scrapers: The used scrapers.
 
+    """
+    write_scrapers_data(dump_scrapers_data(scrapers))
+
+
+def dump_scrapers_data(scrapers: ScrapersT) -> bytes:
+    """Pickles the scrapers persistent data.
+
+    The data is shared with the running scrapers, so it must be pickled from
+    the event loop, but it can then be written from any thread.
+
+    Args:
+        scrapers: The used scrapers.
+
+    Returns:
+        The pickled data, to save with write_scrapers_data.
+
     """
     scrapers_data = {
         scraper.__class__.__name__: scraper.create_persistent_data()
         for scraper in scrapers
     }
 
-    _save_persistent("scrapers.pickle", scrapers_data)
+    return dump_pickle(scrapers_data, 4)
+
+
+def write_scrapers_data(payload: bytes) -> None:
+    """Saves the scrapers persistent data pickled by dump_scrapers_data.
+
+    Args:
+        payload: The pickled data.
+
+    """
+    _save_data_file("scrapers", DataKind.PICKLE, payload)
 
 
 def load_scrapers_data() -> defaultdict[str, Any]:
@@ -36,32 +85,141 @@ def load_scrapers_data() -> defaultdict[str, Any]:
         to the amount of scrapers by adding None at the end if needed.
 
     """
-    if previous := _load_persistent("scrapers.pickle"):
+    if previous := _load_persistent("scrapers"):
         return defaultdict(lambda: None, previous)
 
     return defaultdict(lambda: None)
 
 
-def save_courses_store(courses_store: CoursesStore) -> None:
+def save_courses_store(courses_store: BaseCoursesStore) -> None:
     """Saves the courses store to a file.
 
+    SQLite and journaled stores are written on every change, so they are not
+    saved again, and a mapped store writes its own index. The Bloom filter of
+    a prefiltered store is saved with the length of the store.
+
     Args:
         courses_store: The courses store.
 
     """
-    _save_persistent("courses_store.pickle", courses_store.create_compressed())
+    if isinstance(courses_store, PrefilteredCoursesStore):
+        _save_persistent(
+            "courses_store_bloom",
+            (len(courses_store.store), courses_store.bloom_filter),
+        )
+        courses_store = courses_store.store
+
+    if isinstance(courses_store, SqliteCoursesStore):
+        return
+
+    if isinstance(courses_store, JournaledCoursesStore):
+        courses_store.sync()
+        return
 
+    if isinstance(courses_store, MmapCoursesStore):
+        courses_store.save()
+        return
 
-def load_courses_store() -> CoursesStore:
+    _save_courses("courses_store", courses_store.create_compressed())
+
+
+def load_courses_store(
+    kind: str = "pickle",
+    prefilter: bool = False,
+) -> BaseCoursesStore:
     """Loads the courses store.
 
+    The saved Bloom filter of a prefiltered store is only used if it was
+    saved with the same length as the store, and it has room for more
+    courses. Otherwise, it is built from the store. A mapped store is not
+    prefiltered, since building the filter would read the whole index and
+    undo its constant startup.
+
+    Args:
+        kind: Either pickle, to load it in memory, compact, to load it in
+        memory packed in arrays, journal, to load it in memory and journal its
+        changes, sqlite, or mmap, to map its index.
+        prefilter: Whether to put a Bloom filter of the url_ids in front of
+        the store.
+
+    Returns:
+        The courses store if it can be found, an empty one otherwise.
+
+    """
+    courses_store = _load_courses_store(kind)
+    if not prefilter:
+        return courses_store
+
+    if isinstance(courses_store, MmapCoursesStore):
+        _debug.debug("Not prefiltering the mapped courses store")
+        return courses_store
+
+    if saved := _load_persistent("courses_store_bloom"):
+        length, bloom_filter = saved
+        if length == len(courses_store) and not bloom_filter.is_full:
+            return PrefilteredCoursesStore(courses_store, bloom_filter)
+
+    _debug.debug("Building the Bloom filter of the courses store")
+
+    bloom_filter = BloomFilter(
+        max(len(courses_store) * 2, _MIN_BLOOM_FILTER_CAPACITY),
+    )
+    for course in courses_store:
+        bloom_filter.add(course.url_id)
+
+    return PrefilteredCoursesStore(courses_store, bloom_filter)
+
+
+def _load_courses_store(kind: str) -> BaseCoursesStore:
+    """Loads the courses store, without a prefilter.
+
+    An empty SQLite or mapped store is filled with the saved store, if any,
+    so that switching to it keeps the history. A journaled store uses the
+    saved store as its snapshot, and a compact store is loaded from it.
+
+    Args:
+        kind: Either pickle, to load it in memory, compact, to load it in
+        memory packed in arrays, journal, to load it in memory and journal its
+        changes, sqlite, or mmap, to map its index.
+
     Returns:
         The courses store if it can be found, an empty one otherwise.
 
     """
-    courses_store = CoursesStore()
+    courses_store: BaseCoursesStore
+    if kind == "sqlite":
+        path = Path.cwd() / "data" / "courses_store.sqlite3"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        courses_store = SqliteCoursesStore(path)
 
-    if compressed := _load_persistent("courses_store.pickle"):
+        if len(courses_store):
+            return courses_store
+
+        _debug.debug("Migrating the saved courses store to %s", path)
+    elif kind == "mmap":
+        path = Path.cwd() / "data" / "courses_store.idx"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        courses_store = MmapCoursesStore(path)
+
+        if len(courses_store):
+            return courses_store
+
+        _debug.debug("Migrating the saved courses store to %s", path)
+    elif kind == "journal":
+        path = Path.cwd() / "data" / "courses_store.journal"
+        path.parent.mkdir(parents=True, exist_ok=True)
+
+        return JournaledCoursesStore(
+            path,
+            partial(_save_courses, "courses_store"),
+            _load_courses("courses_store"),
+        )
+    elif kind == "compact":
+        courses_store = CompactCoursesStore()
+    else:
+        courses_store = CoursesStore()
+
+    if compressed := _load_courses("courses_store"):
         courses_store.load_compressed(compressed)
 
     return courses_store
@@ -74,7 +232,10 @@ def save_errors(errors: list[CourseWithCoupon]) -> None:
         errors: The previous errors.
 
     """
-    _save_persistent("errors.pickle", errors)
+    _save_courses(
+        "errors",
+        tuple((course.url_id, course.coupon) for course in errors),
+    )
 
 
 def load_errors() -> list[CourseWithCoupon]:
@@ -83,41 +244,158 @@ def load_errors() -> list[CourseWithCoupon]:
     Returns:
         The errors if they can be found, an empty list otherwise.
     """
-    return _load_persistent("errors.pickle") or []
+    if (payload := _load_data_file("errors", DataKind.COURSES)) is not None:
+        return [CourseWithCoupon(*course) for course in decode_courses(payload)]
 
+    return _load_legacy("errors") or []
+
+
+def open_course_journal() -> CourseJournal:
+    """Opens the journal of the courses queue.
+
+    Returns:
+        The journal, with the courses that the previous run did not finish.
+
+    """
+    path = Path.cwd() / "data" / "course_queue.sqlite3"
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    return CourseJournal(path)
 
-def _save_persistent(filename: str, to_persist: Any) -> None:
-    """Saves the scrapers persistent data to a file.
+
+def save_timings_report(report: TimingsReportJson) -> Path:
+    """Saves the timings report of the run to a new JSON file.
+
+    Every run has its own file, named after the UTC time, so that they can be
+    compared.
+
+    Args:
+        report: The timings report.
+
+    Returns:
+        The path of the file.
+
+    """
+    path = (
+        Path.cwd()
+        / "data"
+        / "timings"
+        / f"{datetime.now(timezone.utc):%Y-%m-%dT%H-%M-%SZ}.json"
+    )
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    write_atomically(path, dumps(report, indent=2).encode())
+
+    return path
+
+
+def _save_persistent(name: str, to_persist: Any) -> None:
+    """Saves pickled persistent data to a data file.
 
     Args:
-        filename: The filename to use. Data is always stored in the data dir.
+        name: The name of the data file.
         to_persist: The data to persist.
 
     """
-    path = Path.cwd() / "data" / filename
+    _save_data_file(name, DataKind.PICKLE, dump_pickle(to_persist, 4))
+
+
+def _load_persistent(name: str) -> Any | None:
+    """Loads pickled persistent data from a data file, or its old pickle.
+
+    Args:
+        name: The name of the data file.
+
+    Returns:
+        The persistent data if it can be found, None otherwise.
+
+    """
+    if (payload := _load_data_file(name, DataKind.PICKLE)) is not None:
+        return load_pickle(payload)
+
+    return _load_legacy(name)
+
+
+def _save_courses(name: str, compressed: _CompressedT) -> None:
+    """Saves the compressed representation of courses to a data file.
+
+    Args:
+        name: The name of the data file.
+        compressed: The compressed representation.
+
+    """
+    _save_data_file(name, DataKind.COURSES, encode_courses(compressed))
+
+
+def _load_courses(name: str) -> _CompressedT | None:
+    """Loads the compressed representation of courses, or its old pickle.
+
+    Args:
+        name: The name of the data file.
+
+    Returns:
+        The compressed representation if it can be found, None otherwise.
+
+    """
+    if (payload := _load_data_file(name, DataKind.COURSES)) is not None:
+        return decode_courses(payload)
+
+    return _load_legacy(name)
+
+
+def _save_data_file(name: str, kind: DataKind, payload: bytes) -> None:
+    """Saves a data file, and removes the old pickle that it replaces.
+
+    Args:
+        name: The name of the data file. It is always stored in the data dir.
+        kind: The kind of payload.
+        payload: The payload.
+
+    """
+    path = Path.cwd() / "data" / f"{name}.bin"
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    write_data_file(path, kind, payload)
+
+    legacy_path = path.with_suffix(".pickle")
+    if legacy_path.is_file():
+        _debug.debug("Migrated %s to %s", legacy_path, path)
+        legacy_path.unlink()
+
+
+def _load_data_file(name: str, kind: DataKind) -> bytes | None:
+    """Loads the payload of a data file.
+
+    Args:
+        name: The name of the data file. It is read from the data dir.
+        kind: The expected kind of payload.
+
+    Returns:
+        The payload if the file can be found, None otherwise.
+
+    """
+    path = Path.cwd() / "data" / f"{name}.bin"
     if not path.is_file():
-        path.parent.mkdir(parents=True, exist_ok=True)
-        path.touch()
+        return None
 
-    with path.open("wb") as pickle_file:
-        pickler = Pickler(pickle_file, 4)
+    return read_data_file(path, kind)
 
-        pickler.dump(to_persist)
 
+def _load_legacy(name: str) -> Any | None:
+    """Loads the pickle that was used before the data files.
 
-def _load_persistent(filename: str) -> Any | None:
-    """Loads persistent data.
+    It is removed the next time that the data file is saved.
 
     Args:
-        filename: The filename to use. The file is read from the data dir.
+        name: The name of the data file. It is read from the data dir.
 
     Returns:
         The persistent data if it can be found, None otherwise.
 
     """
-    path = Path.cwd() / "data" / filename
+    path = Path.cwd() / "data" / f"{name}.pickle"
     if not path.is_file():
-        _debug.debug("No file found in %s", path)
+        _debug.debug("No file found for %s", name)
 
         return None
 
@@ -0,0 +1,299 @@
+"""This module contains the PreChecker class."""
+
+from __future__ import annotations
+
+from asyncio import Semaphore, sleep
+from http import HTTPStatus
+from logging import getLogger
+from threading import Event
+from typing import Any, Literal, TypedDict
+
+from aiohttp import ClientError, ClientSession
+from yarl import URL
+
+from udemy_autocoupons.enroller.state import State
+from udemy_autocoupons.request_with_reattempts import (
+    BadStatusCodeError,
+    send_request,
+)
+from udemy_autocoupons.udemy_course import CourseWithCoupon
+
+_debug = getLogger("debug")
+_printer = getLogger("printer")
+
+PreCheckedStateT = Literal[State.PAID, State.TO_BLACKLIST, State.ENROLLABLE]
+
+
+class _CourseJson(TypedDict):
+    """The type of the course returned by the API. Only used fields are here."""
+
+    id: int
+    is_paid: bool
+
+
+class _PriceJson(TypedDict):
+    amount: float
+
+
+class _PricingResultJson(TypedDict):
+    price: _PriceJson
+
+
+class _PriceTextDataJson(TypedDict):
+    pricing_result: _PricingResultJson
+
+
+class _PriceTextJson(TypedDict):
+    data: _PriceTextDataJson
+
+
+class _LandingComponentsJson(TypedDict):
+    """The type of the landing components returned by the API."""
+
+    price_text: _PriceTextJson
+
+
+class _ApiUnavailableError(Exception):
+    """Raised when the API can't be reached or fails, unlike a missing course."""
+
+
+class PreChecker:
+    """Classifies courses with the public Udemy API, without a browser.
+
+    Only courses that look free with their coupon need to be enrolled by the
+    driver. When the state cannot be known, for example because the API is
+    not available, the course is considered enrollable so that the driver
+    checks it.
+
+    Only the failures of the connection and of the server count towards
+    disabling the checks. A course that the API doesn't have, like a removed
+    one, or a malformed response is only left to the driver.
+
+    """
+
+    _MAX_CONCURRENT_REQUESTS = 5
+    # After this many consecutive failed checks, the API is no longer used
+    _MAX_CONSECUTIVE_FAILURES = 10
+    _MAX_ATTEMPTS = 2
+    _REATTEMPT_WAIT = 1  # Seconds
+
+    def __init__(
+        self,
+        client: ClientSession,
+        stop_event: Event,
+        base_url: str = "https://www.udemy.com",
+    ) -> None:
+        """Stores provided parameters.
+
+        Args:
+            client: An aiohttp client to use.
+            stop_event: An event that will be set on an early stop.
+            base_url: The URL of the Udemy API, which can be changed to a stub.
+
+        """
+        self._client = client
+        self._stop_event = stop_event
+        self._api_url = f"{base_url}/api-2.0"
+
+        self._semaphore = Semaphore(self._MAX_CONCURRENT_REQUESTS)
+        self._consecutive_failures = 0
+
+    async def check(self, course: CourseWithCoupon) -> PreCheckedStateT:
+        """Checks the state of the course.
+
+        Args:
+            course: The course to check.
+
+        Returns:
+            The state of the course, ENROLLABLE if it cannot be known.
+
+        """
+        if self._consecutive_failures >= self._MAX_CONSECUTIVE_FAILURES:
+            return State.ENROLLABLE
+
+        async with self._semaphore:
+            try:
+                state = await self._check(course)
+            except _ApiUnavailableError:
+                state = self._fail()
+
+        _debug.debug("Pre-checked %s as %s", course, state)
+
+        return state
+
+    async def _check(self, course: CourseWithCoupon) -> PreCheckedStateT:
+        """Checks the state of the course, without limiting the concurrency.
+
+        Args:
+            course: The course to check.
+
+        Returns:
+            The state of the course, ENROLLABLE if it cannot be known.
+
+        Raises:
+            _ApiUnavailableError: If the API is not available.
+
+        """
+        if (course_json := await self._request_course(course)) is None:
+            return State.ENROLLABLE
+
+        if not course_json["is_paid"]:
+            return State.TO_BLACKLIST
+
+        if not course.coupon:
+            return State.PAID
+
+        if (price := await self._request_price(course_json, course)) is None:
+            return State.ENROLLABLE
+
+        return State.PAID if price > 0 else State.ENROLLABLE
+
+    async def _request_course(
+        self,
+        course: CourseWithCoupon,
+    ) -> _CourseJson | None:
+        """Gets the id of the course and whether it is paid.
+
+        Args:
+            course: The course to request.
+
+        Returns:
+            The course, or None if the API has no valid one.
+
+        Raises:
+            _ApiUnavailableError: If the API is not available.
+
+        """
+        url = URL(f"{self._api_url}/courses/{course.url_id}/").with_query(
+            {"fields[course]": "id,is_paid"},
+        )
+        course_json = await self._request(url)
+
+        if not isinstance(course_json, dict):
+            return None
+
+        if not isinstance(course_json.get("id"), int) or not isinstance(
+            course_json.get("is_paid"),
+            bool,
+        ):
+            _debug.error("Unexpected course response %s", course_json)
+            return None
+
+        return course_json  # type: ignore
+
+    async def _request_price(
+        self,
+        course_json: _CourseJson,
+        course: CourseWithCoupon,
+    ) -> float | None:
+        """Gets the price of the course with its coupon.
+
+        Args:
+            course_json: The course returned by the API.
+            course: The course, with the coupon to use.
+
+        Returns:
+            The price, or None if the API has no valid one.
+
+        Raises:
+            _ApiUnavailableError: If the API is not available.
+
+        """
+        url = URL(
+            f"{self._api_url}/course-landing-components/{course_json['id']}/me/",
+        ).with_query(
+            {"components": "price_text", "couponCode": course.coupon or ""},
+        )
+        components: _LandingComponentsJson | None
+        if (components := await self._request(url)) is None:
+            return None
+
+        try:
+            return float(
+                components["price_text"]["data"]["pricing_result"]["price"][
+                    "amount"
+                ],
+            )
+        except (KeyError, TypeError, ValueError):
+            _debug.exception("Unexpected price response %s", components)
+            return None
+
+    async def _request(self, url: URL) -> Any | None:
+        """Sends a request to the API, with few reattempts.
+
+        Only the failures of the connection and of the server are
+        reattempted. Any response resets the consecutive failures.
+
+        Args:
+            url: The URL to request.
+
+        Returns:
+            The json response, or None if the API has no valid response or
+            the run is stopping.
+
+        Raises:
+            _ApiUnavailableError: If every attempt failed.
+
+        """
+        for attempt in range(self._MAX_ATTEMPTS):
+            if attempt:
+                await sleep(self._REATTEMPT_WAIT)
+            if self._stop_event.is_set():
+                return None
+
+            try:
+                response = await send_request(str(url), "json", self._client)
+            except BadStatusCodeError as error:
+                if _is_server_failure(error.status_code):
+                    _debug.warning("API failure %s for %s", error, url)
+                    continue
+
+                self._consecutive_failures = 0
+                return None
+            except (ClientError, TimeoutError):
+                _debug.exception("Could not request %s", url)
+                continue
+            # JSONDecodeError, if the response is not JSON
+            except ValueError:
+                _debug.exception("Malformed response for %s", url)
+                self._consecutive_failures = 0
+                return None
+
+            self._consecutive_failures = 0
+            return response
+
+        raise _ApiUnavailableError(f"Could not request {url}")
+
+    def _fail(self) -> Literal[State.ENROLLABLE]:
+        """Counts a failed check.
+
+        Returns:
+            The state to use for the course, which is left to the driver.
+
+        """
+        self._consecutive_failures += 1
+
+        if self._consecutive_failures == self._MAX_CONSECUTIVE_FAILURES:
+            _debug.warning("Too many failed pre-checks, disabling them")
+            _printer.warning(
+                "The Udemy API is not available, all courses will be checked in the browser",
+            )
+
+        return State.ENROLLABLE
+
+
+def _is_server_failure(status_code: int) -> bool:
+    """Checks if the status code means that the API is failing.
+
+    Args:
+        status_code: The status code of the response.
+
+    Returns:
+        Whether it is a server error or a rate limit, instead of an error of
+        the requested course.
+
+    """
+    return (
+        status_code >= HTTPStatus.INTERNAL_SERVER_ERROR
+        or status_code == HTTPStatus.TOO_MANY_REQUESTS
+    )
@@ -0,0 +1,98 @@
+"""This module contains the PrefilteredCoursesStore class."""
+
+from __future__ import annotations
+
+from collections.abc import Iterator
+from threading import RLock
+
+from udemy_autocoupons.bloom_filter import BloomFilter
+from udemy_autocoupons.courses_store import BaseCoursesStore
+from udemy_autocoupons.udemy_course import UdemyCourseT
+
+
+class PrefilteredCoursesStore(BaseCoursesStore):
+    """A courses store with a Bloom filter of its url_ids in front of it.
+
+    Most membership checks of courses that were never stored are answered by
+    the filter, without touching the store. The filter must contain the
+    url_ids of all the courses of the store, and it keeps the ones that are
+    discarded.
+
+    All the methods are thread-safe if the store is.
+
+    """
+
+    def __init__(self, store: BaseCoursesStore, bloom_filter: BloomFilter):
+        """Wraps the store.
+
+        Args:
+            store: The courses store.
+            bloom_filter: The filter with the url_ids of the store.
+
+        """
+        self.store = store
+        self.bloom_filter = bloom_filter
+        self._lock = RLock()
+
+    def __contains__(self, course: object) -> bool:
+        """Checks if the given element is in the store."""
+        if not isinstance(course, UdemyCourseT):
+            return False
+
+        return course.url_id in self.bloom_filter and course in self.store
+
+    def __iter__(self) -> Iterator[UdemyCourseT]:
+        """Iterates over the courses of the store."""
+        return iter(self.store)
+
+    def __len__(self) -> int:
+        """Returns the number of items in the store."""
+        return len(self.store)
+
+    def add(self, value: UdemyCourseT) -> None:  # noqa: WPS110
+        """Adds a course to the store."""
+        # Setting bits is not atomic, and a lost bit would be a false negative
+        with self._lock:
+            self.bloom_filter.add(value.url_id)
+
+        self.store.add(value)
+
+    def discard(self, value: UdemyCourseT) -> None:  # noqa: WPS110
+        """Removes a course without raising if it doesn't exist."""
+        self.store.discard(value)
+
+    def optimize(self) -> None:
+        """Removes the courses that are contained by a course with any_coupon."""
+        self.store.optimize()
+
+    def create_compressed(self) -> tuple[str | tuple[str, str], ...]:
+        """Creates a smaller representation of the store.
+
+        Returns:
+            The compressed representation of the store.
+
+        """
+        return self.store.create_compressed()
+
+    def load_compressed(
+        self,
+        compressed: tuple[str | tuple[str, str], ...],
+    ) -> None:
+        """Loads courses into the store from a compressed representation.
+
+        Args:
+            compressed: The compressed representation, as returned by
+            create_compressed.
+
+        """
+        with self._lock:
+            for compressed_course in compressed:
+                self.bloom_filter.add(
+                    (
+                        compressed_course
+                        if isinstance(compressed_course, str)
+                        else compressed_course[0]
+                    ),
+                )
+
+        self.store.load_compressed(compressed)
@@ -2,15 +2,92 @@
 
 from __future__ import annotations
 
-from asyncio import Queue as AsyncQueue, create_task
+from asyncio import (
+    Queue as AsyncQueue,
+    Semaphore,
+    TaskGroup,
+    create_task,
+    sleep,
+    to_thread,
+)
+from collections import Counter, defaultdict
+from collections.abc import Iterable
+from datetime import datetime, timedelta, timezone
 from logging import getLogger
-from queue import Queue as MtQueue
+from queue import Full
 from threading import Event
+from time import monotonic
+from typing import NamedTuple, TypedDict, TypeVar
 
-from udemy_autocoupons.courses_store import CoursesStore
+from udemy_autocoupons.course_journal import CourseJournal, JournaledCourse
+from udemy_autocoupons.course_queue import CourseQueue
+from udemy_autocoupons.courses_store import BaseCoursesStore
+from udemy_autocoupons.enroller.state import State
+from udemy_autocoupons.pre_checker import PreChecker
+from udemy_autocoupons.scraped_url import ScrapedUrl
 from udemy_autocoupons.udemy_course import CourseWithCoupon
 
 _debug = getLogger("debug")
+_printer = getLogger("printer")
+
+_T = TypeVar("_T")
+
+
+class QueueGauges(TypedDict):
+    """The state of the queues.
+
+    The waits are the total seconds that producers were blocked because the
+    queue was full, which shows that the consumers are falling behind.
+
+    """
+
+    async_queue_depth: int
+    async_queue_wait: float
+    mt_queue_depth: int
+    mt_queue_wait: float
+
+
+class _GaugedAsyncQueue(AsyncQueue[_T]):
+    """An async queue that measures how long producers wait for room."""
+
+    def __init__(self, maxsize: int = 0) -> None:
+        """Creates the queue.
+
+        Args:
+            maxsize: The maximum number of items, 0 for no limit.
+
+        """
+        super().__init__(maxsize)
+        self.put_wait = 0.0
+
+    async def put(self, item: _T) -> None:
+        """Puts the item, waiting for room if the queue is full.
+
+        Args:
+            item: The item to put.
+
+        """
+        if not self.full():
+            self.put_nowait(item)
+            return
+
+        start = monotonic()
+        await super().put(item)
+        self.put_wait += monotonic() - start
+
+
+class AgePolicy(NamedTuple):
+    """What to do with coupons posted too long ago, which are likely expired.
+
+    Attributes:
+        max_age: The age after which a coupon is stale.
+        drop: Whether to drop stale coupons, instead of enrolling them after
+        all the others.
+
+    """
+
+    max_age: timedelta
+    drop: bool
 
 
 class QueueManager:
@@ -20,10 +97,29 @@ class QueueManager:
 
     It uses an async Queue for scrapers to add their URLs, which is then
     accessed by the manager, which validates and parses the URL and adds the
-    course to a multithreading JoinableQueue.
+    course to a multithreading CourseQueue, which gives the freshest first.
+
+    If a PreChecker is provided, courses are checked concurrently before being
+    added, and those that are not enrollable are stored directly.
+
+    Urls that were seen recently, courses that are already in the store and
+    courses that are already in flight in the multithreading queue are
+    skipped, so the drivers only get courses they will enroll. The skipped
+    ones are counted by source and reason in duplicate_counts.
+
+    If an AgePolicy is provided, coupons whose source date is older than its
+    max age are dropped or enrolled last. Coupons without a date are never
+    considered stale.
 
     On open it gives the async and multithreading queues, and on exit adds a
-    None to each and waits for them to finish, as well as for the stop event.
+    None to the async queue and one to the multithreading queue for each of its
+    consumers, and waits for them to finish, as well as for the stop event.
+
+    Both queues can be bounded, in which case a slow driver makes the manager
+    wait, and then the scrapers, instead of piling up urls in memory.
+
+    If a CourseJournal is provided, the courses of the multithreading queue
+    are also kept on disk until they are finished.
 
     Attributes:
       mt_queue: The wrapped multithreading queue.
@@ -31,18 +127,70 @@ class QueueManager:
 
     """
 
-    def __init__(self, courses_store: CoursesStore, stop_event: Event) -> None:
-        """Creates a queue and stores it in the queue attribute."""
-        self.mt_queue: MtQueue[CourseWithCoupon | None] = MtQueue()
-        self.async_queue: AsyncQueue[str | None] = AsyncQueue()
+    _MAX_PENDING_PRE_CHECKS = 50
+    # Older urls are forgotten, as the store and the queue catch them too
+    _MAX_SEEN_URLS = 100_000
+    _GAUGES_INTERVAL = 30  # Seconds
+    _WAIT_CHECK_INTERVAL = 0.5  # Seconds
+
+    def __init__(
+        self,
+        courses_store: BaseCoursesStore,
+        stop_event: Event,
+        consumers: int = 1,
+        pre_checker: PreChecker | None = None,
+        age_policy: AgePolicy | None = None,
+        async_queue_size: int = 0,
+        mt_queue_size: int = 0,
+        journal: CourseJournal | None = None,
+    ) -> None:
+        """Creates a queue and stores it in the queue attribute.
+
+        Args:
+            courses_store: The courses store to use.
+            stop_event: The event that will be set when the run should stop.
+            consumers: The number of threads consuming the multithreading queue.
+            pre_checker: The pre-checker to filter courses with, if any.
+            age_policy: The policy for stale coupons, if any.
+            async_queue_size: The maximum urls in the async queue, 0 for no
+            limit.
+            mt_queue_size: The maximum courses in the multithreading queue, 0
+            for no limit.
+            journal: The journal where the courses in the multithreading queue
+            are kept, if any.
+
+        """
+        self.mt_queue = CourseQueue(mt_queue_size, journal)
+        self.async_queue: _GaugedAsyncQueue[ScrapedUrl | None] = (
+            _GaugedAsyncQueue(async_queue_size)
+        )
+        self._mt_queue_wait = 0.0
 
         self._courses_store = courses_store
         self._stop_event = stop_event
+        self._consumers = consumers
+        self._pre_checker = pre_checker
+        # Limits the courses held by pending pre-checks
+        self._pre_check_slots = Semaphore(self._MAX_PENDING_PRE_CHECKS)
+        self._age_policy = age_policy
+        self._drop_stale = bool(age_policy and age_policy.drop)
+
+        # Stale coupons by source
+        self.stale_counts: Counter[str] = Counter()
+        # Skipped duplicates by source and reason
+        self.duplicate_counts: defaultdict[str, Counter[str]] = defaultdict(
+            Counter,
+        )
+
+        # The most recent urls, in the order they were seen
+        self._seen_urls: dict[str, None] = {}
+
         self._task = create_task(self._process_courses())
+        self._gauges_task = create_task(self._log_gauges())
 
     async def __aenter__(
         self,
-    ) -> tuple[AsyncQueue[str | None], MtQueue[CourseWithCoupon | None]]:
+    ) -> tuple[AsyncQueue[ScrapedUrl | None], CourseQueue]:
         """Gets the queues.
 
         Returns:
@@ -54,6 +202,8 @@ class QueueManager:
 
     async def __aexit__(self, exc_type: type[BaseException] | None, *_) -> None:
         """Closes and waits the async and multithreading queue."""
+        self._gauges_task.cancel()
+
         if exc_type:
             return
 
@@ -64,20 +214,290 @@ class QueueManager:
         _debug.debug("Waiting _process_courses task")
         await self._task
 
-        self.mt_queue.put(None)
+        self._report_duplicates()
+        self._report_stale()
+
+        _debug.debug("Queue gauges: %s", self.gauges())
+
+        for _ in range(self._consumers):
+            await to_thread(self.mt_queue.put, None)
+        # Both are polled, so that the event loop keeps running meanwhile
         _debug.debug("Waiting multithreading queue")
-        self.mt_queue.join()
+        while self.mt_queue.unfinished_tasks:
+            await sleep(self._WAIT_CHECK_INTERVAL)
 
         _debug.debug("Waiting stop event")
-        self._stop_event.wait()
+        while not self._stop_event.is_set():
+            await sleep(self._WAIT_CHECK_INTERVAL)
 
         _debug.debug("Exiting QueueManager context manager")
 
     async def _process_courses(self) -> None:
-        while url := await self.async_queue.get():
-            if course := CourseWithCoupon.from_url(url):
-                self.mt_queue.put(course)
+        # Waits for the pending pre-checks on exit
+        async with TaskGroup() as task_group:
+            while scraped_url := await self.async_queue.get():
+                await self._process_url(scraped_url, task_group)
+                self.async_queue.task_done()
+
+            _debug.debug("Got None in async queue")
             self.async_queue.task_done()
 
-        _debug.debug("Got None in async queue")
-        self.async_queue.task_done()
+    async def put_retried(self, courses: Iterable[CourseWithCoupon]) -> None:
+        """Adds courses that failed in a previous run to the queue.
+
+        It waits for room in the queue, so the consumers should be running.
+
+        Args:
+            courses: The courses to add.
+
+        """
+        for course in courses:
+            await self._put_course(course, retries=1)
+
+    async def put_redelivered(
+        self,
+        courses: Iterable[JournaledCourse],
+    ) -> None:
+        """Adds the courses that a previous run left unfinished in the journal.
+
+        It waits for room in the queue, so the consumers should be running.
+
+        Args:
+            courses: The courses to add, with their priority information.
+
+        """
+        for course, retries, posted, stale in courses:
+            await self._put_course(course, retries, posted, stale)
+
+    def gauges(self) -> QueueGauges:
+        """Gets the current state of the queues.
+
+        Returns:
+            The depth of the queues and how long producers waited for them.
+
+        """
+        return {
+            "async_queue_depth": self.async_queue.qsize(),
+            "async_queue_wait": self.async_queue.put_wait,
+            "mt_queue_depth": self.mt_queue.qsize(),
+            "mt_queue_wait": self._mt_queue_wait,
+        }
+
+    async def _log_gauges(self) -> None:
+        """Logs the gauges periodically."""
+        while True:
+            await sleep(self._GAUGES_INTERVAL)
+            _debug.debug("Queue gauges: %s", self.gauges())
+
+    async def _process_url(
+        self,
+        scraped_url: ScrapedUrl,
+        task_group: TaskGroup,
+    ) -> None:
+        """Validates the url and adds its course to the queue, unless skipped.
+
+        Args:
+            scraped_url: The url to process.
+            task_group: The task group to add the pre-check to, if needed.
+
+        """
+        if scraped_url.url in self._seen_urls:
+            self._count_duplicate(scraped_url, "url")
+            return
+
+        self._seen_urls[scraped_url.url] = None
+        # In daemon mode there is no end to the urls
+        if len(self._seen_urls) > self._MAX_SEEN_URLS:
+            del self._seen_urls[next(iter(self._seen_urls))]
+
+        if not (course := CourseWithCoupon.from_url(scraped_url.url)):
+            return
+
+        if course in self._courses_store:
+            self._count_duplicate(scraped_url, "store")
+            return
+
+        if self.mt_queue.is_in_flight(course):
+            self._count_duplicate(scraped_url, "in_flight")
+            return
+
+        stale = self._is_stale(scraped_url)
+
+        if stale and self._drop_stale:
+            _debug.debug("Dropping stale %s", scraped_url)
+        elif self._pre_checker:
+            await self._pre_check_slots.acquire()
+            task_group.create_task(self._pre_check(course, scraped_url, stale))
+        else:
+            await self._put(course, scraped_url, stale)
+
+    async def _put(
+        self,
+        course: CourseWithCoupon,
+        scraped_url: ScrapedUrl,
+        stale: bool,
+    ) -> None:
+        """Adds the course to the multithreading queue, if not in flight.
+
+        Args:
+            course: The course to add.
+            scraped_url: Where the course was found.
+            stale: Whether the coupon is stale.
+
+        """
+        if not await self._put_course(
+            course,
+            posted=scraped_url.date,
+            stale=stale,
+        ):
+            self._count_duplicate(scraped_url, "in_flight")
+
+    async def _put_course(
+        self,
+        course: CourseWithCoupon,
+        retries: int = 0,
+        posted: datetime | None = None,
+        stale: bool = False,
+    ) -> bool:
+        """Puts the course without blocking the event loop if the queue is full.
+
+        Args:
+            course: The course to put.
+            retries: How many times the course has already been attempted.
+            posted: When the source posted the course, if it is known.
+            stale: Whether the coupon is stale.
+
+        Returns:
+            Whether the course was put, False if it was already in flight.
+
+        """
+        try:
+            return self.mt_queue.put_course(
+                course,
+                retries,
+                posted,
+                stale,
+                block=False,
+            )
+        except Full:
+            start = monotonic()
+            put = await to_thread(
+                self.mt_queue.put_course,
+                course,
+                retries,
+                posted,
+                stale,
+            )
+            self._mt_queue_wait += monotonic() - start
+            return put
+
+    def _count_duplicate(self, scraped_url: ScrapedUrl, reason: str) -> None:
+        """Counts a skipped url.
+
+        Args:
+            scraped_url: The skipped url.
+            reason: Why it was skipped.
+
+        """
+        _debug.debug("Skipping %s, duplicate by %s", scraped_url, reason)
+        self.duplicate_counts[scraped_url.source][reason] += 1
+
+    async def _pre_check(
+        self,
+        course: CourseWithCoupon,
+        scraped_url: ScrapedUrl,
+        stale: bool,
+    ) -> None:
+        """Adds the course to the queue or the store depending on its state.
+
+        Args:
+            course: The course to check.
+            scraped_url: Where the course was found.
+            stale: Whether the coupon is stale.
+
+        """
+        try:
+            await self._route_pre_checked(course, scraped_url, stale)
+        finally:
+            self._pre_check_slots.release()
+
+    async def _route_pre_checked(
+        self,
+        course: CourseWithCoupon,
+        scraped_url: ScrapedUrl,
+        stale: bool,
+    ) -> None:
+        """Pre-checks the course and sends it where its state requires.
+
+        Args:
+            course: The course to check.
+            scraped_url: Where the course was found.
+            stale: Whether the coupon is stale.
+
+        """
+        assert self._pre_checker
+
+        try:
+            state = await self._pre_checker.check(course)
+        # An error would end the task group and hang the manager, so the
+        # course is left to the driver instead
+        # pylint: disable-next=broad-exception-caught
+        except Exception:
+            _debug.exception("Could not pre-check %s", course)
+            state = State.ENROLLABLE
+
+        if state is State.ENROLLABLE:
+            await self._put(course, scraped_url, stale)
+        elif state is State.PAID:
+            self._courses_store.add(course)
+        else:
+            self._courses_store.add(course.with_any_coupon())
+
+    def _is_stale(self, scraped_url: ScrapedUrl) -> bool:
+        """Checks if the url is older than the max age, counting it if so.
+
+        Args:
+            scraped_url: The url to check.
+
+        Returns:
+            Whether the url is stale.
+
+        """
+        if not self._age_policy or not scraped_url.date:
+            return False
+
+        if (
+            datetime.now(timezone.utc) - scraped_url.date
+            <= self._age_policy.max_age
+        ):
+            return False
+
+        self.stale_counts[scraped_url.source] += 1
+
+        return True
+
+    def _report_duplicates(self) -> None:
+        """Reports how many duplicates were skipped."""
+        if not self.duplicate_counts:
+            return
+
+        _printer.info(
+            "Skipped %s duplicated courses",
+            sum(counts.total() for counts in self.duplicate_counts.values()),
+        )
+
+        for source, counts in sorted(self.duplicate_counts.items()):
+            _debug.debug("Duplicates from %s: %s", source, dict(counts))
+
+    def _report_stale(self) -> None:
+        """Reports how many stale coupons were found."""
+        if not self._age_policy or not self.stale_counts:
+            return
+
+        _printer.info(
+            "%s %s stale coupons, posted more than %s ago",
+            "Skipped" if self._age_policy.drop else "Deprioritized",
+            self.stale_counts.total(),
+            self._age_policy.max_age,
+        )
+        _debug.debug("Stale coupons by source: %s", dict(self.stale_counts))
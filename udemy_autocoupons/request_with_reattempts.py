@@ -57,7 +57,7 @@ async def request_with_reattempts(
         _debug.debug("Waiting request to %s", url)
 
         try:
-            res_body = await _send_req(url, content_type, client)
+            res_body = await send_request(url, content_type, client)
         except (ClientError, BadStatusCodeError, TimeoutError):
             _debug.exception("Error requesting %s. attempts: %s", url, attempts)
 
@@ -71,7 +71,7 @@ async def request_with_reattempts(
     return None
 
 
-async def _send_req(
+async def send_request(
     url: str,
     content_type: Literal["json", "text"],
     client: ClientSession,
@@ -3,85 +3,257 @@
 from __future__ import annotations
 
 import os
+from collections.abc import Callable
+from functools import partial
 from logging import getLogger
+from os.path import expandvars
+from pathlib import Path
 from queue import Queue as MtQueue
-from threading import Event
+from shutil import copy2, copytree, ignore_patterns
+from threading import Event, Thread
 
-from udemy_autocoupons.courses_store import CoursesStore
+from udemy_autocoupons.courses_store import BaseCoursesStore
+from udemy_autocoupons.enroller.circuit_breaker import CircuitBreaker
 from udemy_autocoupons.enroller.enroller import Enroller
+from udemy_autocoupons.enroller.supervised_driver import SupervisedDriver
+from udemy_autocoupons.enroller.timings import Timings
 from udemy_autocoupons.enroller.udemy_driver import UdemyDriver
+from udemy_autocoupons.parse_arguments import ParsedArguments
 from udemy_autocoupons.udemy_course import CourseWithCoupon
 
+_debug = getLogger("debug")
+
+# Caches are not needed to keep the session, and can be very big
+_IGNORED_PROFILE_FILES = ignore_patterns(
+    "Cache",
+    "Code Cache",
+    "GPUCache",
+    "Service Worker",
+    "Singleton*",
+)
+
 
 def run_driver(
     mt_queue: MtQueue[CourseWithCoupon | None],
-    courses_store: CoursesStore,
+    courses_store: BaseCoursesStore,
     errors: MtQueue[CourseWithCoupon],
     stop_event: Event,
-    profile_directory: str,
+    timings: Timings,
+    on_stored: Callable[[], None],
+    args: ParsedArguments,
+) -> None:
+    """Enrolls from the queue using a pool of drivers.
+
+    Each worker has its own driver and enroller, but they share the circuit
+    breaker and the timings. They are all logged in to the same account, so
+    they share its cart too. The queue should receive a None for each worker.
+
+    Args:
+        mt_queue: A multithreading queue to pass to the enrollers.
+        courses_store: A multithreading queue to pass to the enrollers.
+        errors: A list to append the errors to.
+        stop_event: The event to set when the run should stop.
+        timings: Where the drivers record how long each phase takes.
+        on_stored: A thread-safe function to call after a course is stored.
+        args: The parsed arguments, with the profile and number of workers.
+
+    """
+    circuit_breaker = CircuitBreaker(args["error_budget"], stop_event)
+
+    # Copied before any Chrome starts, so that the profile is not in use
+    user_data_dirs = [
+        args["user_data_dir"],
+        *(
+            _copy_profile(
+                index,
+                args["profile_directory"],
+                args["user_data_dir"],
+            )
+            for index in range(1, args["workers"])
+        ),
+    ]
+
+    threads = [
+        Thread(
+            target=_run_worker,
+            args=(
+                user_data_dir,
+                mt_queue,
+                courses_store,
+                errors,
+                stop_event,
+                circuit_breaker,
+                timings,
+                on_stored,
+                args,
+            ),
+            name=f"UdemyDriverThread-{index}",
+            daemon=True,
+        )
+        for index, user_data_dir in enumerate(user_data_dirs)
+    ]
+
+    for thread in threads:
+        thread.start()
+
+    _debug.debug("Started %s workers", len(threads))
+
+    for thread in threads:
+        thread.join()
+
+    _debug.debug("All workers finished")
+
+    if not stop_event.is_set():
+        stop_event.set()
+
+
+def _run_worker(
     user_data_dir: str,
+    mt_queue: MtQueue[CourseWithCoupon | None],
+    courses_store: BaseCoursesStore,
+    errors: MtQueue[CourseWithCoupon],
+    stop_event: Event,
+    circuit_breaker: CircuitBreaker,
+    timings: Timings,
+    on_stored: Callable[[], None],
+    args: ParsedArguments,
 ) -> None:
-    """Enrolls from the queue.
+    """Enrolls from the queue in a worker of the pool.
 
     Args:
+        user_data_dir: The user data dir of the worker, which is not used
+        by any other worker.
         mt_queue: A multithreading queue to pass to the enroller.
         courses_store: A multithreading queue to pass to the enroller.
         errors: A list to append the errors to.
         stop_event: The event to set when the run should stop.
-        profile_directory: The directory of the profile to use.
-        user_data_dir: The directory with the profile directory.
+        circuit_breaker: The circuit breaker shared by the pool.
+        timings: The timings shared by the pool.
+        on_stored: A thread-safe function to call after a course is stored.
+        args: The parsed arguments, with the profile directory.
 
     """
-    debug = getLogger("debug")
     printer = getLogger("printer")
     try:
-        _run_driver(
+        _enroll_in_worker(
+            user_data_dir,
             mt_queue,
             courses_store,
             errors,
             stop_event,
-            profile_directory,
-            user_data_dir,
+            circuit_breaker,
+            timings,
+            on_stored,
+            args,
         )
+    # Crashed or hung drivers are restarted by SupervisedDriver, so this is
+    # only reached on unexpected errors
     except:  # noqa: B001
-        debug.exception("Error in run_driver")
+        _debug.exception("Error in run_driver")
         printer.error("Error caught, quitting")
         os._exit(1)
 
 
-def _run_driver(
+def _enroll_in_worker(
+    user_data_dir: str,
     mt_queue: MtQueue[CourseWithCoupon | None],
-    courses_store: CoursesStore,
+    courses_store: BaseCoursesStore,
     errors: MtQueue[CourseWithCoupon],
     stop_event: Event,
-    profile_directory: str,
-    user_data_dir: str,
+    circuit_breaker: CircuitBreaker,
+    timings: Timings,
+    on_stored: Callable[[], None],
+    args: ParsedArguments,
 ) -> None:
     """Enrolls from the queue.
 
     Args:
+        user_data_dir: The user data dir of the worker, which is not used
+        by any other worker.
         mt_queue: A multithreading queue to pass to the enroller.
         courses_store: A multithreading queue to pass to the enroller.
         errors: A list to append the errors to.
         stop_event: The event to set when the run should stop.
-        profile_directory: The directory of the profile to use.
-        user_data_dir: The directory with the profile directory.
+        circuit_breaker: The circuit breaker shared by the pool.
+        timings: The timings shared by the pool.
+        on_stored: A thread-safe function to call after a course is stored.
+        args: The parsed arguments, with the profile directory.
 
     """
-    debug = getLogger("debug")
-
-    driver = UdemyDriver(profile_directory, user_data_dir)
+    driver = SupervisedDriver(
+        partial(
+            UdemyDriver,
+            args["profile_directory"],
+            user_data_dir,
+            event_waits=args["event_waits"],
+            lean=args["lean"],
+            timings=timings,
+        ),
+    )
 
-    enroller = Enroller(driver, mt_queue, courses_store, stop_event)
+    enroller = Enroller(
+        driver,
+        mt_queue,
+        courses_store,
+        stop_event,
+        circuit_breaker,
+        prefetch_tabs=args["prefetch_tabs"],
+        cart_batch=args["cart_batch"],
+        on_stored=on_stored,
+    )
     new_errors = enroller.enroll_from_queue()
     for error in new_errors:
         errors.put(error)
 
-    debug.debug("Finished enrolling. Errors: %s", new_errors)
+    _debug.debug("Finished enrolling. Errors: %s", new_errors)
 
-    debug.debug("Quitting driver")
+    _debug.debug("Quitting driver")
 
     driver.quit()
 
-    if not stop_event.is_set():
-        stop_event.set()
+
+def _copy_profile(
+    index: int,
+    profile_directory: str,
+    user_data_dir: str,
+) -> str:
+    """Copies the profile to a user data dir only used by the given worker.
+
+    Chrome does not allow several instances to use the same user data dir, so
+    every worker but the first one uses a copy, which is refreshed on each run
+    to keep the session up to date. It must be copied before any Chrome
+    starts, since a live profile has half-written databases. Its lock files
+    are not copied.
+
+    Args:
+        index: The index of the worker in the pool.
+        profile_directory: The directory of the profile to copy.
+        user_data_dir: The directory with the profile directory.
+
+    Returns:
+        The user data dir with the copy of the profile.
+
+    """
+    source = Path(expandvars(user_data_dir)).expanduser()
+    target = Path.cwd() / "data" / "profiles" / f"worker-{index}"
+
+    _debug.debug(
+        "Copying profile %s from %s to %s",
+        profile_directory,
+        source,
+        target,
+    )
+
+    copytree(
+        source / profile_directory,
+        target / profile_directory,
+        ignore=_IGNORED_PROFILE_FILES,
+        dirs_exist_ok=True,
+    )
+
+    # Needed to decrypt the cookies of the profile
+    local_state = source / "Local State"
+    if local_state.is_file():
+        copy2(local_state, target / "Local State")
+
+    return str(target)
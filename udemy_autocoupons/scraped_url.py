@@ -0,0 +1,22 @@
+"""This module contains the ScrapedUrl class."""
+
+from __future__ import annotations
+
+from datetime import datetime
+from typing import NamedTuple
+
+
+class ScrapedUrl(NamedTuple):
+    """A url found by a scraper, with where and when it was posted.
+
+    Attributes:
+        url: The url.
+        source: The name of the source, such as the domain or channel.
+        date: When the source posted the url, timezone aware. None if it is
+        not known.
+
+    """
+
+    url: str
+    source: str
+    date: datetime | None = None
@@ -11,6 +11,7 @@ from bs4 import BeautifulSoup, ResultSet, Tag
 
 from udemy_autocoupons.constants import SCRAPER_WAIT
 from udemy_autocoupons.request_with_reattempts import request_with_reattempts
+from udemy_autocoupons.scraped_url import ScrapedUrl
 from udemy_autocoupons.scrapers.scraper import Scraper
 from udemy_autocoupons.scrapers.wordpress_scraper import (
     WordpressScraper,
@@ -22,11 +23,12 @@ class _PersistentData(TypedDict):
     """The persistent data used by this scraper.
 
     It contains the persistent data of the WordpressScraper and a list of pending urls.
+    Pending urls from older versions are plain strings, without their date.
 
     """
 
     wordpress: WordpressScraperPersistentData
-    pending: list[str]
+    pending: list[ScrapedUrl | str]
 
 
 class _Post(TypedDict):
@@ -48,7 +50,7 @@ class FreebiesGlobalScraper(Scraper):
 
     def __init__(
         self,
-        queue: AsyncQueue[str | None],
+        queue: AsyncQueue[ScrapedUrl | None],
         client: ClientSession,
         persistent_data: _PersistentData | None,
         stop_event: Event,
@@ -81,17 +83,22 @@ class FreebiesGlobalScraper(Scraper):
 
         _debug.debug("Got persistent data %s", persistent_data)
 
-        self._old_pending = (
-            persistent_data["pending"] if persistent_data else []
-        )
+        self._old_pending = [
+            ScrapedUrl(url, self._DOMAIN) if isinstance(url, str) else url
+            for url in (persistent_data["pending"] if persistent_data else [])
+        ]
 
-        self._pending: list[str] = []
+        self._pending: list[ScrapedUrl] = []
 
     async def scrap(self) -> None:
         """Starts scraping urls and sending them to the queue manager."""
         _debug.debug("Start scraping")
 
-        await self._scrape_from_posts(self._old_pending)
+        # Urls left pending by the previous scrap are retried
+        old_pending = self._old_pending + self._pending
+        self._old_pending = []
+        self._pending = []
+        await self._scrape_from_posts(old_pending)
 
         await self._wordpress_scraper.scrape()
 
@@ -111,7 +118,7 @@ class FreebiesGlobalScraper(Scraper):
 
         return new_persistent_data
 
-    async def _scrape_from_posts(self, urls: list[str]) -> None:
+    async def _scrape_from_posts(self, urls: list[ScrapedUrl]) -> None:
         errored = False
         for url in urls:
             if self._stop_event.is_set() or errored:
@@ -125,17 +132,17 @@ class FreebiesGlobalScraper(Scraper):
             if await self._scrape_from_post(url) is False:
                 errored = True
 
-    async def _scrape_from_post(self, url: str) -> bool:
+    async def _scrape_from_post(self, url: ScrapedUrl) -> bool:
         """Processes a post url and sends it to the queue manager.
 
         Args:
-          url: The url to process.
+          url: The url to process, with the date of the post.
 
         """
         _debug.debug("Processing post %s", url)
 
         html = await request_with_reattempts(
-            url,
+            url.url,
             "text",
             self._client,
             self._stop_event,
@@ -176,6 +183,6 @@ class FreebiesGlobalScraper(Scraper):
             link = tag.get("href")
             if isinstance(link, str):
                 _debug.debug("Sending %s to async queue", link)
-                await self._queue.put(link)
+                await self._queue.put(url._replace(url=link))
 
         return True
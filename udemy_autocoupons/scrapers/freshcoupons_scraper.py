@@ -2,6 +2,7 @@
 
 from asyncio import Queue as AsyncQueue
 from dataclasses import dataclass
+from datetime import datetime, timezone
 from logging import getLogger
 from threading import Event
 from typing import TypedDict
@@ -9,6 +10,7 @@ from typing import TypedDict
 from aiohttp import ClientSession
 
 from udemy_autocoupons.request_with_reattempts import request_with_reattempts
+from udemy_autocoupons.scraped_url import ScrapedUrl
 from udemy_autocoupons.scrapers.scraper import Scraper
 
 _printer = getLogger("printer")
@@ -57,10 +59,11 @@ class FreshcouponsScraper(Scraper):
     """Handles scraping of coupons from the Chrome extension Freshcoupons."""
 
     _BASE = "https://raw.githubusercontent.com/fresh-coupons/fresh-coupons-data/main/udemy/v2"
+    poll_interval = 15 * 60
 
     def __init__(
         self,
-        queue: AsyncQueue[str | None],
+        queue: AsyncQueue[ScrapedUrl | None],
         client: ClientSession,
         persistent_data: None,
         stop_event: Event,
@@ -77,6 +80,8 @@ class FreshcouponsScraper(Scraper):
         self._client = client
         self._stop_event = stop_event
 
+        self._last_timestamp: str | None = None
+
     async def scrap(self) -> None:
         """Scrapes the Freshcoupons website for free courses and adds them to the queue."""
         _debug.debug("Start scraping")
@@ -84,15 +89,24 @@ class FreshcouponsScraper(Scraper):
         if not (timestamp := await self._request_timestamp()):
             return
 
+        if timestamp == self._last_timestamp:
+            _debug.debug("Courses were not synced since %s", timestamp)
+            return
+        self._last_timestamp = timestamp
+
         if not (courses_json := await self._request_courses(timestamp)):
             return
 
         if not (formatted_courses := self._format_courses(courses_json)):
             return
 
+        date = self._parse_timestamp(timestamp)
+
         for course in formatted_courses:
             if course.discounted_price == "Free" and not course.is_already_free:
-                await self._queue.put(course.url)
+                await self._queue.put(
+                    ScrapedUrl(course.url, "freshcoupons", date),
+                )
 
     def create_persistent_data(self) -> None:
         """Creates the persistent data for this scraper."""
@@ -124,6 +138,38 @@ class FreshcouponsScraper(Scraper):
 
         return timestamp
 
+    @staticmethod
+    def _parse_timestamp(timestamp: str) -> datetime | None:
+        """Parses the lastSynced timestamp, whose format is not documented.
+
+        Args:
+          timestamp: The timestamp, either a Unix time in seconds or
+            milliseconds, or an ISO 8601 date.
+
+        Returns:
+          The timezone aware date, or None if it can't be parsed.
+        """
+        text = str(timestamp)
+
+        if text.isdigit():
+            # Unix times in milliseconds have more digits
+            if (seconds := int(text)) > 10**11:
+                seconds //= 1000
+
+            try:
+                return datetime.fromtimestamp(seconds, timezone.utc)
+            except (OverflowError, OSError, ValueError):
+                _debug.exception("Failed to parse lastSynced %s", timestamp)
+                return None
+
+        try:
+            date = datetime.fromisoformat(text.replace("Z", "+00:00"))
+        except ValueError:
+            _debug.exception("Failed to parse lastSynced %s", timestamp)
+            return None
+
+        return date if date.tzinfo else date.replace(tzinfo=timezone.utc)
+
     async def _request_courses(self, last_synced: str) -> _JsonCourses | None:
         """Gets the courses json file.
 
@@ -11,7 +11,15 @@ _PersistentT = TypeVar("_PersistentT")
 
 
 class Scraper(ABC, Generic[_PersistentT]):
-    """Scrapers have to inherit from this ABC."""
+    """Scrapers have to inherit from this ABC.
+
+    Attributes:
+      poll_interval: The seconds between the end of a scrap and the start of
+      the next one in daemon mode.
+
+    """
+
+    poll_interval: float = 30 * 60
 
     @abstractmethod
     def __init__(
@@ -35,7 +43,12 @@ class Scraper(ABC, Generic[_PersistentT]):
 
     @abstractmethod
     async def scrap(self) -> None:
-        """The scraper should start only when this method is called."""
+        """The scraper should start only when this method is called.
+
+        In daemon mode it is called again every poll_interval, so it should
+        only get what is new since the previous call.
+
+        """
 
     @abstractmethod
     def create_persistent_data(self) -> _PersistentT | None:
@@ -45,3 +58,14 @@ class Scraper(ABC, Generic[_PersistentT]):
           None if there's no data to store, the data otherwise.
 
         """
+
+    async def subscribe(self) -> None:  # noqa: B027
+        """Starts getting new posts as they are published, if supported.
+
+        It is called in daemon mode after the first scrap. The new posts should
+        be added to the queue until close is called.
+
+        """
+
+    async def close(self) -> None:  # noqa: B027
+        """Releases the resources kept between scraps, if any."""
@@ -1,17 +1,19 @@
 """This module contains the TelegramScraper scraper."""
 
-from asyncio import Queue as AsyncQueue, Semaphore, Task, TaskGroup
+from asyncio import Queue as AsyncQueue, Semaphore, Task, TaskGroup, create_task
 from collections import defaultdict
 from datetime import datetime, timedelta, timezone
+from functools import partial
 from logging import getLogger
 from os import getenv
 from threading import Event
 from typing import Any, TypedDict
 
 from aiohttp import ClientSession
-from telethon import TelegramClient
+from telethon import TelegramClient, events
 from telethon.tl.custom import Message
 
+from udemy_autocoupons.scraped_url import ScrapedUrl
 from udemy_autocoupons.scrapers.channel_scrapers import (
     ChannelScraper,
     channel_scrapers,
@@ -33,10 +35,14 @@ class TelegramScraper(Scraper):
     """Handles telegram scraping."""
 
     _DEFAULT_DAYS = 7
+    # New messages are pushed once subscribed, polling only catches up
+    poll_interval = 15 * 60
+    # Messages being processed at once, iteration pauses when it is reached
+    _MAX_PENDING_MESSAGES = 100
 
     def __init__(
         self,
-        queue: AsyncQueue[str | None],
+        queue: AsyncQueue[ScrapedUrl | None],
         client: ClientSession,
         persistent_data: _PersistentData | None,
         stop_event: Event,
@@ -76,6 +82,16 @@ class TelegramScraper(Scraper):
         self._semaphores: defaultdict[str, Semaphore] = defaultdict(
             lambda: Semaphore(max_concurrent_requests),
         )
+        # Slots are only freed when the urls fit in the queue, so a full queue
+        # pauses the iteration of the messages
+        self._message_slots = Semaphore(self._MAX_PENDING_MESSAGES)
+
+        # Kept connected between scraps, None until the first one
+        self._client: TelegramClient | None = None
+        self._disabled = False
+        self._subscribed = False
+        # Pushed messages being scraped, referenced so they are not collected
+        self._new_message_tasks: set[Task[None]] = set()
 
     def create_persistent_data(self) -> _PersistentData | None:
         """Returns the persistent data."""
@@ -88,27 +104,65 @@ class TelegramScraper(Scraper):
         return persistent_data
 
     async def scrap(self) -> None:
-        """Scrapes telegram channels for links."""
-        if not await self._is_enabled():
+        """Scrapes telegram channels for links.
+
+        The client is connected on the first call and kept until close.
+
+        """
+        if self._disabled:
             return
 
+        if self._client is None:
+            self._client = await self._connect()
+
+            if self._client is None:
+                self._disabled = True
+                return
+
         _debug.debug("Scraping telegram")
 
-        assert self._api_id
-        assert self._api_hash
+        async with TaskGroup() as task_group:
+            for channel_scraper in channel_scrapers:
+                task_group.create_task(
+                    self._scrap_channel(self._client, channel_scraper),
+                )
 
-        async with TelegramClient(
-            "telegram_session",
-            self._api_id,
-            self._api_hash,
-        ) as client:
-            async with TaskGroup() as task_group:
-                for channel_scraper in channel_scrapers:
-                    task_group.create_task(
-                        self._scrap_channel(client, channel_scraper),
-                    )
-
-            _debug.debug("Finished scraping telegram")
+        _debug.debug("Finished scraping telegram")
+
+    async def subscribe(self) -> None:
+        """Processes the new messages of every channel as they are posted.
+
+        Messages posted while disconnected are got by the next scrap, which
+        continues from the last id.
+
+        """
+        if self._client is None or self._subscribed:
+            return
+
+        for channel_scraper in channel_scrapers:
+            self._client.add_event_handler(
+                partial(self._on_new_message, channel_scraper),
+                events.NewMessage(chats=channel_scraper.channel_id),
+            )
+
+        self._subscribed = True
+        _debug.debug("Subscribed to %s channels", len(channel_scrapers))
+
+    async def close(self) -> None:
+        """Disconnects the client, if connected.
+
+        Pushed messages that are still being scraped are left pending.
+
+        """
+        for task in self._new_message_tasks:
+            task.cancel()
+
+        if self._client is None:
+            return
+
+        await self._client.disconnect()
+        self._client = None
+        self._subscribed = False
         _debug.debug("Telegram client disconnected")
 
     def _get_base_id(
@@ -122,14 +176,19 @@ class TelegramScraper(Scraper):
             curr_id = min(message_ids)
         return curr_id
 
-    async def _is_enabled(self) -> bool:
-        """Returns whether the scraper is enabled."""
+    async def _connect(self) -> TelegramClient | None:
+        """Connects to Telegram if the scraper is enabled.
+
+        Returns:
+            The connected client, or None if the scraper is disabled.
+
+        """
         if not self._api_id or not self._api_hash:
             _debug.warning("TELEGRAM_API_ID or TELEGRAM_API_HASH is not set")
             _printer.info(
                 "Telegram scraper is disabled because credentials are not set",
             )
-            return False
+            return None
 
         client = TelegramClient(
             "telegram_session",
@@ -145,12 +204,10 @@ class TelegramScraper(Scraper):
             _printer.warning(
                 "Telegram API credentials are set but you are not logged in. Run python -m udemy_autocoupons --setup telegram to log in.",
             )
-            client.disconnect()
-            return False
-
-        client.disconnect()
+            await client.disconnect()
+            return None
 
-        return True
+        return client
 
     async def _scrap_channel(
         self,
@@ -262,23 +319,113 @@ class TelegramScraper(Scraper):
 
             assert isinstance(message, Message)
 
-            self._pending_messages[channel_id].add(message.id)
-            self._last_ids[channel_id] = max(
-                self._last_ids.get(channel_id, 0),
-                message.id,
-            )
+            await self._message_slots.acquire()
 
-            tasks.append(
-                group.create_task(
-                    self._scrap_message(
-                        message,
-                        channel_scraper,
-                    ),
+            self._track_message(message, channel_id)
+
+            task = group.create_task(
+                self._scrap_message(
+                    message,
+                    channel_scraper,
                 ),
             )
+            task.add_done_callback(lambda _: self._message_slots.release())
+            tasks.append(task)
 
         return tasks
 
+    async def _on_new_message(
+        self,
+        channel_scraper: ChannelScraper,
+        event: events.NewMessage.Event,
+    ) -> None:
+        """Hands a message pushed by Telegram off to a task that scrapes it.
+
+        This runs in the update dispatch of Telethon, so waiting here for room
+        in the queue would stall every other update. The message is pending
+        until it is scraped, so the next scrap gets it if the task doesn't
+        finish.
+
+        Args:
+            channel_scraper: The scraper for the channel of the message.
+            event: The event with the new message.
+
+        """
+        if self._stop_event.is_set():
+            return
+
+        message = event.message
+        channel_id = channel_scraper.channel_id
+        _debug.debug("Got new message %s of %s", message.id, channel_id)
+
+        self._track_message(message, channel_id)
+
+        task = create_task(self._scrap_new_message(message, channel_scraper))
+        self._new_message_tasks.add(task)
+        task.add_done_callback(
+            partial(self._finish_new_message, message, channel_id),
+        )
+
+    async def _scrap_new_message(
+        self,
+        message: Message,
+        channel_scraper: ChannelScraper,
+    ) -> None:
+        """Scrapes a message pushed by Telegram.
+
+        Args:
+            message: The new message.
+            channel_scraper: The scraper for the channel of the message.
+
+        """
+        async with self._message_slots:
+            counter = await self._scrap_message(message, channel_scraper)
+
+        if counter:
+            _printer.info(
+                "Scraped %s urls from a new message in %s telegram channel",
+                counter,
+                channel_scraper.channel_id,
+            )
+
+    def _finish_new_message(
+        self,
+        message: Message,
+        channel_id: str,
+        task: Task[None],
+    ) -> None:
+        """Forgets the task of a new message, logging its error if any.
+
+        Args:
+            message: The new message.
+            channel_id: The channel of the message.
+            task: The finished task.
+
+        """
+        self._new_message_tasks.discard(task)
+
+        if not task.cancelled() and (error := task.exception()):
+            _debug.error(
+                "Error processing new message %s of %s",
+                message.id,
+                channel_id,
+                exc_info=error,
+            )
+
+    def _track_message(self, message: Message, channel_id: str) -> None:
+        """Marks the message as pending, and as the last one if it is newer.
+
+        Args:
+            message: The message that will be scraped.
+            channel_id: The channel of the message.
+
+        """
+        self._pending_messages[channel_id].add(message.id)
+        self._last_ids[channel_id] = max(
+            self._last_ids.get(channel_id, 0),
+            message.id,
+        )
+
     async def _scrap_message(
         self,
         message: Message,
@@ -319,8 +466,11 @@ class TelegramScraper(Scraper):
             return 0
 
         for url in urls:
-            await self._queue.put(url)
+            await self._queue.put(
+                ScrapedUrl(url, f"telegram/{channel_id}", message.date),
+            )
 
-        self._pending_messages[channel_id].remove(message.id)
+        # It could also be pushed while catching up, and be already removed
+        self._pending_messages[channel_id].discard(message.id)
 
         return len(urls)
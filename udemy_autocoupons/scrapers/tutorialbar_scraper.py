@@ -7,6 +7,7 @@ from typing import TypedDict
 
 from aiohttp import ClientSession
 
+from udemy_autocoupons.scraped_url import ScrapedUrl
 from udemy_autocoupons.scrapers.scraper import Scraper
 from udemy_autocoupons.scrapers.wordpress_scraper import (
     WordpressScraper,
@@ -47,7 +48,7 @@ class TutorialbarScraper(Scraper):
 
     def __init__(
         self,
-        queue: AsyncQueue[str | None],
+        queue: AsyncQueue[ScrapedUrl | None],
         client: ClientSession,
         persistent_data: _PersistentData | _PreviousPersistentData | None,
         stop_event: Event,
@@ -127,9 +128,9 @@ class TutorialbarScraper(Scraper):
         _debug.debug("Persistent data is already in the current format")
         return persistent_data  # type: ignore
 
-    async def _enqueue_urls(self, urls: list[str]) -> None:
-        for url in urls:
-            if "udemy" in url:
-                await self._queue.put(url)
+    async def _enqueue_urls(self, urls: list[ScrapedUrl]) -> None:
+        for scraped_url in urls:
+            if "udemy" in scraped_url.url:
+                await self._queue.put(scraped_url)
             else:
-                _debug.debug("%s is not a udemy url", url)
+                _debug.debug("%s is not a udemy url", scraped_url.url)
@@ -11,6 +11,7 @@ from aiohttp import ClientSession
 
 from udemy_autocoupons.constants import SCRAPER_WAIT
 from udemy_autocoupons.request_with_reattempts import request_with_reattempts
+from udemy_autocoupons.scraped_url import ScrapedUrl
 
 
 class WordpressPost(TypedDict):
@@ -49,7 +50,7 @@ class WordpressScraper(Generic[_Post]):
         default_days: int,
         domain: str,
         get_post_value: Callable[[_Post], str],
-        process_posts: Callable[[list[str]], Awaitable[None]],
+        process_posts: Callable[[list[ScrapedUrl]], Awaitable[None]],
     ) -> None:
         """Stores provided parameters and generates a default last_date if needed.
 
@@ -61,7 +62,7 @@ class WordpressScraper(Generic[_Post]):
           default_days: The number of days before current time to use for the default last_date.
           domain: The domain of the site, without protocol.
           get_post_value: A function that will be called to safely extract a value from the post.
-          process_posts: A function that will be called for each batch of posts with the extracted post values.
+          process_posts: A function that will be called for each batch of posts with the extracted post values and dates.
 
         """
         self._client = client
@@ -72,8 +73,10 @@ class WordpressScraper(Generic[_Post]):
 
         _debug.debug("%s: Got last_date %s", self._domain, persistent_data)
 
+        self._server_timezone = timezone(timedelta(hours=server_time_offset))
+
         default_last_date = datetime.now(
-            timezone(timedelta(hours=server_time_offset)),
+            self._server_timezone,
         ) - timedelta(days=default_days)
 
         self._last_date = (
@@ -89,6 +92,9 @@ class WordpressScraper(Generic[_Post]):
     async def scrape(self) -> None:
         """Starts scraping post urls and sending them to the processing function."""
         _debug.debug("%s: Started scraping", self._domain)
+        # Continue from the previous scrape, if any
+        if self._new_last_date:
+            self._last_date = self._new_last_date
         offset = 0
 
         while urls := await self._request(self._generate_url(offset)):
@@ -143,7 +149,7 @@ class WordpressScraper(Generic[_Post]):
         )
         return persistent_data
 
-    async def _request(self, url: str) -> list[str] | None:
+    async def _request(self, url: str) -> list[ScrapedUrl] | None:
         """Sends a request to the given url.
 
         It can resend the request several times if it keeps failing.
@@ -168,7 +174,7 @@ class WordpressScraper(Generic[_Post]):
 
         return self._process_json(json_res)
 
-    def _process_json(self, json_res: list[_Post]) -> list[str] | None:
+    def _process_json(self, json_res: list[_Post]) -> list[ScrapedUrl] | None:
         """Validates and processes the json response.
 
         Args:
@@ -196,17 +202,28 @@ class WordpressScraper(Generic[_Post]):
 
         return urls
 
-    def _extract_values_from_posts(self, json_res: list[_Post]) -> list[str]:
+    def _extract_values_from_posts(
+        self,
+        json_res: list[_Post],
+    ) -> list[ScrapedUrl]:
         """Extracts the post values from the json response and updates _new_last_date.
 
         Args:
             json_res: The json response.
 
         Returns:
-            A list of post values extracted from the json response with process_posts.
+            A list of post values extracted from the json response with process_posts,
+            along with the dates of the posts.
 
         """
-        if urls := [self._get_post_value(post) for post in json_res]:
+        if urls := [
+            ScrapedUrl(
+                self._get_post_value(post),
+                self._domain,
+                self._parse_date(post["date"]),
+            )
+            for post in json_res
+        ]:
             self._new_last_date = json_res[-1]["date"]
             _debug.debug(
                 "%s: Reassigning self._new_last_date to %s",
@@ -216,6 +233,24 @@ class WordpressScraper(Generic[_Post]):
 
         return urls
 
+    def _parse_date(self, date: str) -> datetime | None:
+        """Parses the date of a post, which is in the server timezone.
+
+        Args:
+            date: The date of the post.
+
+        Returns:
+            The timezone aware date, or None if it is not valid.
+
+        """
+        try:
+            return datetime.fromisoformat(date).replace(
+                tzinfo=self._server_timezone,
+            )
+        except (TypeError, ValueError):
+            _debug.exception("%s: Invalid post date %s", self._domain, date)
+            return None
+
     def _generate_url(self, offset: int) -> str:
         """Generates a url with the given offset and other required parameters.
 
@@ -0,0 +1,284 @@
+"""This module contains the SqliteCoursesStore class."""
+
+from __future__ import annotations
+
+import sqlite3
+from collections import OrderedDict
+from collections.abc import Hashable, Iterator
+from pathlib import Path
+from threading import RLock
+from typing import TypeVar
+
+from udemy_autocoupons.courses_store import BaseCoursesStore
+from udemy_autocoupons.udemy_course import (
+    CourseWithAnyCoupon,
+    CourseWithCoupon,
+    UdemyCourseT,
+    is_with_any_coupon,
+    is_with_specific_coupon,
+)
+
+_KeyT = TypeVar("_KeyT", bound=Hashable)
+
+
+class _HotCache(OrderedDict[_KeyT, bool]):
+    """A bounded cache of membership results, evicting the least recent."""
+
+    def __init__(self, max_size: int) -> None:
+        """Creates an empty cache.
+
+        Args:
+            max_size: The maximum number of results.
+
+        """
+        super().__init__()
+        self._max_size = max_size
+
+    def get_recent(self, key: _KeyT) -> bool | None:
+        """Gets a result, marking it as recently used.
+
+        Args:
+            key: The key of the result.
+
+        Returns:
+            The result, or None if it is not cached.
+
+        """
+        if (is_member := self.get(key)) is not None:
+            self.move_to_end(key)
+
+        return is_member
+
+    def put(self, key: _KeyT, is_member: bool) -> None:
+        """Caches a result, evicting the oldest one if it is full.
+
+        Args:
+            key: The key of the result.
+            is_member: The result.
+
+        """
+        self[key] = is_member
+        self.move_to_end(key)
+
+        if len(self) > self._max_size:
+            self.popitem(last=False)
+
+
+class SqliteCoursesStore(BaseCoursesStore):
+    """A set-like store for mixed UdemyCourse instances, backed by SQLite.
+
+    Every change is written through in its own transaction, so there is
+    nothing to save at the end of the run, and opening it does not load the
+    courses. Membership results are kept in a bounded in-memory cache, which
+    is updated on every change.
+
+    All the methods are thread-safe.
+
+    """
+
+    _HOT_CACHE_SIZE = 100_000
+
+    def __init__(self, path: Path) -> None:
+        """Opens the store, creating it if needed.
+
+        Args:
+            path: The path of the database file.
+
+        """
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._lock = RLock()
+
+        # The any_coupon table and the specific_coupon table are cached
+        # separately, so that changes in one don't invalidate the other
+        self._any_coupon_cache: _HotCache[str] = _HotCache(self._HOT_CACHE_SIZE)
+        self._specific_coupon_cache: _HotCache[tuple[str, str | None]] = (
+            _HotCache(self._HOT_CACHE_SIZE)
+        )
+
+        with self._lock, self._connection:
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute("PRAGMA synchronous=NORMAL")
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS any_coupon "
+                + "(url_id TEXT PRIMARY KEY) WITHOUT ROWID",
+            )
+            # Coupon can be NULL, which is a course without coupon
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS specific_coupon "
+                + "(url_id TEXT NOT NULL, coupon TEXT)",
+            )
+            self._connection.execute(
+                "CREATE INDEX IF NOT EXISTS specific_coupon_url_id "
+                + "ON specific_coupon (url_id, coupon)",
+            )
+
+    def __contains__(self, course: object) -> bool:
+        """Checks if the given element is in the store."""
+        if not isinstance(course, UdemyCourseT):
+            return False
+
+        with self._lock:
+            if self._contains_any_coupon(course.url_id):
+                return True
+
+            return not course.any_coupon and self._contains_specific_coupon(
+                course.url_id,
+                course.coupon,
+            )
+
+    def __iter__(self) -> Iterator[UdemyCourseT]:
+        """Iterates first over the courses with a specific coupon.
+
+        The courses are read when the iteration starts.
+
+        """
+        with self._lock:
+            specific_coupon_rows = self._connection.execute(
+                "SELECT url_id, coupon FROM specific_coupon",
+            ).fetchall()
+            any_coupon_rows = self._connection.execute(
+                "SELECT url_id FROM any_coupon",
+            ).fetchall()
+
+        for url_id, coupon in specific_coupon_rows:
+            yield CourseWithCoupon(url_id, coupon)
+
+        for (url_id,) in any_coupon_rows:
+            yield CourseWithAnyCoupon(url_id)
+
+    def __len__(self) -> int:
+        """Returns the number of items in the store."""
+        with self._lock:
+            (length,) = self._connection.execute(
+                "SELECT (SELECT COUNT(*) FROM any_coupon) "
+                + "+ (SELECT COUNT(*) FROM specific_coupon)",
+            ).fetchone()
+
+        return length
+
+    def add(self, value: UdemyCourseT) -> None:  # noqa: WPS110
+        """Adds a course to the store."""
+        with self._lock, self._connection:
+            self._add(value)
+
+    def discard(self, value: UdemyCourseT) -> None:  # noqa: WPS110
+        """Removes a course without raising if it doesn't exist."""
+        with self._lock, self._connection:
+            if is_with_any_coupon(value):
+                if self._connection.execute(
+                    "DELETE FROM any_coupon WHERE url_id = ?",
+                    (value.url_id,),
+                ).rowcount:
+                    # Its courses with a specific coupon were removed when it
+                    # was added, but they may still be cached
+                    self._specific_coupon_cache.clear()
+                self._any_coupon_cache.put(value.url_id, False)
+            elif is_with_specific_coupon(value):
+                self._connection.execute(
+                    "DELETE FROM specific_coupon "
+                    + "WHERE url_id = ? AND coupon IS ?",
+                    (value.url_id, value.coupon),
+                )
+                self._specific_coupon_cache.put(
+                    (value.url_id, value.coupon),
+                    False,
+                )
+            else:
+                raise TypeError
+
+    def optimize(self) -> None:
+        """Removes the courses that are contained by a course with any_coupon.
+
+        They are removed as they appear, this only cleans stores written
+        before that.
+
+        """
+        with self._lock, self._connection:
+            self._connection.execute(
+                "DELETE FROM specific_coupon "
+                + "WHERE url_id IN (SELECT url_id FROM any_coupon)",
+            )
+            self._specific_coupon_cache.clear()
+
+    def load_compressed(
+        self,
+        compressed: tuple[str | tuple[str, str], ...],
+    ) -> None:
+        """Loads courses into the store from a compressed representation.
+
+        All the courses are added in a single transaction.
+
+        Args:
+            compressed: The compressed representation, as returned by
+            create_compressed.
+
+        """
+        with self._lock, self._connection:
+            super().load_compressed(compressed)
+
+    def close(self) -> None:
+        """Closes the database."""
+        with self._lock:
+            self._connection.close()
+
+    def _add(self, course: UdemyCourseT) -> None:
+        """Adds a course. The lock and a transaction must be held."""
+        if course in self:
+            return
+
+        if is_with_any_coupon(course):
+            self._connection.execute(
+                "INSERT INTO any_coupon VALUES (?)",
+                (course.url_id,),
+            )
+            # They are contained by the course with any_coupon now
+            self._connection.execute(
+                "DELETE FROM specific_coupon WHERE url_id = ?",
+                (course.url_id,),
+            )
+            self._any_coupon_cache.put(course.url_id, True)
+        elif is_with_specific_coupon(course):
+            self._connection.execute(
+                "INSERT INTO specific_coupon VALUES (?, ?)",
+                (course.url_id, course.coupon),
+            )
+            self._specific_coupon_cache.put(
+                (course.url_id, course.coupon),
+                True,
+            )
+        else:
+            raise TypeError
+
+    def _contains_any_coupon(self, url_id: str) -> bool:
+        """Checks the any_coupon table, using the cache."""
+        if (is_member := self._any_coupon_cache.get_recent(url_id)) is None:
+            is_member = (
+                self._connection.execute(
+                    "SELECT 1 FROM any_coupon WHERE url_id = ?",
+                    (url_id,),
+                ).fetchone()
+                is not None
+            )
+            self._any_coupon_cache.put(url_id, is_member)
+
+        return is_member
+
+    def _contains_specific_coupon(
+        self,
+        url_id: str,
+        coupon: str | None,
+    ) -> bool:
+        """Checks the specific_coupon table, using the cache."""
+        key = (url_id, coupon)
+        if (is_member := self._specific_coupon_cache.get_recent(key)) is None:
+            is_member = (
+                self._connection.execute(
+                    "SELECT 1 FROM specific_coupon "
+                    + "WHERE url_id = ? AND coupon IS ?",
+                    key,
+                ).fetchone()
+                is not None
+            )
+            self._specific_coupon_cache.put(key, is_member)
+
+        return is_member